@@ -0,0 +1,294 @@
+"""
+Admission control for the services: per-client rate limits and bounded concurrency.
+
+Both are configured per service and per route with rule lists, first match wins:
+
+    RATE_LIMITS="POST /api/quote*=5/s:20; PUT *=2/s"
+    CONCURRENCY_LIMITS="GET /changes=0; POST *=4; *=64"
+
+A rule is ``[METHOD ]PATH=VALUE``; PATH is a shell-style pattern matched against
+the path within the service (``*`` matches everything) and a missing METHOD
+matches any. Prefix the variable with the service name to set it for one
+service (QUOTES_RATE_LIMITS=...). A value of 0 exempts the matching requests.
+
+Rate limits are token buckets of RATE requests per second, minute or hour
+(``5/s``, ``100/m``, ``1000/h``) holding up to BURST tokens (default: one
+second's worth, at least 1), one bucket per client and rule. A client sending
+an X-API-Key listed in API_KEYS gets buckets of its own; everyone else is
+told apart by address, so a made-up key cannot buy a fresh bucket.
+Buckets live in an LRU of at most RATE_LIMIT_CLIENTS entries; an evicted
+client comes back with a full bucket. An empty bucket answers 429 with
+Retry-After set to when the next token is due.
+
+A concurrency limit admits that many requests of a rule at once. Up to
+ADMISSION_QUEUE more wait, for at most ADMISSION_TIMEOUT seconds; anything
+beyond the queue, or still waiting at the timeout, gets a 503 with
+Retry-After instead of an ever longer wait.
+
+Nothing is limited unless the variables are set. The counters are in each
+service's health payload under ``admission`` and at /metrics as admission_*;
+each refusal is also timed there under its route and status (see metrics.py).
+admit() applies a service's Admission to its Flask app; asgi.py calls enter()
+and leave() on the same object.
+"""
+
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import math
+import os
+import threading
+import time
+
+import config
+from sampling import client_key
+
+MAX_CLIENTS = config.env_int("RATE_LIMIT_CLIENTS", 100_000)
+QUEUE_SIZE = config.env_int("ADMISSION_QUEUE", 64)
+QUEUE_TIMEOUT = float(os.environ.get("ADMISSION_TIMEOUT", "1"))
+
+PERIODS = {"s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class Rule:
+    """One ``[METHOD ]PATH=VALUE`` entry of a limit list."""
+
+    def __init__(self, method: str, pattern: str, value):
+        self.method = method
+        self.pattern = pattern
+        self.value = value
+        self.name = f"{method} {pattern}" if method != "*" else pattern
+        self.limited = 0
+
+    def matches(self, method: str, path: str) -> bool:
+        return self.method in ("*", method) and fnmatchcase(path, self.pattern)
+
+
+def parse_rules(variable: str, spec: str, parse_value: Callable[[str], object]) -> List[Rule]:
+    """Rules from a ``;``-separated list; ``variable`` names the setting in errors."""
+    rules = []
+    for entry in filter(None, (part.strip() for part in spec.split(";"))):
+        target, separator, value = entry.rpartition("=")
+        words = target.split()
+        if not separator or len(words) not in (1, 2):
+            raise ValueError(f"{variable}: expected '[METHOD ]PATH=VALUE', got {entry!r}.")
+        method, pattern = (words[0].upper(), words[1]) if len(words) == 2 else ("*", words[0])
+        try:
+            rules.append(Rule(method, pattern, parse_value(value.strip())))
+        except ValueError as error:
+            raise ValueError(f"{variable}: {error} in {entry!r}.") from None
+    return rules
+
+
+def parse_rate(value: str) -> Optional[Tuple[float, float]]:
+    """``N/s``, ``N/m`` or ``N/h`` with an optional ``:BURST``, as (tokens per second, burst); ``0`` for no limit."""
+    if value == "0":
+        return None
+    rate, _, burst = value.partition(":")
+    count, _, period = rate.partition("/")
+    try:
+        per_second = float(count) / PERIODS[period.strip().lower()[:1] or "s"]
+        size = float(burst) if burst else max(per_second, 1.0)
+    except (KeyError, ValueError):
+        raise ValueError(f"invalid rate {value!r}") from None
+    if per_second <= 0 or size < 1:
+        raise ValueError(f"invalid rate {value!r}")
+    return per_second, size
+
+
+def parse_concurrency(value: str) -> int:
+    """A count of concurrent requests; 0 for no limit."""
+    if not value.isdigit():
+        raise ValueError(f"invalid concurrency {value!r}")
+    return int(value)
+
+
+class RateLimiter:
+    """Token buckets per (rule, client), in an LRU bounded to ``max_clients`` entries."""
+
+    def __init__(self, max_clients: int = MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[Tuple[str, str], List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def take(self, rule: Rule, client: str) -> float:
+        """Spend one token from ``client``'s bucket; returns 0, or the seconds until a token is due."""
+        rate, burst = rule.value
+        now = time.monotonic()
+        key = (rule.name, client)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [burst, now]
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0.0
+            return (1 - bucket[0]) / rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class Gate:
+    """At most ``limit`` requests inside at once; up to ``queue_size`` more wait up to ``timeout`` seconds."""
+
+    def __init__(self, limit: int, queue_size: int = QUEUE_SIZE, timeout: float = QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._condition = threading.Condition()
+        self.active = 0
+        self.waiting = 0
+        self.queued = 0
+        self.queue_full = 0
+        self.timeouts = 0
+
+    def enter(self) -> bool:
+        """Take a slot, waiting in the queue if there is room; False when the request should be turned away."""
+        with self._condition:
+            if self.active < self.limit:
+                self.active += 1
+                return True
+            if self.waiting >= self.queue_size:
+                self.queue_full += 1
+                return False
+            self.waiting += 1
+            self.queued += 1
+            deadline = time.monotonic() + self.timeout
+            try:
+                while self.active >= self.limit:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        return False
+                    self._condition.wait(remaining)
+                self.active += 1
+                return True
+            finally:
+                self.waiting -= 1
+
+    def leave(self) -> None:
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+
+class Admission:
+    """The rate limits and concurrency gates of one service."""
+
+    def __init__(self, rate_rules: List[Rule], concurrency_rules: List[Rule], api_keys: Iterable[str] = ()):
+        self.rate_rules = rate_rules
+        self.concurrency_rules = concurrency_rules
+        self.gates: Dict[str, Gate] = {rule.name: Gate(rule.value) for rule in concurrency_rules if rule.value}
+        self.limiter = RateLimiter()
+        self.api_keys = frozenset(api_keys)
+        self.admitted = 0
+        self.rate_limited = 0
+        self.shed = 0
+
+    @classmethod
+    def from_settings(cls, service: str) -> "Admission":
+        rates = config.service_setting(service, "RATE_LIMITS", "")
+        concurrency = config.service_setting(service, "CONCURRENCY_LIMITS", "")
+        api_keys = filter(None, (key.strip() for key in config.service_setting(service, "API_KEYS", "").split(",")))
+        return cls(
+            parse_rules("RATE_LIMITS", rates, parse_rate),
+            parse_rules("CONCURRENCY_LIMITS", concurrency, parse_concurrency),
+            api_keys,
+        )
+
+    def client(self, api_key: Optional[str], remote_addr: Optional[str]) -> Optional[str]:
+        """Whose buckets a request spends: a known API key's, else its address's (unknown keys are ignored)."""
+        api_key = (api_key or "").strip()
+        return client_key(api_key if api_key in self.api_keys else None, remote_addr)
+
+    def check_rate(self, method: str, path: str, client: Optional[str]) -> float:
+        """0 if the request is within its rate limit, else the seconds the client should wait."""
+        rule = next((rule for rule in self.rate_rules if rule.matches(method, path)), None)
+        if rule is None or rule.value is None:
+            return 0.0
+        wait = self.limiter.take(rule, client or "unknown")
+        if wait:
+            rule.limited += 1
+            self.rate_limited += 1
+        return wait
+
+    def gate(self, method: str, path: str) -> Optional[Gate]:
+        rule = next((rule for rule in self.concurrency_rules if rule.matches(method, path)), None)
+        return None if rule is None else self.gates.get(rule.name)
+
+    def enter(
+        self, method: str, path: str, client: Optional[str]
+    ) -> Tuple[Optional[Gate], Optional[Tuple[int, dict, float]]]:
+        """Admit a request: (the gate it must leave() when done, or None), or (None, (status, payload, retry_after))."""
+        wait = self.check_rate(method, path, client)
+        if wait:
+            return None, (429, {"error": "Too many requests; slow down."}, wait)
+        gate = self.gate(method, path)
+        if gate is not None and not gate.enter():
+            self.shed += 1
+            return None, (503, {"error": "The service is at capacity; try again shortly."}, gate.timeout)
+        self.admitted += 1
+        return gate, None
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "shed": self.shed,
+            "clients": len(self.limiter),
+            "client_evictions": self.limiter.evictions,
+            "in_flight": sum(gate.active for gate in self.gates.values()),
+            "queued_now": sum(gate.waiting for gate in self.gates.values()),
+            "queued": sum(gate.queued for gate in self.gates.values()),
+            "queue_full": sum(gate.queue_full for gate in self.gates.values()),
+            "queue_timeouts": sum(gate.timeouts for gate in self.gates.values()),
+            "rate_rules": {rule.name: rule.limited for rule in self.rate_rules},
+            "concurrency_rules": {name: {"limit": gate.limit, "active": gate.active, "waiting": gate.waiting} for name, gate in self.gates.items()},
+        }
+
+    def gauges(self) -> Dict[str, float]:
+        """The numeric totals of stats(), named for /metrics."""
+        return {f"admission_{name}": value for name, value in self.stats().items() if isinstance(value, int)}
+
+
+def retry_after(seconds: float) -> str:
+    """A Retry-After header value: whole seconds, at least 1."""
+    return str(max(1, math.ceil(seconds)))
+
+
+def admit(app, service: str) -> Admission:
+    """Apply ``service``'s RATE_LIMITS and CONCURRENCY_LIMITS to every request of ``app``."""
+    from flask import g, jsonify, request
+
+    admission = Admission.from_settings(service)
+
+    @app.before_request
+    def admit_request():
+        client = admission.client(request.headers.get("X-API-Key"), request.remote_addr)
+        gate, refusal = admission.enter(request.method, request.path, client)
+        if refusal is not None:
+            status, payload, wait = refusal
+            response = jsonify(payload)
+            response.status_code = status
+            response.headers["Retry-After"] = retry_after(wait)
+            return response
+        if gate is not None:
+            g.admission_gate = gate
+        return None
+
+    @app.teardown_request
+    def release_slot(error=None):
+        gate = g.pop("admission_gate", None)
+        if gate is not None:
+            gate.leave()
+
+    return admission
@@ -1,83 +1,173 @@
+from functools import partial
 from pathlib import Path
-from typing import List, Optional
-from flask import Flask, jsonify, request, render_template
-import json, random
-
-app = Flask(__name__)
+from typing import List, Mapping, Optional, Tuple
+from flask import Flask, jsonify, request
+import config
+import handlers
+from admission import admit
+from assets import render_page, serve_assets
+from httpcache import compress_responses, json_result, versioned_json
+from metrics import dataset_gauges, instrument
+from replication import replicate, replication_gauges
+from repository import TextRepository
+from sampling import client_key
+from validation import parse_batch_payload
+
+# static/ is served by assets.py under fingerprinted names, not by Flask's own static route.
+app = Flask(__name__, static_folder=None)
+app.config["MAX_CONTENT_LENGTH"] = config.MAX_CONTENT_LENGTH
 
 DATA_FILE = Path(__file__).with_name("quotes.json")
+MAX_WEIGHT = 1_000_000
+# Most draws one GET /api/quote?next=K returns; the page prefetches a few at a time.
+MAX_PREFETCH = 100
 
 
-class QuoteRepository:
+class QuoteRepository(TextRepository):
     """Simple repository that hides the storage mechanism and avoids shotgun edits."""
 
-    def __init__(self, data_file: Path):
-        self.data_file = data_file
-
-    def _read_all(self) -> List[dict]:
-        if not self.data_file.exists():
-            return []
-        with self.data_file.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
-
-    def _write_all(self, quotes: List[dict]) -> None:
-        with self.data_file.open("w", encoding="utf-8") as handle:
-            json.dump(quotes, handle, indent=4)
-
-    def get_all(self) -> List[dict]:
-        return self._read_all()
-
-    def get_random(self) -> Optional[dict]:
-        quotes = self._read_all()
-        if not quotes:
-            return None
-        return random.choice(quotes)
-
-    def create(self, quote_text: str) -> dict:
-        quotes = self._read_all()
-        new_quote = {"id": len(quotes) + 1, "quote": quote_text}
-        quotes.append(new_quote)
-        self._write_all(quotes)
-        return new_quote
-
-    def update(self, quote_id: int, quote_text: str) -> Optional[dict]:
-        quotes = self._read_all()
-        for quote in quotes:
-            if quote["id"] == quote_id:
-                quote["quote"] = quote_text
-                self._write_all(quotes)
-                return quote
-        return None
+    service = "quotes"
+    text_field = "quote"
 
+    def update(self, quote_id: int, quote_text: str, weight: Optional[float] = None) -> Optional[dict]:
+        changes = {"quote": quote_text}
+        if weight is not None:
+            changes["weight"] = weight
+        return self._apply_updates([(quote_id, changes)])[0]
 
-repository = QuoteRepository(DATA_FILE)
+    def update_many(self, updates: List[Tuple[int, str]]) -> List[Optional[dict]]:
+        return self._apply_updates([(quote_id, {"quote": quote_text}) for quote_id, quote_text in updates])
 
 
-def parse_quote_payload() -> str:
+repository = QuoteRepository(DATA_FILE)
+admission = admit(app, "quotes")
+request_metrics = instrument(
+    app,
+    "quotes",
+    lambda: {
+        **dataset_gauges(repository.count(), repository.cache_stats()),
+        **replication_gauges(replication.stats()),
+        **admission.gauges(),
+    },
+)
+compress_responses(app)
+replication = replicate(app, repository)
+assets = serve_assets(app)
+
+
+def parse_quote_payload(data: Optional[dict] = None) -> str:
     """Validate incoming payloads so every route enforces the same contract."""
-    data = request.get_json(silent=True) or {}
-    quote_text = data.get("quote", "").strip()
-    if not quote_text:
+    if data is None:
+        data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise ValueError("Each item must be a JSON object.")
+    quote_text = data.get("quote", "")
+    if not isinstance(quote_text, str) or not quote_text.strip():
         raise ValueError("Request JSON must include a non-empty 'quote' field.")
-    return quote_text
+    return quote_text.strip()
+
+
+def parse_weight(data: Optional[dict] = None) -> Optional[float]:
+    """Validate the optional 'weight' that makes a quote come up more (above 1) or less (below 1) often."""
+    if data is None:
+        data = request.get_json(silent=True) or {}
+    weight = data.get("weight") if isinstance(data, dict) else None
+    if weight is None:
+        return None
+    if isinstance(weight, bool) or not isinstance(weight, (int, float)) or not 0 < weight <= MAX_WEIGHT:
+        raise ValueError(f"'weight' must be a number above 0 and at most {MAX_WEIGHT}.")
+    return float(weight)
+
+
+def health_payload() -> dict:
+    return {
+        "service": "Inspirational Quotes",
+        "status": "running",
+        "endpoints": ["/api/quote", "/api/quote/search"],
+        "records": repository.count(),
+        "cache": repository.cache_stats(),
+        "admission": admission.stats(),
+        "sampling": repository.sampling_stats(),
+        "assets": assets.stats(),
+    }
+
+
+def draw_quotes(args: Mapping[str, str], client: Optional[str]) -> handlers.Result:
+    """A random quote, ?count=K distinct random quotes, or ?next=K of ``client``'s next random quotes."""
+    if "next" in args:
+        draw = partial(repository.get_random_sequence, client=client)
+        return handlers.draw_many(args, draw, "quotes", "next", MAX_PREFETCH)
+    if "count" in args:
+        return handlers.draw_many(args, repository.get_random_many, "quotes")
+    return handlers.draw_one(repository.get_random(client), "quote", "No quotes available.")
+
+
+def edit_quote(quote_id: int, data: dict) -> handlers.Result:
+    try:
+        quote_text = parse_quote_payload(data)
+        weight = parse_weight(data)
+    except ValueError as error:
+        return {"error": str(error)}, 400
+
+    updated_quote = repository.update(quote_id, quote_text, weight)
+    if not updated_quote:
+        return {"error": "Quote not found"}, 404
+    return {"message": "Quote updated!", "quote": updated_quote}, 200
+
+
+def edit_quotes(data) -> handlers.Result:
+    """Apply a batch of {"id", "quote"} edits in one write, reporting invalid items and unknown ids."""
+    try:
+        items = parse_batch_payload(data if data is not None else [])
+    except ValueError as error:
+        return {"error": str(error)}, 400
+
+    updates, positions, errors = [], [], []
+    for position, item in enumerate(items):
+        try:
+            quote_text = parse_quote_payload(item)
+            quote_id = item.get("id")
+            if not isinstance(quote_id, int) or isinstance(quote_id, bool):
+                raise ValueError("Each item must include an integer 'id' field.")
+        except ValueError as error:
+            errors.append({"index": position, "error": str(error)})
+            continue
+        updates.append((quote_id, quote_text))
+        positions.append(position)
+    if not updates:
+        return {"error": "No valid quotes in batch.", "errors": errors}, 400
+
+    updated_quotes = []
+    for position, (quote_id, _), quote in zip(positions, updates, repository.update_many(updates)):
+        if quote is None:
+            errors.append({"index": position, "id": quote_id, "error": "Quote not found"})
+        else:
+            updated_quotes.append(quote)
+    if not updated_quotes:
+        return {"error": "No quotes updated.", "errors": errors}, 404
+    return {"message": f"{len(updated_quotes)} quotes updated!", "quotes": updated_quotes, "errors": errors}, 200
+
 
 # Root route - serves HTML page
 @app.route("/", methods=["GET"])
 def root():
-    return render_template("index.html")
+    return render_page(assets, "index.html")
 
 # Health check endpoint
 @app.route("/health", methods=["GET"])
 def health():
-    return jsonify({"service": "Inspirational Quotes", "status": "running", "endpoints": ["/api/quote"]}), 200
+    return versioned_json(health_payload(), repository.version())
 
-# GET random quote
+# GET random quote, ?count=K distinct random quotes, or ?next=K of this client's next random quotes
 @app.route("/api/quote", methods=["GET"])
 def get_quote():
-    quote = repository.get_random()
-    if not quote:
-        return jsonify({"id": 0, "quote": "No quotes available."}), 404
-    return jsonify(quote), 200
+    client = client_key(request.headers.get("X-Client-Id"), request.remote_addr)
+    return json_result(draw_quotes(request.args, client), store=False)
+
+# GET ranked quotes matching every term of ?q= (a trailing * matches a prefix), up to ?limit=
+@app.route("/api/quote/search", methods=["GET"])
+def search_quotes():
+    return json_result(handlers.search(request.args, repository.search, "quotes"))
 
 # POST new quote
 @app.route("/api/quote", methods=["POST"])
@@ -87,25 +177,32 @@ def add_quote():
     except ValueError as error:
         return jsonify({"error": str(error)}), 400
 
-    new_quote = repository.create(quote_text)
-    return (
-        jsonify({"message": "Quote added successfully!", "quote": new_quote}),
-        201,
+    return json_result(handlers.created("quote", "Quote added successfully!", repository.create(quote_text)))
+
+
+# POST many new quotes in a single write
+@app.route("/api/quote/batch", methods=["POST"])
+def add_quotes():
+    return json_result(
+        handlers.create_batch(
+            request.get_json(silent=True),
+            parse_quote_payload,
+            repository.create_many,
+            "quotes",
+            "quotes",
+            "quotes added successfully!",
+        )
     )
 
 # PUT edit existing quote
 @app.route("/api/quote/<int:quote_id>", methods=["PUT"])
 def update_quote(quote_id):
-    try:
-        quote_text = parse_quote_payload()
-    except ValueError as error:
-        return jsonify({"error": str(error)}), 400
-
-    updated_quote = repository.update(quote_id, quote_text)
-    if not updated_quote:
-        return jsonify({"error": "Quote not found"}), 404
+    return json_result(edit_quote(quote_id, request.get_json(silent=True) or {}))
 
-    return jsonify({"message": "Quote updated!", "quote": updated_quote}), 200
+# PUT edit many existing quotes in a single write
+@app.route("/api/quote/batch", methods=["PUT"])
+def update_quotes():
+    return json_result(edit_quotes(request.get_json(silent=True)))
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5001)
+    app.run(debug=config.DEBUG, host=config.HOST, port=config.port("quotes"))
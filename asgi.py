@@ -0,0 +1,822 @@
+#!/usr/bin/env python3
+"""
+ASGI variant of the four services, for many concurrent keep-alive clients in one process.
+
+Routes and JSON bodies match the Flask services mounted the way gateway.py mounts them:
+
+    /              -> quotes service
+    /quotes/...    -> quotes service
+    /funfacts/...  -> fun facts service
+    /reflections/... -> reflections service
+    /goals/...     -> goals service
+
+Handlers run on the event loop and hand every repository call to a worker thread
+(asyncio.to_thread), so file reads, fsyncs and SQLite queries never block other
+connections. Single-item POSTs that arrive while a write is in flight are queued
+and applied together with one create_many() call, so a burst of POST /funfact
+costs one file write instead of one per request.
+
+    pip3 install uvicorn
+    python3 asgi.py                      # or: uvicorn asgi:application --port 5000
+
+Without uvicorn, a small built-in asyncio HTTP/1.1 server with keep-alive is used;
+it takes request bodies with a Content-Length only and answers chunked uploads
+with 501. Everything behind the routing is the Flask services' own: the
+repositories, validation, the route bodies (handlers.py and each service's
+health payload and other bodies), JSON encoding and compression (codec.py),
+admission control (each service's Admission) and the /metrics registries, so
+both front ends answer alike. Only the split of request time into phases is
+missing here, as a request moves between worker threads.
+"""
+
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from itertools import islice
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote
+import asyncio
+import json
+import re
+import sys
+import time
+import zlib
+
+import assets
+import codec
+import config
+import handlers
+from admission import retry_after
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from replication import parse_feed_query
+from sampling import client_key
+import app as quotes_service
+import funfacts as funfacts_service
+import goals as goals_service
+import reflections as reflections_service
+import validation
+
+# Lines per chunk when streaming NDJSON, read from storage in one worker-thread hop.
+STREAM_CHUNK = 1000
+
+
+class Request:
+    def __init__(
+        self, method: str, path: str, query_string: str, headers: Dict[str, str], body: bytes, remote_addr: Optional[str] = None
+    ):
+        self.method = method
+        self.path = path
+        self.query_string = query_string
+        self.args = {name: values[0] for name, values in parse_qs(query_string, keep_blank_values=True).items()}
+        self.headers = headers
+        self.body = body
+        self.remote_addr = remote_addr
+        # The handler's name once dispatch() has matched a route, for /metrics.
+        self.endpoint = "unmatched"
+
+    @property
+    def full_path(self) -> str:
+        return f"{self.path}?{self.query_string}"
+
+    def get_json(self):
+        """The decoded JSON body, or None when it is missing or invalid (like Flask's silent=True)."""
+        if "json" not in self.headers.get("content-type", ""):
+            return None
+        try:
+            return json.loads(self.body)
+        except ValueError:
+            return None
+
+
+class Response:
+    def __init__(
+        self,
+        body: bytes = b"",
+        status: int = 200,
+        content_type: str = "application/json",
+        headers: Optional[Dict[str, str]] = None,
+        stream: Optional[Callable[[], Awaitable[Optional[bytes]]]] = None,
+    ):
+        self.body = body
+        self.status = status
+        self.headers = {"content-type": content_type, **(headers or {})}
+        # When set, called repeatedly for the next body chunk until it returns None.
+        self.stream = stream
+
+
+def json_response(payload, status: int = 200, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(codec.json_body(payload), status, headers=headers)
+
+
+def json_result(result: Tuple[object, int], store: bool = True) -> Response:
+    """A ``(payload, status)`` pair from handlers.py; ``store=False`` marks a 200 no-store (see httpcache.json_result)."""
+    body, status = result
+    response = json_response(body, status)
+    return response if store or status != 200 else no_store(response)
+
+
+def asset_response(request: Request, asset, immutable: bool = False) -> Response:
+    """A static file or rendered page from assets.py; see assets.asset_response."""
+    body, encoding = asset.encoded(codec.negotiate(request.headers.get("accept-encoding")))
+    headers = {"vary": "accept-encoding", **({"content-encoding": encoding} if encoding else {})}
+    response = conditional(request, Response(body, content_type=asset.content_type, headers=headers), f'"{asset.etag(encoding)}"', 0)
+    if immutable:
+        response.headers["cache-control"] = f"public, max-age={assets.IMMUTABLE_MAX_AGE}, immutable"
+    return response
+
+
+def no_store(response: Response) -> Response:
+    response.headers["cache-control"] = "no-store"
+    return response
+
+
+def conditional(request: Request, response: Response, etag: str, modified: float) -> Response:
+    """Add validators to ``response`` and answer 304 when the client's copy is still current."""
+    response.headers["etag"] = etag
+    response.headers["cache-control"] = "no-cache"
+    if modified:
+        response.headers["last-modified"] = formatdate(modified, usegmt=True)
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        fresh = "*" in tags or etag.removeprefix("W/") in tags
+    elif modified and "if-modified-since" in request.headers:
+        try:
+            fresh = int(modified) <= parsedate_to_datetime(request.headers["if-modified-since"]).timestamp()
+        except (TypeError, ValueError):
+            fresh = False
+    else:
+        fresh = False
+    if fresh:
+        return Response(b"", 304, headers={name: value for name, value in response.headers.items() if name != "content-type"})
+    return response
+
+
+def versioned_json(request: Request, payload: dict, version: Tuple[str, float]) -> Response:
+    token, modified = version
+    return conditional(request, json_response(payload), f'W/"{token}"', modified)
+
+
+async def cached_json(request: Request, cache, version: Tuple[str, float], build: Callable[[], object]) -> Response:
+    key = request.full_path
+    token, modified = version
+    encoding = codec.negotiate(request.headers.get("accept-encoding"))
+    body, encoding = await asyncio.to_thread(cache.get_or_build, key, token, build, encoding)
+    headers = {"vary": "accept-encoding", **({"content-encoding": encoding} if encoding else {})}
+    etag = f'"{token}-{zlib.crc32(key.encode("utf-8")):08x}' + (f'-{encoding}"' if encoding else '"')
+    return conditional(request, Response(body, headers=headers), etag, modified)
+
+
+async def compressed(request: Request, response: Response) -> Response:
+    """``response`` compressed for the client when codec.py finds it worthwhile; see httpcache.compress_responses."""
+    if (
+        "content-encoding" in response.headers
+        or response.status < 200
+        or response.status in (204, 304)
+        or not codec.compressible(response.headers.get("content-type"))
+    ):
+        return response
+    response.headers["vary"] = "accept-encoding"
+    encoding = codec.negotiate(request.headers.get("accept-encoding"))
+    if encoding is None:
+        return response
+    if response.stream is not None:
+        stream, compressor, finished = response.stream, codec.StreamCompressor(encoding), False
+
+        async def next_chunk() -> Optional[bytes]:
+            nonlocal finished
+            while not finished:
+                chunk = await stream()
+                if chunk is None:
+                    finished = True
+                    return compressor.finish()
+                data = compressor.compress(chunk)
+                if data:
+                    return data
+            return None
+
+        response.stream = next_chunk
+    elif len(response.body) >= codec.MIN_SIZE:
+        response.body = await asyncio.to_thread(codec.compress, response.body, encoding)
+    else:
+        return response
+    response.headers["content-encoding"] = encoding
+    etag = response.headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        response.headers["etag"] = "W/" + etag
+    return response
+
+
+class WriteCoalescer:
+    """Applies single writes that queue up while a flush is running as one batch call.
+
+    ``write_many`` takes a list of items and returns one result per item, in order,
+    like the repositories' create_many(). Each submit() resolves to its own result.
+    """
+
+    def __init__(self, write_many: Callable[[list], list], max_batch: int):
+        self._write_many = write_many
+        self.max_batch = max_batch
+        self._pending: List[Tuple[object, asyncio.Future]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.items = 0
+
+    async def submit(self, item):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if self._flusher is None:
+            self._flusher = asyncio.create_task(self._flush())
+        return await future
+
+    async def _flush(self) -> None:
+        try:
+            # Let requests that were read in the same loop iteration join the first batch.
+            await asyncio.sleep(0)
+            while self._pending:
+                batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch :]
+                try:
+                    results = await asyncio.to_thread(self._write_many, [item for item, _ in batch])
+                except Exception as error:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(error)
+                    continue
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+                self.flushes += 1
+                self.items += len(batch)
+        finally:
+            self._flusher = None
+
+    def stats(self) -> dict:
+        return {"flushes": self.flushes, "items": self.items, "pending": len(self._pending)}
+
+
+def payload(request: Request):
+    return request.get_json() or {}
+
+
+def health(service, writes: WriteCoalescer) -> Callable[..., Awaitable[Response]]:
+    """The health check of ``service``: its own payload plus the coalescing of its single POSTs."""
+
+    async def health_check(request: Request) -> Response:
+        body, version = await asyncio.to_thread(lambda: (service.health_payload(), service.repository.version()))
+        return versioned_json(request, {**body, "writes": writes.stats()}, version)
+
+    return health_check
+
+
+# Quotes
+
+quote_writes = WriteCoalescer(lambda texts: quotes_service.repository.create_many(texts), validation.MAX_BATCH_SIZE)
+
+
+async def quotes_root(request: Request) -> Response:
+    return asset_response(request, await asyncio.to_thread(render_index))
+
+
+async def quotes_static(request: Request, filename: str) -> Response:
+    asset, immutable = quotes_service.assets.lookup(filename)
+    if asset is None:
+        return json_response({"error": "Not found"}, 404)
+    return asset_response(request, asset, immutable)
+
+
+async def get_quote(request: Request) -> Response:
+    client = client_key(request.headers.get("x-client-id"), request.remote_addr)
+    return json_result(await asyncio.to_thread(quotes_service.draw_quotes, request.args, client), store=False)
+
+
+async def search_quotes(request: Request) -> Response:
+    return json_result(await asyncio.to_thread(handlers.search, request.args, quotes_service.repository.search, "quotes"))
+
+
+async def add_quote(request: Request) -> Response:
+    try:
+        quote_text = quotes_service.parse_quote_payload(payload(request))
+    except ValueError as error:
+        return json_response({"error": str(error)}, 400)
+
+    return json_result(handlers.created("quote", "Quote added successfully!", await quote_writes.submit(quote_text)))
+
+
+async def add_quotes(request: Request) -> Response:
+    result = await asyncio.to_thread(
+        handlers.create_batch,
+        request.get_json(),
+        quotes_service.parse_quote_payload,
+        quotes_service.repository.create_many,
+        "quotes",
+        "quotes",
+        "quotes added successfully!",
+    )
+    return json_result(result)
+
+
+async def update_quote(request: Request, quote_id: str) -> Response:
+    return json_result(await asyncio.to_thread(quotes_service.edit_quote, int(quote_id), payload(request)))
+
+
+async def update_quotes(request: Request) -> Response:
+    return json_result(await asyncio.to_thread(quotes_service.edit_quotes, request.get_json()))
+
+
+_index_page = None
+
+
+def render_index():
+    """The quotes HTML page, rendered once through Flask's templates (see assets.py) and then reused."""
+    global _index_page
+    if _index_page is None:
+        from flask import render_template
+
+        with quotes_service.app.test_request_context("/"):
+            _index_page = quotes_service.assets.page(("index.html", ""), lambda: render_template("index.html"))
+    return _index_page
+
+
+# Fun facts
+
+fact_writes = WriteCoalescer(lambda texts: funfacts_service.repository.create_many(texts), validation.MAX_BATCH_SIZE)
+
+
+async def get_funfact(request: Request) -> Response:
+    client = client_key(request.headers.get("x-client-id"), request.remote_addr)
+    return json_result(await asyncio.to_thread(funfacts_service.draw_facts, request.args, client), store=False)
+
+
+async def search_funfacts(request: Request) -> Response:
+    return json_result(await asyncio.to_thread(handlers.search, request.args, funfacts_service.repository.search, "facts"))
+
+
+async def add_funfact(request: Request) -> Response:
+    try:
+        fact_text = funfacts_service.parse_fact_payload(payload(request))
+    except ValueError as error:
+        return json_response({"error": str(error)}, 400)
+
+    return json_result(handlers.created("fact", "Fun fact added successfully!", await fact_writes.submit(fact_text)))
+
+
+async def add_funfacts(request: Request) -> Response:
+    result = await asyncio.to_thread(
+        handlers.create_batch,
+        request.get_json(),
+        funfacts_service.parse_fact_payload,
+        funfacts_service.repository.create_many,
+        "fun facts",
+        "facts",
+        "fun facts added successfully!",
+    )
+    return json_result(result)
+
+
+# Reflections
+
+reflection_writes = WriteCoalescer(
+    lambda texts: reflections_service.repository.create_many(texts), validation.MAX_BATCH_SIZE
+)
+
+
+async def add_reflection(request: Request) -> Response:
+    try:
+        reflection_text = reflections_service.parse_reflection_payload(payload(request))
+    except ValueError as error:
+        return json_response({"error": str(error)}, 400)
+
+    new_reflection = await reflection_writes.submit(reflection_text)
+    return json_result(handlers.created("reflection", "Reflection saved successfully!", new_reflection))
+
+
+async def add_reflections(request: Request) -> Response:
+    result = await asyncio.to_thread(
+        handlers.create_batch,
+        request.get_json(),
+        reflections_service.parse_reflection_payload,
+        reflections_service.repository.create_many,
+        "reflections",
+        "reflections",
+        "reflections saved successfully!",
+    )
+    return json_result(result)
+
+
+async def get_reflections(request: Request) -> Response:
+    try:
+        content_type, chunks = await asyncio.to_thread(reflections_service.range_body, request.args, request.headers.get("accept"))
+    except ValueError as error:
+        return json_response({"error": str(error)}, 400)
+
+    def next_chunk() -> Optional[bytes]:
+        return b"".join(islice(chunks, STREAM_CHUNK)) or None
+
+    return Response(content_type=content_type, stream=lambda: asyncio.to_thread(next_chunk))
+
+
+async def get_today_reflection(request: Request) -> Response:
+    return json_result(await asyncio.to_thread(reflections_service.today_result))
+
+
+# Replication (see replication.py)
+
+
+def change_feed(service) -> Callable[..., Awaitable[Response]]:
+    """GET /changes of ``service``'s leader; a follower has no feed to serve."""
+
+    async def changes(request: Request) -> Response:
+        if service.replication.role != "leader":
+            return json_response({"error": "Not found"}, 404)
+        try:
+            since, wait, limit = parse_feed_query(request.args)
+        except ValueError as error:
+            return json_response({"error": str(error)}, 400)
+        return no_store(json_response(await asyncio.to_thread(service.replication.feed, since, wait, limit)))
+
+    return changes
+
+
+def replication_stats(service) -> Callable[..., Awaitable[Response]]:
+    async def replication(request: Request) -> Response:
+        return json_response(service.replication.stats())
+
+    return replication
+
+
+# Goals
+
+goal_writes = WriteCoalescer(lambda texts: goals_service.repository.create_many(texts), validation.MAX_BATCH_SIZE)
+
+
+async def get_goals(request: Request) -> Response:
+    try:
+        after, limit, completed = goals_service.parse_goal_query(request.args)
+    except ValueError as error:
+        return json_response({"error": str(error)}, 400)
+
+    if handlers.wants_ndjson(request.args, request.headers.get("accept")):
+        total, lines = await asyncio.to_thread(goals_service.goal_lines, after, limit, completed)
+
+        def next_chunk() -> Optional[bytes]:
+            return b"".join(islice(lines, STREAM_CHUNK)) or None
+
+        return Response(
+            content_type="application/x-ndjson",
+            headers={"x-total-count": str(total)},
+            stream=lambda: asyncio.to_thread(next_chunk),
+        )
+
+    version = await asyncio.to_thread(goals_service.repository.version)
+    return await cached_json(request, goals_service.responses, version, partial(goals_service.goals_page, after, limit, completed))
+
+
+async def add_goal(request: Request) -> Response:
+    try:
+        goal_text = goals_service.parse_goal_payload(payload(request))
+    except ValueError as error:
+        return json_response({"error": str(error)}, 400)
+
+    return json_result(handlers.created("goal", "Goal created successfully!", await goal_writes.submit(goal_text)))
+
+
+async def add_goals(request: Request) -> Response:
+    result = await asyncio.to_thread(
+        handlers.create_batch,
+        request.get_json(),
+        goals_service.parse_goal_payload,
+        goals_service.repository.create_many,
+        "goals",
+        "goals",
+        "goals added successfully!",
+    )
+    return json_result(result)
+
+
+async def complete_goal(request: Request, goal_id: str) -> Response:
+    return json_result(await asyncio.to_thread(goals_service.complete_result, int(goal_id)))
+
+
+# Metrics (see metrics.py)
+
+
+def metrics_page(service) -> Callable[..., Awaitable[Response]]:
+    """GET /metrics of ``service``, rendered from the registry its Flask app records into as well."""
+
+    async def metrics(request: Request) -> Response:
+        body = await asyncio.to_thread(service.request_metrics.exposition)
+        return Response(body.encode("utf-8"), content_type=METRICS_CONTENT_TYPE)
+
+    return metrics
+
+
+Route = Tuple[str, "re.Pattern[str]", Callable[..., Awaitable[Response]]]
+
+
+def routes(*table: Tuple[str, str, Callable[..., Awaitable[Response]]]) -> List[Route]:
+    return [(method, re.compile(f"^{pattern}$"), handler) for method, pattern, handler in table]
+
+
+QUOTES = routes(
+    ("GET", "/", quotes_root),
+    ("GET", "/static/(.+)", quotes_static),
+    ("GET", "/health", health(quotes_service, quote_writes)),
+    ("GET", "/api/quote", get_quote),
+    ("GET", "/api/quote/search", search_quotes),
+    ("POST", "/api/quote", add_quote),
+    ("POST", "/api/quote/batch", add_quotes),
+    ("PUT", "/api/quote/batch", update_quotes),
+    ("PUT", r"/api/quote/(\d+)", update_quote),
+    ("GET", "/changes", change_feed(quotes_service)),
+    ("GET", "/replication", replication_stats(quotes_service)),
+    ("GET", "/metrics", metrics_page(quotes_service)),
+)
+FUNFACTS = routes(
+    ("GET", "/", health(funfacts_service, fact_writes)),
+    ("GET", "/funfact", get_funfact),
+    ("GET", "/funfact/search", search_funfacts),
+    ("POST", "/funfact", add_funfact),
+    ("POST", "/funfact/batch", add_funfacts),
+    ("GET", "/changes", change_feed(funfacts_service)),
+    ("GET", "/replication", replication_stats(funfacts_service)),
+    ("GET", "/metrics", metrics_page(funfacts_service)),
+)
+REFLECTIONS = routes(
+    ("GET", "/", health(reflections_service, reflection_writes)),
+    ("GET", "/reflection", get_reflections),
+    ("POST", "/reflection", add_reflection),
+    ("POST", "/reflection/batch", add_reflections),
+    ("GET", "/reflection/today", get_today_reflection),
+    ("GET", "/metrics", metrics_page(reflections_service)),
+)
+GOALS = routes(
+    ("GET", "/", health(goals_service, goal_writes)),
+    ("GET", "/goals", get_goals),
+    ("POST", "/goals", add_goal),
+    ("POST", "/goals/batch", add_goals),
+    ("PUT", r"/goals/(\d+)", complete_goal),
+    ("GET", "/metrics", metrics_page(goals_service)),
+)
+
+# Mount prefix -> routes and service module, checked in order; the quotes service also answers at the root.
+MOUNTS = [
+    ("/quotes", QUOTES, quotes_service),
+    ("/funfacts", FUNFACTS, funfacts_service),
+    ("/reflections", REFLECTIONS, reflections_service),
+    ("/goals", GOALS, goals_service),
+    ("", QUOTES, quotes_service),
+]
+
+
+def mount(path: str):
+    """The routes and service module serving ``path``, and the path within that service."""
+    for prefix, table, service in MOUNTS:
+        if path == prefix or path.startswith(prefix + "/"):
+            return table, service, path[len(prefix) :] or "/"
+
+
+def route(request: Request, table: List[Route]) -> Tuple[Optional[Callable[..., Awaitable[Response]]], tuple, List[str]]:
+    """The handler for ``request`` and its path arguments, or None and the methods the path allows."""
+    allowed = []
+    for method, pattern, handler in table:
+        match = pattern.match(request.path)
+        if match is None:
+            continue
+        if method == request.method or (method == "GET" and request.method == "HEAD"):
+            request.endpoint = handler.__name__
+            return handler, match.groups(), []
+        allowed.append(method)
+    return None, (), allowed
+
+
+async def dispatch(request: Request, table: List[Route], service) -> Response:
+    handler, arguments, allowed = route(request, table)
+    if handler is not None:
+        replication = getattr(service, "replication", None)
+        if request.method not in ("GET", "HEAD") and replication is not None and replication.role == "follower":
+            error = "This instance is a read-only replica; send writes to the leader."
+            return json_response({"error": error, "leader": replication.leader}, 405, headers={"allow": "GET, HEAD"})
+        return await handler(request, *arguments)
+    if allowed:
+        return json_response({"error": "Method not allowed"}, 405, headers={"allow": ", ".join(allowed)})
+    return json_response({"error": "Not found"}, 404)
+
+
+async def admit_request(admission, request: Request):
+    """``admission.enter()`` for ``request``; off the event loop when a concurrency gate may make it wait."""
+    client = admission.client(request.headers.get("x-api-key"), request.remote_addr)
+    if admission.gate(request.method, request.path) is None:
+        return admission.enter(request.method, request.path, client)
+    return await asyncio.to_thread(admission.enter, request.method, request.path, client)
+
+
+async def application(scope, receive, send) -> None:
+    """The ASGI entry point."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await asyncio.to_thread(close_repositories)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+    if scope["type"] != "http":
+        return
+
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        size += len(chunks[-1])
+        if size > config.MAX_CONTENT_LENGTH:
+            await respond(send, scope, json_response({"error": "Request body too large"}, 413))
+            return
+        if not message.get("more_body"):
+            break
+
+    headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+    client = scope.get("client")
+    request = Request(
+        scope["method"], scope["path"], scope["query_string"].decode("latin-1"), headers, b"".join(chunks), client[0] if client else None
+    )
+    table, service, request.path = mount(request.path)
+    start = time.perf_counter()
+    gate, refusal = await admit_request(service.admission, request)
+    try:
+        if refusal is None:
+            response = await dispatch(request, table, service)
+        else:
+            route(request, table)  # names the route for /metrics, as Flask matches it before admission
+            status, body, wait = refusal
+            response = json_response(body, status, headers={"retry-after": retry_after(wait)})
+        service.request_metrics.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - start,
+            route=request.endpoint,
+            method=request.method,
+            status=str(response.status),
+        )
+        await respond(send, scope, await compressed(request, response))
+    finally:
+        if gate is not None:
+            gate.leave()
+
+
+async def respond(send, scope, response: Response) -> None:
+    headers = [(name.encode("latin-1"), value.encode("latin-1")) for name, value in response.headers.items()]
+    head_only = scope["method"] == "HEAD"
+    if response.stream is None:
+        headers.append((b"content-length", str(len(response.body)).encode("latin-1")))
+        await send({"type": "http.response.start", "status": response.status, "headers": headers})
+        await send({"type": "http.response.body", "body": b"" if head_only else response.body})
+        return
+
+    await send({"type": "http.response.start", "status": response.status, "headers": headers})
+    while not head_only:
+        chunk = await response.stream()
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def close_repositories() -> None:
+    for service in (quotes_service, funfacts_service, reflections_service, goals_service):
+        service.repository.close()
+
+
+# Built-in server, used when uvicorn is not installed.
+
+REASONS = {
+    200: "OK",
+    201: "Created",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    501: "Not Implemented",
+}
+
+
+async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Serve HTTP/1.1 requests from one connection until it closes or sits idle for KEEPALIVE seconds.
+
+    Request bodies must come with a Content-Length; a chunked upload is answered
+    with 501 (uvicorn accepts both).
+    """
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), config.KEEPALIVE)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+                return
+            request_line, *header_lines = head[:-4].decode("latin-1").split("\r\n")
+            try:
+                method, target, version = request_line.split(" ", 2)
+                headers = [tuple(part.strip() for part in line.split(":", 1)) for line in header_lines]
+                header_map = {name.lower(): value for name, value in headers}
+                length = int(header_map.get("content-length", 0))
+            except ValueError:
+                writer.write(b"HTTP/1.1 400 Bad Request\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+                return
+            if header_map.get("transfer-encoding", "identity").lower() != "identity":
+                writer.write(b"HTTP/1.1 501 Not Implemented\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+                return
+            if length > config.MAX_CONTENT_LENGTH:
+                writer.write(b"HTTP/1.1 413 Payload Too Large\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+                return
+            try:
+                body = await reader.readexactly(length) if length else b""
+            except (asyncio.IncompleteReadError, ConnectionError):
+                return
+
+            raw_path, _, query = target.partition("?")
+            keep_alive = version == "HTTP/1.1" and header_map.get("connection", "").lower() != "close"
+            scope = {
+                "type": "http",
+                "http_version": version.removeprefix("HTTP/"),
+                "method": method.upper(),
+                "path": unquote(raw_path),
+                "raw_path": raw_path.encode("latin-1"),
+                "query_string": query.encode("latin-1"),
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+                "client": writer.get_extra_info("peername"),
+            }
+            messages = iter([{"type": "http.request", "body": body, "more_body": False}])
+            started = chunked = False
+
+            async def receive() -> dict:
+                return next(messages, {"type": "http.disconnect"})
+
+            async def send(message: dict) -> None:
+                nonlocal started, chunked
+                if message["type"] == "http.response.start":
+                    started = True
+                    status = message["status"]
+                    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+                    names = set()
+                    for name, value in message["headers"]:
+                        names.add(name.lower())
+                        lines.append(f"{name.decode('latin-1')}: {value.decode('latin-1')}")
+                    if b"content-length" not in names and status != 304:
+                        chunked = True
+                        lines.append("transfer-encoding: chunked")
+                    if not keep_alive:
+                        lines.append("connection: close")
+                    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+                elif chunked:
+                    data = message.get("body", b"")
+                    if data:
+                        writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    if not message.get("more_body"):
+                        writer.write(b"0\r\n\r\n")
+                    await writer.drain()
+                else:
+                    writer.write(message.get("body", b""))
+                    await writer.drain()
+
+            try:
+                await application(scope, receive, send)
+            except Exception as error:
+                print(f"Unhandled error for {method} {target}: {error!r}", file=sys.stderr)
+                if not started:
+                    writer.write(b"HTTP/1.1 500 Internal Server Error\r\ncontent-length: 0\r\nconnection: close\r\n\r\n")
+                # Otherwise the status line is already out: closing without the last chunk tells the client the body is cut short.
+                return
+            if not keep_alive:
+                return
+    finally:
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+
+async def serve(host: str, port: int) -> None:
+    server = await asyncio.start_server(handle_connection, host, port, backlog=2048)
+    print(f"Serving all services on http://{host}:{port}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await asyncio.to_thread(close_repositories)
+
+
+def main() -> None:
+    host, port = config.HOST, config.port("gateway")
+    try:
+        import uvicorn
+    except ImportError:
+        try:
+            asyncio.run(serve(host, port))
+        except KeyboardInterrupt:
+            pass
+        return
+    uvicorn.run(application, host=host, port=port, timeout_keep_alive=config.KEEPALIVE, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Static files and the cached HTML page of the quotes service.
+
+Files under static/ are read once and served from memory under names that carry
+a hash of their content (``style.css`` -> ``style.1a2b3c4d5e6f.css``), with
+``Cache-Control: public, max-age=31536000, immutable``. A changed file gets a
+new name, so a browser never needs to revalidate the copy it holds. Templates
+link them with ``static_url('style.css')``. The plain name is still served, but
+with no-cache and an ETag.
+
+A page is rendered once per mount point (the gateway serves the quotes app at
+``/`` and ``/quotes``) and kept as bytes with a strong ETag, so a repeat visit
+is a 304. Static files and pages keep their gzip/deflate copies alongside
+(see codec.py). With Flask's template auto-reload on (DEBUG=1), changed
+templates and files are picked up on the next request.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+import hashlib
+import mimetypes
+import posixpath
+import threading
+
+import codec
+
+# A year: the longest max-age caches are asked to honour (RFC 9111).
+IMMUTABLE_MAX_AGE = 31_536_000
+
+
+class Asset:
+    """The bytes of one file or rendered page, with its content hash and compressed copies."""
+
+    def __init__(self, name: str, body: bytes, content_type: str, mtime_ns: int = 0):
+        self.name = name
+        self.body = body
+        self.content_type = content_type
+        self.mtime_ns = mtime_ns
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        stem, suffix = posixpath.splitext(name)
+        self.fingerprinted = f"{stem}.{self.digest}{suffix}"
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        """The body in ``encoding`` when it is worth compressing, else as is, and the encoding used."""
+        if encoding is None or len(self.body) < codec.MIN_SIZE or not codec.compressible(self.content_type):
+            return self.body, None
+        body = self._encoded.get(encoding)
+        if body is None:
+            body = self._encoded[encoding] = codec.compress(self.body, encoding)
+        return body, encoding
+
+    def etag(self, encoding: Optional[str]) -> str:
+        return self.digest + (f"-{encoding}" if encoding else "")
+
+
+def content_type(name: str) -> str:
+    guessed = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    return f"{guessed}; charset=utf-8" if codec.compressible(guessed) else guessed
+
+
+class StaticAssets:
+    """The files of one static directory by plain and fingerprinted name, plus rendered pages."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self._files: Dict[str, Asset] = {}
+        self._fingerprinted: Dict[str, Asset] = {}
+        self._pages: Dict[Tuple[str, str], Asset] = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+        if directory.is_dir():
+            for path in sorted(directory.rglob("*")):
+                if path.is_file():
+                    self._load(path.relative_to(directory).as_posix())
+
+    def _load(self, name: str) -> Optional[Asset]:
+        path = self.directory / name
+        try:
+            mtime_ns = path.stat().st_mtime_ns
+            body = path.read_bytes()
+        except OSError:
+            return None
+        asset = Asset(name, body, content_type(name), mtime_ns)
+        with self._lock:
+            self._files[name] = asset
+            self._fingerprinted[asset.fingerprinted] = asset
+        return asset
+
+    def file(self, name: str, reload: bool = False) -> Optional[Asset]:
+        """The file called ``name``; with ``reload``, re-read first if it changed on disk."""
+        asset = self._files.get(name)
+        if reload and asset is not None:
+            try:
+                if (self.directory / name).stat().st_mtime_ns != asset.mtime_ns:
+                    asset = self._load(name)
+            except OSError:
+                pass
+        return asset
+
+    def url_name(self, name: str, reload: bool = False) -> str:
+        """The fingerprinted name to link ``name`` by, or ``name`` itself for a file that is not here."""
+        asset = self.file(name, reload)
+        return name if asset is None else asset.fingerprinted
+
+    def lookup(self, filename: str, reload: bool = False) -> Tuple[Optional[Asset], bool]:
+        """The asset a /static/ URL names, and whether it was asked for by its fingerprinted (immutable) name."""
+        asset = self._fingerprinted.get(filename)
+        if asset is not None:
+            return asset, True
+        return self.file(filename, reload), False
+
+    def page(self, key: Tuple[str, str], render: Callable[[], str], reload: bool = False) -> Asset:
+        """The page stored under ``key`` (template, mount point), rendered on first use or on every use with ``reload``."""
+        page = self._pages.get(key)
+        if page is None or reload:
+            body = render().encode("utf-8")
+            page = page if page is not None and page.body == body else Asset(key[0], body, content_type(key[0]))
+            with self._lock:
+                self._pages[key] = page
+                self.renders += 1
+        return page
+
+    def stats(self) -> dict:
+        return {"files": len(self._files), "bytes": sum(len(asset.body) for asset in self._files.values()), "pages": len(self._pages), "renders": self.renders}
+
+
+def asset_response(asset: Asset, immutable: bool = False):
+    """A Flask response for ``asset``, compressed for the client and answering 304 to a matching If-None-Match."""
+    from flask import current_app, request
+
+    body, encoding = asset.encoded(codec.negotiate(request.headers.get("Accept-Encoding")))
+    response = current_app.response_class(body, content_type=asset.content_type)
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.set_etag(asset.etag(encoding))
+    if immutable:
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def serve_assets(app) -> StaticAssets:
+    """Serve ``app``'s static folder from memory under fingerprinted names and give its templates static_url().
+
+    ``app`` must be created with ``static_folder=None``; this registers the
+    ``static`` endpoint instead, so url_for('static', ...) keeps working.
+    """
+    from flask import abort, current_app, url_for
+
+    assets = StaticAssets(Path(app.root_path) / "static")
+
+    def static_url(filename: str) -> str:
+        return url_for("static", filename=assets.url_name(filename, current_app.jinja_env.auto_reload))
+
+    def static(filename: str):
+        asset, immutable = assets.lookup(filename, current_app.jinja_env.auto_reload)
+        if asset is None:
+            abort(404)
+        return asset_response(asset, immutable)
+
+    app.add_template_global(static_url, "static_url")
+    app.add_url_rule("/static/<path:filename>", "static", static)
+    return assets
+
+
+def render_page(assets: StaticAssets, template: str):
+    """``template`` rendered once per mount point and served from memory with a strong ETag."""
+    from flask import current_app, render_template, request
+
+    page = assets.page((template, request.script_root), lambda: render_template(template), current_app.jinja_env.auto_reload)
+    return asset_response(page)
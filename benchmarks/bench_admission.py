@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+One client hammering POST /api/quote while another only reads, with and without admission.py limits.
+
+Each run starts serve.py quotes in a scratch copy of the project. The hammering
+client sends creates from many threads under one X-API-Key; the polite client
+reads GET /api/quote from a few threads. Both wait out a Retry-After, as HTTP
+clients should; --ignore-retry-after makes the hammering client retry at once.
+Reports the polite client's latency and the status codes each client got.
+
+Run from the project root:
+    python3 benchmarks/bench_admission.py
+    python3 benchmarks/bench_admission.py --seconds 10 --hammer-threads 64
+"""
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_serving import copy_project
+from harness import percentile
+
+PORT = 5301
+
+SETTINGS = {
+    "unlimited": {},
+    "limited": {
+        "QUOTES_RATE_LIMITS": "POST /api/quote*=20/s:20",
+        "QUOTES_API_KEYS": "hammer,polite",
+        "QUOTES_CONCURRENCY_LIMITS": "POST *=2",
+        "ADMISSION_QUEUE": "4",
+        "ADMISSION_TIMEOUT": "0.25",
+    },
+}
+
+
+def wait_until_ready(timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=1)
+            connection.request("GET", "/health")
+            connection.getresponse().read()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.05)
+    raise TimeoutError(f"server on port {PORT} did not answer within {timeout}s")
+
+
+def client(method: str, path: str, body, headers: dict, threads: int, deadline: float, backoff: bool = True) -> tuple:
+    """Latencies of successful requests and a count of every status, over ``threads`` keep-alive connections."""
+    payload = None if body is None else json.dumps(body).encode("utf-8")
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def worker() -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+        local, codes = [], Counter()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException):
+                codes["error"] += 1
+                connection.close()
+                continue
+            codes[response.status] += 1
+            retry_after = response.getheader("Retry-After")
+            if backoff and retry_after:
+                time.sleep(min(float(retry_after), max(deadline - time.perf_counter(), 0)))
+            if response.status < 400:
+                local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            statuses.update(codes)
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return sorted(latencies), statuses
+
+
+def run(name: str, args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        copy_project(Path(directory), args.size)
+        env = {**os.environ, **SETTINGS[name], "QUOTES_PORT": str(PORT), "WORKERS": "1", "DEBUG": "0"}
+        process = subprocess.Popen(
+            [sys.executable, "serve.py", "quotes", "--server", "werkzeug"],
+            cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+        try:
+            wait_until_ready()
+            deadline = time.perf_counter() + args.seconds
+            results = {}
+            hammer = threading.Thread(target=lambda: results.setdefault("hammer", client(
+                "POST", "/api/quote", {"quote": "hammered"},
+                {"Content-Type": "application/json", "X-API-Key": "hammer"}, args.hammer_threads, deadline,
+                not args.ignore_retry_after)))
+            hammer.start()
+            results["polite"] = client("GET", "/api/quote", None, {"X-API-Key": "polite"}, args.polite_threads, deadline)
+            hammer.join()
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=60)
+
+    latencies, statuses = results["polite"]
+    print(
+        f"{name:<10} polite GET p50 {percentile(latencies, 0.5) * 1000:>8.2f} ms  p99 {percentile(latencies, 0.99) * 1000:>8.2f} ms"
+        f"  {len(latencies) / args.seconds:>7.0f} rps  statuses {dict(statuses)}"
+    )
+    print(f"{'':<10} hammer POST statuses {dict(results['hammer'][1])}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--settings", nargs="+", choices=list(SETTINGS), default=list(SETTINGS))
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--size", type=int, default=50_000, help="quotes seeded, so each create rewrites a large file")
+    parser.add_argument("--hammer-threads", type=int, default=32)
+    parser.add_argument("--polite-threads", type=int, default=2)
+    parser.add_argument("--ignore-retry-after", action="store_true", help="the hammering client never backs off")
+    args = parser.parse_args()
+    for name in args.settings:
+        run(name, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Read and write throughput of the JSON, append-log and SQLite storage backends.
+Run from the project root: python3 benchmarks/bench_backends.py [--size N] [--writes N]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import STORAGE_BACKENDS, SqliteStorage, open_storage  # noqa: E402
+
+
+def seed(data_file: Path, size: int) -> None:
+    records = [{"id": i, "quote": f"quote number {i}"} for i in range(1, size + 1)]
+    with data_file.open("w", encoding="utf-8") as handle:
+        json.dump(records, handle, indent=4)
+
+
+def ops_per_second(operation, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        operation()
+    return count / (time.perf_counter() - start)
+
+
+def run(backend: str, size: int, reads: int, writes: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = Path(directory) / "quotes.json"
+        seed(data_file, size)
+        if backend == SqliteStorage.backend:
+            SqliteStorage(data_file).import_records(json.loads(data_file.read_text()))
+
+        start = time.perf_counter()
+        storage = open_storage(data_file, backend=backend)
+        len(storage.index())
+        open_ms = (time.perf_counter() - start) * 1000
+
+        get_rate = ops_per_second(lambda: storage.index().get(random.randint(1, size)), reads)
+        random_rate = ops_per_second(lambda: storage.index().random(), reads)
+
+        append_rate = ops_per_second(lambda: storage.insert({"quote": "new quote"}), writes)
+        update_rate = ops_per_second(lambda: storage.update(random.randint(1, size), {"quote": "edited quote"}), writes)
+        print(
+            f"{backend:<8} {size:>9,} {open_ms:>10.1f} {get_rate:>12,.0f} {random_rate:>12,.0f}"
+            f" {append_rate:>12,.0f} {update_rate:>12,.0f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--size", type=int, nargs="+", default=[1_000, 50_000])
+    parser.add_argument("--reads", type=int, default=20_000)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--backend", nargs="+", default=list(STORAGE_BACKENDS))
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'records':>9} {'open ms':>10} {'get/s':>12} {'random/s':>12} {'append/s':>12} {'update/s':>12}")
+    for size in args.size:
+        for backend in args.backend:
+            run(backend, size, args.reads, args.writes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Bytes on the wire and CPU time for the JSON encoders and response compression of codec.py.
+
+For GET /goals-sized payloads and batch responses it compares Flask's default
+encoding (sorted keys, standard library) with codec.dumps on the standard
+library and on orjson (when installed), then gzip and deflate of the result.
+It also compares a data file written with the old indent=4 layout against the
+compact one. CPU time is process time per call.
+
+Run from the project root:
+    python3 benchmarks/bench_encoding.py
+    python3 benchmarks/bench_encoding.py 1000 100000
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import codec  # noqa: E402
+
+SIZES = [100, 10_000, 100_000]
+
+
+def goals_payload(size: int) -> dict:
+    goals = [{"id": i, "goal": f"Read {i} pages of a good book", "completed": i % 3 == 0} for i in range(1, size + 1)]
+    return {"goals": goals, "count": size, "next_after": None}
+
+
+def batch_payload(size: int) -> dict:
+    quotes = [{"id": i, "quote": f"Quote number {i}: keep going, one step at a time."} for i in range(1, size + 1)]
+    return {"message": f"{size} quotes added successfully!", "quotes": quotes, "errors": []}
+
+
+def cpu_us(function, *args) -> tuple:
+    """The result of ``function(*args)`` and its process time per call in microseconds (best of a few runs)."""
+    best = float("inf")
+    for _ in range(3):
+        repeat = 0
+        start = time.process_time()
+        while True:
+            result = function(*args)
+            repeat += 1
+            elapsed = time.process_time() - start
+            if elapsed > 0.05:
+                break
+        best = min(best, elapsed / repeat)
+    return result, best * 1e6
+
+
+def encoders() -> dict:
+    options = {
+        "flask default": lambda obj: json.dumps(obj, sort_keys=True).encode("utf-8"),
+        "compact json": lambda obj: json.dumps(obj, sort_keys=True, separators=(",", ":")).encode("utf-8"),
+    }
+    if codec.orjson is not None:
+        options["orjson"] = lambda obj: codec.orjson.dumps(obj, option=codec.orjson.OPT_SORT_KEYS)
+    else:
+        print("# orjson is not installed; pip3 install orjson to compare it")
+    return options
+
+
+def run(name: str, payload, options: dict) -> None:
+    baseline = None
+    for encoder_name, encode in options.items():
+        body, encode_us = cpu_us(encode, payload)
+        baseline = baseline or len(body)
+        print(f"{name:<22} {encoder_name:<14} {len(body):>12,} B {encode_us:>12.1f} us  {len(body) / baseline:>6.2f}x size")
+    for encoding in codec.ENCODINGS:
+        compressed, compress_us = cpu_us(codec.compress, body, encoding)
+        print(f"{'':<22} {'+ ' + encoding:<14} {len(compressed):>12,} B {compress_us:>12.1f} us  {len(compressed) / baseline:>6.2f}x size")
+
+
+def data_file(size: int) -> None:
+    records = batch_payload(size)["quotes"]
+    pretty, pretty_us = cpu_us(lambda: json.dumps(records, indent=4).encode("utf-8"))
+    compact, compact_us = cpu_us(codec.dumps, records)
+    _, load_pretty_us = cpu_us(codec.loads, pretty)
+    _, load_compact_us = cpu_us(codec.loads, compact)
+    print(
+        f"{f'data file {size:,}':<22} indent=4 {len(pretty):>12,} B write {pretty_us:>10.1f} us read {load_pretty_us:>10.1f} us\n"
+        f"{'':<22} compact  {len(compact):>12,} B write {compact_us:>10.1f} us read {load_compact_us:>10.1f} us"
+    )
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    options = encoders()
+    print(f"# codec.py uses {codec.ENCODER}; compression level {codec.LEVEL}")
+    for size in sizes:
+        run(f"GET /goals {size:,}", goals_payload(size), options)
+        run(f"batch of {size:,}", batch_payload(size), options)
+        data_file(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Startup time and resident memory of the single gateway process versus the four standalone services.
+Linux only (reads /proc). Run from the project root: python3 benchmarks/bench_gateway.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Entry point -> URL that answers once the service is ready.
+STANDALONE = {
+    "app.py": "http://localhost:5001/health",
+    "funfacts.py": "http://localhost:5002/",
+    "reflections.py": "http://localhost:5003/",
+    "goals.py": "http://localhost:5004/",
+}
+GATEWAY = {"gateway.py": "http://localhost:5000/goals/"}
+
+
+def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return
+        except OSError:  # refused, reset, or a bare TimeoutError from the 1 s read timeout
+            time.sleep(0.02)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def process_tree(pid: int) -> list:
+    """The pid plus all its descendants (the debug reloader forks a child that serves requests)."""
+    pids = [pid]
+    for task in Path(f"/proc/{pid}/task").iterdir():
+        children = (task / "children").read_text().split()
+        for child in children:
+            pids.extend(process_tree(int(child)))
+    return pids
+
+
+def rss_kib(pid: int) -> int:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1])
+    return 0
+
+
+def measure(entry_points: dict) -> tuple:
+    start = time.monotonic()
+    processes = [
+        subprocess.Popen([sys.executable, script], cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for script in entry_points
+    ]
+    try:
+        for url in entry_points.values():
+            wait_until_ready(url)
+        startup = time.monotonic() - start
+        time.sleep(0.5)
+        rss = sum(rss_kib(pid) for process in processes for pid in process_tree(process.pid))
+        return startup, rss
+    finally:
+        for process in processes:
+            for pid in reversed(process_tree(process.pid)):
+                try:
+                    os.kill(pid, 15)
+                except ProcessLookupError:
+                    pass
+            process.wait()
+
+
+def main() -> None:
+    print(f"{'layout':<24} {'processes':>9} {'startup s':>10} {'RSS MiB':>10}")
+    for name, entry_points in (("four services", STANDALONE), ("gateway", GATEWAY)):
+        startup, rss = measure(entry_points)
+        processes = len(entry_points)
+        print(f"{name:<24} {processes:>9} {startup:>10.2f} {rss / 1024:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Concurrent write throughput of each storage backend with and without group commit.
+
+Many threads call insert() and update() at once, as request threads do under
+bursty POST traffic, and the script reports writes per second plus the batch
+sizes and commit latency the group-commit writer saw.
+Run from the project root: python3 benchmarks/bench_group_commit.py [--threads 1 16 64]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import STORAGE_BACKENDS, SqliteStorage, open_storage  # noqa: E402
+
+
+def run(backend: str, group_commit: bool, threads: int, writes: int, size: int) -> None:
+    os.environ["GROUP_COMMIT"] = "1" if group_commit else "0"
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = Path(directory) / "goals.json"
+        records = [{"id": i, "goal": f"goal number {i}", "completed": False} for i in range(1, size + 1)]
+        data_file.write_text(json.dumps(records))
+        if backend == SqliteStorage.backend:
+            SqliteStorage(data_file).import_records(records)
+        storage = open_storage(data_file, indexed_fields=("completed",), backend=backend)
+
+        def writer() -> None:
+            for position in range(writes):
+                if position % 4 == 3:
+                    storage.update(random.randint(1, size), {"completed": True})
+                else:
+                    storage.insert({"goal": "new goal", "completed": False})
+
+        workers = [threading.Thread(target=writer) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - start
+        stats = storage.stats()
+        storage.close()
+
+    rate = threads * writes / elapsed
+    line = f"{backend:<8} {'on' if group_commit else 'off':<5} {threads:>7} {rate:>12,.0f}"
+    if group_commit:
+        commits = stats["group_commits"] or 1
+        line += (
+            f" {stats['group_committed_writes'] / commits:>10.1f} {stats['group_largest_batch']:>9}"
+            f" {stats['group_commit_seconds'] / commits * 1000:>10.2f} {stats['group_slowest_commit_seconds'] * 1000:>10.2f}"
+        )
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=list(STORAGE_BACKENDS), default=list(STORAGE_BACKENDS))
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--writes", type=int, default=50, help="writes per thread")
+    parser.add_argument("--size", type=int, default=10_000, help="records seeded before each run")
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'group':<5} {'threads':>7} {'writes/s':>12} {'avg batch':>10} {'max batch':>9} {'avg ms':>10} {'max ms':>10}")
+    for backend in args.backends:
+        for threads in args.threads:
+            for group_commit in (False, True):
+                run(backend, group_commit, threads, args.writes, args.size)
+
+
+if __name__ == "__main__":
+    main()
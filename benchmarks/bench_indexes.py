@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compares the old linear-scan lookups against the RecordIndex used by the repositories.
+Run from the project root: python3 benchmarks/bench_indexes.py [sizes...]
+"""
+
+import random
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import RecordIndex  # noqa: E402
+
+SIZES = [1_000, 100_000, 1_000_000]
+
+
+def make_records(size: int) -> list:
+    return [
+        {"id": i, "date": f"day-{i}", "reflection": f"reflection number {i}"}
+        for i in range(1, size + 1)
+    ]
+
+
+def scan_by_id(records: list, record_id: int):
+    for record in records:
+        if record["id"] == record_id:
+            return record
+    return None
+
+
+def scan_by_date(records: list, date: str):
+    for record in records:
+        if record.get("date") == date:
+            return record
+    return None
+
+
+def per_call_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+
+
+def run(size: int) -> None:
+    records = make_records(size)
+    index = RecordIndex(records, unique_fields=("date",))
+    last_id = size
+    last_date = f"day-{size}"
+    scan_number = max(1, 200_000 // size)
+
+    rows = [
+        ("get by id", per_call_us(lambda: scan_by_id(records, last_id), scan_number),
+         per_call_us(lambda: index.get(last_id), 100_000)),
+        ("get by date", per_call_us(lambda: scan_by_date(records, last_date), scan_number),
+         per_call_us(lambda: index.lookup("date", last_date), 100_000)),
+        ("random", per_call_us(lambda: random.choice(list(records)), scan_number),
+         per_call_us(index.random, 100_000)),
+    ]
+    for name, before, after in rows:
+        print(f"{size:>10,}  {name:<12} {before:>12.2f} us {after:>10.3f} us {before / after:>10.0f}x")
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'records':>10}  {'operation':<12} {'scan':>15} {'index':>13} {'speedup':>11}")
+    for size in sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
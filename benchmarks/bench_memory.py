@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Memory per record of the in-memory index: the columnar RecordIndex against dict rows.
+
+"dict rows" rebuilds the layout the repositories used before RecordIndex became
+columnar: the parsed list of dicts, an id -> dict map, a sorted id list and, for
+goals, a sorted id list per completed value. Each layout is built in a fresh
+subprocess and measured with tracemalloc, so freed parser garbage is not counted.
+Run from the project root: python3 benchmarks/bench_memory.py [--size 1000000]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DATASETS = {
+    "quotes": ("lambda i: {'id': i, 'quote': f'Quote number {i}: be kind, work hard, stay curious.'}", (), ()),
+    "goals": ("lambda i: {'id': i, 'goal': f'Goal number {i}: ship it', 'completed': i % 3 == 0}", (), ("completed",)),
+    "reflections": (
+        "lambda i: {'id': i, 'date': f'{2000 + i // 366 % 500:04d}-{i % 12 + 1:02d}-{i % 28 + 1:02d}', 'reflection': f'Reflection {i}'}",
+        ("date",),
+        (),
+    ),
+}
+
+CHILD = """
+import gc, json, sys, tracemalloc
+sys.path.insert(0, {root!r})
+from storage import RecordIndex
+
+build = {build}
+text = json.dumps([build(i) for i in range(1, {size} + 1)])
+gc.collect()
+tracemalloc.start()
+records = json.loads(text)
+if {layout!r} == "dict rows":
+    by_id = {{record["id"]: record for record in records}}
+    ids = sorted(by_id)
+    groups = {{}}
+    for field in {indexed!r}:
+        values = groups[field] = {{}}
+        for record in records:
+            values.setdefault(record.get(field), []).append(record["id"])
+    keep = (records, by_id, ids, groups)
+else:
+    keep = RecordIndex(records, {unique!r}, {indexed!r})
+    records = None
+gc.collect()
+current, _ = tracemalloc.get_traced_memory()
+print(json.dumps({{"bytes": current}}))
+"""
+
+
+def measure(dataset: str, layout: str, size: int) -> float:
+    build, unique, indexed = DATASETS[dataset]
+    code = CHILD.format(root=str(ROOT), build=build, size=size, layout=layout, unique=unique, indexed=indexed)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)["bytes"] / size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    args = parser.parse_args()
+
+    print(f"{'dataset':<12} {'records':>10} {'dict rows':>12} {'columnar':>12} {'saved':>7}")
+    for dataset in args.datasets:
+        before = measure(dataset, "dict rows", args.size)
+        after = measure(dataset, "columnar", args.size)
+        print(f"{dataset:<12} {args.size:>10,} {before:>10.0f} B {after:>10.0f} B {1 - after / before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
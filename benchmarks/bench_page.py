@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Requests, bytes and time to interactive per view of the quotes HTML page.
+
+Starts serve.py quotes in a scratch copy of the project and replays page views
+from a small browser model. The model keeps an HTTP cache: it skips requests
+for responses marked immutable, revalidates no-cache ones with If-None-Match,
+and sends Accept-Encoding: gzip. Each view loads the page and its stylesheet
+and then clicks "Get Random Quote" --clicks times. Two clients are compared:
+
+    before   the original page: / rendered on every hit with no validator, the
+             stylesheet under its plain name (it used to 404 on every view),
+             and one GET /api/quote per click
+    after    the page as served now: / with an ETag, the fingerprinted
+             stylesheet, and quotes prefetched PREFETCH at a time with
+             GET /api/quote?next=K, refilled when half are used
+
+Time to interactive is the time from navigation until the page and stylesheet
+have loaded and the first quote can be shown. Requests run one after another
+on a keep-alive connection, as on a single browser connection. Both clients
+talk to today's server, so the before client's page is gzip-compressed too.
+
+Run from the project root:
+    python3 benchmarks/bench_page.py
+    python3 benchmarks/bench_page.py --views 200 --clicks 50
+"""
+
+import argparse
+import http.client
+import json
+import os
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from bench_serving import copy_project
+from harness import percentile
+
+PORT = 5302
+PREFETCH = 10  # as in templates/index.html
+
+
+class Browser:
+    """One keep-alive connection with an HTTP cache, counting requests and body bytes received."""
+
+    def __init__(self):
+        self.connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+        self.cache: Dict[str, Tuple[Optional[str], bool, bytes]] = {}
+        self.requests = 0
+        self.bytes = 0
+
+    def get(self, path: str, cacheable: bool = True) -> bytes:
+        cached = self.cache.get(path)
+        if cached is not None and cached[1]:
+            return cached[2]
+        headers = {"Accept-Encoding": "gzip", "X-Client-Id": "bench-page"}
+        if cached is not None and cached[0]:
+            headers["If-None-Match"] = cached[0]
+        self.connection.request("GET", path, headers=headers)
+        response = self.connection.getresponse()
+        body = response.read()
+        self.requests += 1
+        self.bytes += len(body)
+        if response.status == 304:
+            return cached[2]
+        control = response.getheader("Cache-Control", "")
+        etag = response.getheader("ETag")
+        if cacheable and response.status == 200 and "no-store" not in control and (etag or "immutable" in control):
+            self.cache[path] = (etag, "immutable" in control, body)
+        return body
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def stylesheets(html: bytes) -> List[str]:
+    return [match.decode("utf-8") for match in re.findall(rb'<link rel="stylesheet" href="([^"]+)"', html)]
+
+
+def view_before(browser: Browser, clicks: int) -> Tuple[float, List[float]]:
+    start = time.perf_counter()
+    browser.get("/", cacheable=False)
+    browser.get("/static/style.css", cacheable=False)
+    interactive, latencies = time.perf_counter() - start, []
+    for _ in range(clicks):
+        click = time.perf_counter()
+        browser.get("/api/quote")
+        latencies.append(time.perf_counter() - click)
+        if len(latencies) == 1:
+            interactive = time.perf_counter() - start
+    return interactive, latencies
+
+
+def view_after(browser: Browser, clicks: int) -> Tuple[float, List[float]]:
+    start = time.perf_counter()
+    html = browser.get("/")
+    for href in stylesheets(html):
+        browser.get(href)
+    upcoming = []
+
+    def prefetch() -> None:
+        upcoming.extend(json.loads(browser.get(f"/api/quote?next={PREFETCH}")).get("quotes", []))
+
+    prefetch()
+    interactive = time.perf_counter() - start
+    latencies = []
+    for _ in range(clicks):
+        click = time.perf_counter()
+        if not upcoming:
+            prefetch()
+        upcoming.pop(0)
+        latencies.append(time.perf_counter() - click)
+        if len(upcoming) < PREFETCH / 2:
+            prefetch()  # in the page this runs in the background, after the quote is shown
+    return interactive, latencies
+
+
+CLIENTS = {"before": view_before, "after": view_after}
+
+
+def wait_until_ready(timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=1)
+            connection.request("GET", "/health")
+            connection.getresponse().read()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.05)
+    raise TimeoutError(f"server on port {PORT} did not answer within {timeout}s")
+
+
+def measure(name: str, views: int, clicks: int) -> None:
+    browser = Browser()
+    view = CLIENTS[name]
+    for label in ("first view", "repeat views"):
+        requests, received, interactive, latencies = browser.requests, browser.bytes, [], []
+        count = 1 if label == "first view" else views
+        for _ in range(count):
+            ready, clicked = view(browser, clicks)
+            interactive.append(ready)
+            latencies.extend(clicked)
+        interactive.sort()
+        latencies.sort()
+        print(
+            f"{name:<7} {label:<13} {(browser.requests - requests) / count:>6.1f} requests {(browser.bytes - received) / count:>9,.0f} B"
+            f"  interactive p50 {percentile(interactive, 0.5) * 1000:>7.2f} ms"
+            f"  click p50 {percentile(latencies, 0.5) * 1000:>6.3f} ms  p99 {percentile(latencies, 0.99) * 1000:>6.3f} ms"
+        )
+    browser.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", nargs="+", choices=list(CLIENTS), default=list(CLIENTS))
+    parser.add_argument("--views", type=int, default=100, help="repeat views per client, after the first")
+    parser.add_argument("--clicks", type=int, default=20, help="'Get Random Quote' clicks per view")
+    parser.add_argument("--size", type=int, default=10_000, help="quotes seeded")
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        copy_project(Path(directory), args.size)
+        env = {**os.environ, "QUOTES_PORT": str(PORT), "WORKERS": "1", "DEBUG": "0"}
+        process = subprocess.Popen(
+            [sys.executable, "serve.py", "quotes", "--server", "werkzeug"],
+            cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+        )
+        try:
+            wait_until_ready()
+            for name in args.clients:
+                measure(name, args.views, args.clicks)
+        finally:
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
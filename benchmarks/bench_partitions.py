@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Compares reflections in one JSON file with the month partitions of partitions.py:
+start-up, today's lookup, a one-week range read and a create.
+Run from the project root: python3 benchmarks/bench_partitions.py [sizes...]
+"""
+
+import datetime
+import json
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from partitions import PartitionedStorage  # noqa: E402
+from storage import open_storage  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000]
+# One reflection every PER_DAY-th of a day, ending today.
+PER_DAY = 10
+
+
+def make_records(size: int) -> list:
+    today = datetime.date.today()
+    return [
+        {"id": i, "date": (today - datetime.timedelta(days=(size - i) // PER_DAY)).isoformat(), "reflection": f"Reflection {i}"}
+        for i in range(1, size + 1)
+    ]
+
+
+def per_call_us(stmt, number: int) -> float:
+    return min(timeit.repeat(stmt, number=number, repeat=3)) / number * 1e6
+
+
+def week_before(storage_scan) -> None:
+    end = datetime.date.today() - datetime.timedelta(days=30)
+    for _ in storage_scan((end - datetime.timedelta(days=6)).isoformat(), end.isoformat()):
+        pass
+
+
+def run(size: int) -> None:
+    today = datetime.date.today().isoformat()
+    with tempfile.TemporaryDirectory() as directory:
+        single_file = Path(directory) / "single.json"
+        partitioned_file = Path(directory) / "reflections.json"
+        text = json.dumps(make_records(size))
+        single_file.write_text(text)
+        partitioned_file.write_text(text)
+        PartitionedStorage(partitioned_file).close()  # split once, as the first service start does
+
+        start = time.perf_counter()
+        single = open_storage(single_file, unique_fields=("date",), backend="json")
+        single.index()
+        single_start = time.perf_counter() - start
+        start = time.perf_counter()
+        partitioned = PartitionedStorage(partitioned_file)
+        partitioned.lookup(today)
+        partitioned_start = time.perf_counter() - start
+
+        def single_scan(low, high):
+            return (record for record in single.index().records() if low <= record["date"] <= high)
+
+        rows = [
+            ("start-up", single_start * 1e6, partitioned_start * 1e6),
+            ("today", per_call_us(lambda: single.index().lookup("date", today), 10_000),
+             per_call_us(lambda: partitioned.lookup(today), 10_000)),
+            ("week range", per_call_us(lambda: week_before(single_scan), 3),
+             per_call_us(lambda: week_before(partitioned.scan), 30)),
+            ("create", per_call_us(lambda: single.insert({"date": today, "reflection": "new"}), 5),
+             per_call_us(lambda: partitioned.insert({"date": today, "reflection": "new"}), 5)),
+        ]
+        for name, before, after in rows:
+            print(f"{size:>10,}  {name:<12} {before:>14.1f} us {after:>12.1f} us {before / after:>9.1f}x")
+        single.close()
+        partitioned.close()
+
+
+def main() -> None:
+    sizes = [int(arg) for arg in sys.argv[1:]] or SIZES
+    print(f"{'records':>10}  {'operation':<12} {'single file':>17} {'partitions':>15} {'speedup':>10}")
+    for size in sizes:
+        run(size)
+
+
+if __name__ == "__main__":
+    main()
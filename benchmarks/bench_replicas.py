@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+One quotes leader and several read replicas (replication.py), each a separate serve.py process.
+
+Checks that followers refuse writes, that creates and updates made on the leader
+reach every follower, and how long that takes (time to visible); then compares
+GET /api/quote throughput against the leader alone with the same load spread
+round-robin over the followers, while the leader keeps taking writes.
+Exits with status 1 when a check fails.
+
+Run from the project root:
+    python3 benchmarks/bench_replicas.py
+    python3 benchmarks/bench_replicas.py --followers 4 --concurrency 32 --seconds 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+LEADER_PORT = 5201
+
+
+def copy_project(directory: Path, size: int) -> None:
+    for path in ROOT.glob("*.py"):
+        shutil.copy(path, directory)
+    shutil.copytree(ROOT / "templates", directory / "templates")
+    shutil.copytree(ROOT / "static", directory / "static")
+    records = [{"id": i, "quote": f"Quote number {i}"} for i in range(1, size + 1)]
+    (directory / "quotes.json").write_text(json.dumps(records))
+
+
+def request(port: int, method: str, path: str, body=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        payload = None if body is None else json.dumps(body).encode("utf-8")
+        connection.request(method, path, body=payload, headers={"Content-Type": "application/json"} if payload else {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b"null")
+    finally:
+        connection.close()
+
+
+def wait_until_ready(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            request(port, "GET", "/replication")
+            return
+        except (OSError, http.client.HTTPException, ValueError):
+            time.sleep(0.05)
+    raise TimeoutError(f"server on port {port} did not answer within {timeout}s")
+
+
+def offset(version: str) -> int:
+    return int(version.rpartition("-")[2] or 0)
+
+
+def wait_for_version(ports: list, version: str, timeout: float = 30.0) -> float:
+    """Seconds until every follower on ``ports`` has applied the leader's log up to ``version``."""
+    start = time.perf_counter()
+    pending = set(ports)
+    while pending:
+        if time.perf_counter() - start > timeout:
+            raise TimeoutError(f"followers {sorted(pending)} did not reach {version} within {timeout}s")
+        for port in list(pending):
+            stats = request(port, "GET", "/replication")[1]
+            if stats["version"].partition("-")[0] == version.partition("-")[0] and offset(stats["version"]) >= offset(version):
+                pending.discard(port)
+        if pending:
+            time.sleep(0.002)
+    return time.perf_counter() - start
+
+
+def leader_version() -> str:
+    return request(LEADER_PORT, "GET", "/replication")[1]["version"]
+
+
+def check(followers: list, writes: int) -> tuple:
+    """Problems found and the time-to-visible of each write."""
+    problems = []
+    status, _ = request(followers[0], "POST", "/api/quote", {"quote": "written to a follower"})
+    if status != 405:
+        problems.append(f"a follower answered a write with {status}, expected 405")
+
+    visible = []
+    for i in range(writes):
+        status, body = request(LEADER_PORT, "POST", "/api/quote", {"quote": f"replicated quote {i}"})
+        if status != 201:
+            problems.append(f"leader create failed with {status}")
+            break
+        visible.append(wait_for_version(followers, leader_version()))
+    quote_id = body["quote"]["id"]
+    request(LEADER_PORT, "PUT", f"/api/quote/{quote_id}", {"quote": "edited on the leader", "weight": 2})
+    request(LEADER_PORT, "POST", "/api/quote/batch", [{"quote": f"batch quote {i}"} for i in range(500)])
+    wait_for_version(followers, leader_version())
+
+    expected = request(LEADER_PORT, "GET", "/health")[1]["records"]
+    for port in followers:
+        records = request(port, "GET", "/health")[1]["records"]
+        if records != expected:
+            problems.append(f"follower {port} holds {records} quotes, the leader {expected}")
+        found = request(port, "GET", "/api/quote/search?q=edited")[1]["quotes"]
+        if [quote.get("weight") for quote in found if quote["id"] == quote_id] != [2]:
+            problems.append(f"follower {port} did not apply the update")
+    return problems, sorted(visible)
+
+
+def read_load(ports: list, concurrency: int, seconds: float) -> float:
+    """GET /api/quote requests per second with ``concurrency`` keep-alive clients spread over ``ports``."""
+    done = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(port: int) -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        count = 0
+        while time.perf_counter() < deadline:
+            try:
+                connection.request("GET", "/api/quote")
+                connection.getresponse().read()
+                count += 1
+            except (OSError, http.client.HTTPException):
+                connection.close()
+        with lock:
+            done[0] += count
+
+    threads = [threading.Thread(target=worker, args=(ports[n % len(ports)],)) for n in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return done[0] / (time.perf_counter() - start)
+
+
+def background_writes(stop: threading.Event, interval: float) -> None:
+    while not stop.is_set():
+        request(LEADER_PORT, "POST", "/api/quote", {"quote": "written during the read load"})
+        stop.wait(interval)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--followers", type=int, default=2)
+    parser.add_argument("--size", type=int, default=10_000, help="quotes seeded on the leader")
+    parser.add_argument("--writes", type=int, default=50, help="single creates timed until visible on every follower")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    followers = [LEADER_PORT + n for n in range(1, args.followers + 1)]
+    processes = []
+    with tempfile.TemporaryDirectory() as directory:
+        copy_project(Path(directory), args.size)
+        try:
+            for port in [LEADER_PORT] + followers:
+                env = {**os.environ, "QUOTES_PORT": str(port), "WORKERS": "1", "DEBUG": "0"}
+                if port != LEADER_PORT:
+                    env["QUOTES_REPLICATE_FROM"] = f"http://127.0.0.1:{LEADER_PORT}"
+                processes.append(subprocess.Popen(
+                    [sys.executable, "serve.py", "quotes", "--server", "werkzeug"],
+                    cwd=directory, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+                ))
+                wait_until_ready(port)
+            wait_for_version(followers, leader_version())
+
+            problems, visible = check(followers, args.writes)
+            print(f"consistency: {'OK' if not problems else '; '.join(problems)}")
+            print(
+                f"time to visible on all {len(followers)} followers: p50 {percentile(visible, 0.5) * 1000:.1f} ms"
+                f"  p99 {percentile(visible, 0.99) * 1000:.1f} ms  max {visible[-1] * 1000:.1f} ms"
+            )
+
+            stop = threading.Event()
+            writer = threading.Thread(target=background_writes, args=(stop, 0.01), daemon=True)
+            writer.start()
+            leader_rps = read_load([LEADER_PORT], args.concurrency, args.seconds)
+            replica_rps = read_load(followers, args.concurrency, args.seconds)
+            stop.set()
+            writer.join()
+            print(f"GET /api/quote, c={args.concurrency}: leader alone {leader_rps:>8.0f} rps   "
+                  f"{len(followers)} followers {replica_rps:>8.0f} rps   {replica_rps / leader_rps:.2f}x")
+            for port in followers:
+                stats = request(port, "GET", "/replication")[1]
+                print(f"follower {port}: applied {stats['applied']}  snapshots {stats['snapshots']}  "
+                      f"lag {stats['lag_seconds'] * 1000:.1f} ms  behind {stats['behind_bytes']} bytes  errors {stats['errors']}")
+        finally:
+            for process in processes:
+                os.killpg(process.pid, signal.SIGTERM)
+            for process in processes:
+                process.wait(timeout=60)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Query latency of the inverted search index against corpus size, next to the linear substring scan it replaces.
+
+Each corpus is made of random quote-like sentences over a Zipf-shaped vocabulary,
+so common terms have long posting lists and rare ones short lists. The script
+reports index build, save and load times, then p50/p99 latency per query kind.
+Run from the project root: python3 benchmarks/bench_search.py [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import itertools
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from harness import percentile  # noqa: E402
+from search import SearchIndex, parse_query  # noqa: E402
+
+VOCABULARY = [f"word{rank}" for rank in range(1, 20_001)]
+CUMULATIVE_WEIGHTS = list(itertools.accumulate(1 / rank for rank in range(1, len(VOCABULARY) + 1)))
+
+QUERIES = {
+    "common term": lambda: "word1",
+    "rare term": lambda: f"word{random.randint(1000, 20_000)}",
+    "two terms": lambda: f"word{random.randint(1, 50)} word{random.randint(50, 500)}",
+    "prefix": lambda: f"word{random.randint(100, 999)}*",
+}
+
+
+def make_records(size: int) -> list:
+    random.seed(size)
+    return [
+        {"id": i, "quote": " ".join(random.choices(VOCABULARY, cum_weights=CUMULATIVE_WEIGHTS, k=12))}
+        for i in range(1, size + 1)
+    ]
+
+
+def linear_search(records: list, query: str, limit: int) -> list:
+    """The obvious alternative: substring-match every term against every record."""
+    terms = [term.rstrip("*") for term in parse_query(query)]
+    matches = [record for record in records if all(term in record["quote"] for term in terms)]
+    return matches[:limit]
+
+
+def timed(function, repeat: int) -> list:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=200, help="queries per kind")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'records':>10} {'query':<12} {'index p50 ms':>13} {'index p99 ms':>13} {'scan p50 ms':>12}")
+    for size in args.sizes:
+        records = make_records(size)
+        with tempfile.TemporaryDirectory() as directory:
+            index = SearchIndex(Path(directory) / "quotes.search", "quote")
+            start = time.perf_counter()
+            index.rebuild(records, "v1")
+            built = time.perf_counter() - start
+            start = time.perf_counter()
+            index.save()
+            saved = time.perf_counter() - start
+            start = time.perf_counter()
+            SearchIndex(index.index_file, "quote").load("v1")
+            loaded = time.perf_counter() - start
+            print(f"# {size:,} records: build {built:.2f}s, save {saved:.2f}s, load {loaded:.2f}s, {index.stats()['terms']:,} terms")
+
+        for kind, make_query in QUERIES.items():
+            queries = [make_query() for _ in range(args.repeat)]
+            indexed = timed(lambda: index.search(queries.pop(), args.limit), args.repeat)
+            scan_queries = [make_query() for _ in range(max(3, args.repeat // 50))]
+            scanned = timed(lambda: linear_search(records, scan_queries.pop(), args.limit), len(scan_queries))
+            print(
+                f"{size:>10,} {kind:<12} {percentile(indexed, 0.5):>13.3f} {percentile(indexed, 0.99):>13.3f}"
+                f" {percentile(scanned, 0.5):>12.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
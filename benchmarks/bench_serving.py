@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Throughput of the quotes service under the Flask debug server versus serve.py.
+
+Each server runs as a subprocess from a scratch copy of the project (so the
+benchmark's writes never touch the real data files) and is driven with
+keep-alive HTTP/1.1 connections from several client threads.
+
+Run from the project root:
+    python3 benchmarks/bench_serving.py
+    python3 benchmarks/bench_serving.py --concurrency 1 16 64 --seconds 10
+"""
+
+import argparse
+import http.client
+import json
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from harness import percentile
+
+ROOT = Path(__file__).resolve().parent.parent
+PORT = 5101
+
+# Name -> command run inside the scratch copy of the project.
+SERVERS = {
+    "debug": [sys.executable, "app.py"],
+    "serve-werkzeug": [sys.executable, "serve.py", "quotes", "--server", "werkzeug"],
+    "serve-gunicorn": [sys.executable, "serve.py", "quotes", "--server", "gunicorn"],
+}
+
+ENDPOINTS = [
+    ("GET", "/api/quote", None),
+    ("POST", "/api/quote", {"quote": "A benchmark quote"}),
+]
+
+
+def copy_project(directory: Path, size: int) -> None:
+    for path in ROOT.glob("*.py"):
+        shutil.copy(path, directory)
+    shutil.copytree(ROOT / "templates", directory / "templates")
+    shutil.copytree(ROOT / "static", directory / "static")
+    records = [{"id": i, "quote": f"Quote number {i}"} for i in range(1, size + 1)]
+    (directory / "quotes.json").write_text(json.dumps(records))
+
+
+def wait_until_ready(timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=1)
+            connection.request("GET", "/health")
+            connection.getresponse().read()
+            return
+        except (OSError, http.client.HTTPException):
+            time.sleep(0.05)
+    raise TimeoutError(f"server on port {PORT} did not answer within {timeout}s")
+
+
+def load(method: str, path: str, body, concurrency: int, seconds: float) -> dict:
+    payload = None if body is None else json.dumps(body).encode("utf-8")
+    headers = {"Content-Type": "application/json"} if payload is not None else {}
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker() -> None:
+        connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=30)
+        local, failed = [], 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 500:
+                    failed += 1
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                continue
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "errors": errors[0],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--servers", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--seconds", type=float, default=5.0, help="load duration per endpoint and concurrency")
+    parser.add_argument("--size", type=int, default=10_000, help="quotes seeded before each run")
+    args = parser.parse_args()
+
+    for name in args.servers:
+        if name == "serve-gunicorn" and shutil.which("gunicorn") is None:
+            print(f"{name:<16} skipped: gunicorn is not installed")
+            continue
+        with tempfile.TemporaryDirectory() as directory:
+            copy_project(Path(directory), args.size)
+            env = {**os.environ, "QUOTES_PORT": str(PORT), "DEBUG": "1" if name == "debug" else "0"}
+            process = subprocess.Popen(
+                SERVERS[name],
+                cwd=directory,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+            )
+            try:
+                wait_until_ready()
+                for method, path, body in ENDPOINTS:
+                    for concurrency in args.concurrency:
+                        stats = load(method, path, body, concurrency, args.seconds)
+                        print(
+                            f"{name:<16} {method + ' ' + path:<16} c={concurrency:<3} {stats['rps']:>8.0f} rps  "
+                            f"p50 {stats['p50_ms']:>7.2f}  p95 {stats['p95_ms']:>7.2f} ms  errors {stats['errors']}"
+                        )
+            finally:
+                # The debug reloader and gunicorn both fork children; stop the whole group.
+                os.killpg(process.pid, signal.SIGTERM)
+                process.wait(timeout=60)
+
+
+if __name__ == "__main__":
+    main()
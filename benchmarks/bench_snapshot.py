@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Cold-start time and resident memory of each storage backend, including the mapped binary snapshot.
+
+Every measurement runs in a fresh subprocess that opens a pre-built quotes dataset,
+serves a few hundred random quotes and reports open time and the RSS increase. For
+the mapped snapshot most resident pages are shared, reclaimable page cache (the
+kernel maps neighbouring cached pages on each fault), so private memory is shown too.
+Linux only (reads /proc). Run from the project root:
+    python3 benchmarks/bench_snapshot.py [--sizes 100000 1000000]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from snapshot import snapshot_path, write_snapshot  # noqa: E402
+from storage import SqliteStorage  # noqa: E402
+
+BACKENDS = ["json", "log", "sqlite", "mmap"]
+
+# Runs in the child: open the storage, touch it, print timings and RSS as JSON.
+CHILD = """
+import json, os, sys, time
+sys.path.insert(0, {root!r})
+os.environ["GROUP_COMMIT"] = "0"
+
+def rss_kib():
+    # Resident and private (resident minus file-backed pages) memory in KiB.
+    with open("/proc/self/statm") as handle:
+        resident, shared = (int(pages) for pages in handle.read().split()[1:3])
+    page_kib = os.sysconf("SC_PAGE_SIZE") // 1024
+    return resident * page_kib, (resident - shared) * page_kib
+
+from storage import open_storage
+before = rss_kib()
+start = time.perf_counter()
+storage = open_storage(__import__("pathlib").Path({data_file!r}), backend={backend!r})
+index = storage.index()
+count = len(index)
+opened = time.perf_counter() - start
+start = time.perf_counter()
+for _ in range(500):
+    index.random()
+served = time.perf_counter() - start
+after = rss_kib()
+print(json.dumps({{"count": count, "open_s": opened, "random_us": served / 500 * 1e6,
+                  "rss_kib": after[0] - before[0], "private_kib": after[1] - before[1]}}))
+"""
+
+
+def prepare(directory: Path, size: int) -> Path:
+    data_file = directory / "quotes.json"
+    records = [{"id": i, "quote": f"Quote number {i}: " + "wisdom " * 8} for i in range(1, size + 1)]
+    with data_file.open("w", encoding="utf-8") as handle:
+        json.dump(records, handle, indent=4)
+    SqliteStorage(data_file).import_records(records)
+    write_snapshot(snapshot_path(data_file), records)
+    return data_file
+
+
+def measure(data_file: Path, backend: str) -> dict:
+    code = CHILD.format(root=str(ROOT), data_file=str(data_file), backend=backend)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=BACKENDS)
+    args = parser.parse_args()
+
+    print(f"{'backend':<8} {'records':>10} {'open ms':>10} {'random us':>10} {'rss MiB':>9} {'private MiB':>12}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            start = time.perf_counter()
+            data_file = prepare(Path(directory), size)
+            print(f"# {size:,} records prepared in {time.perf_counter() - start:.1f}s")
+            for backend in args.backends:
+                result = measure(data_file, backend)
+                print(
+                    f"{backend:<8} {result['count']:>10,} {result['open_s'] * 1000:>10.1f}"
+                    f" {result['random_us']:>10.1f} {result['rss_kib'] / 1024:>9.1f} {result['private_kib'] / 1024:>12.1f}"
+                )
+                # The log backend leaves a snapshot next to the data file; start each backend from the same state.
+                for leftover in data_file.parent.glob("quotes.snapshot.json"):
+                    os.remove(leftover)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Conformance and performance checks that every storage engine and cache policy must pass.
+
+Runs the same scenario through a Repository on each engine (storage.STORAGE_BACKENDS)
+under each cache policy (repository.CACHE_POLICIES): id assignment, lookups, filtered
+scans, updates, version tokens, concurrent creates and reopening the data, and keeps
+the search index of a TextRepository in step with repeated edits of one record. Then times
+the common operations on a seeded dataset against fixed budgets.
+Exits with status 1 when a check fails or an operation is over budget.
+Run from the project root:
+    python3 benchmarks/conformance.py
+    python3 benchmarks/conformance.py --backends json sqlite --policies ttl --size 50000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ["NOTES_CACHE_TTL"] = "0.05"
+
+from repository import CACHE_POLICIES, Repository, TextRepository  # noqa: E402
+from storage import STORAGE_BACKENDS, MemoryStorage, SqliteStorage  # noqa: E402
+
+# Median microseconds per call allowed at the default --size.
+BUDGETS = {
+    "get by id": 500,
+    "lookup by field": 500,
+    "count": 5_000,
+    "page of 50": 10_000,
+    "version": 500,
+    "create": 250_000,
+}
+
+
+class NoteRepository(Repository):
+    """The smallest useful repository: a unique title and an indexed flag."""
+
+    service = "notes"
+    unique_fields = ("title",)
+    indexed_fields = ("done",)
+
+    def new_record(self, text: str) -> dict:
+        return {"title": text, "done": False}
+
+    def finish(self, note_ids: list) -> list:
+        return self._apply_updates([(note_id, {"done": True}) for note_id in note_ids])
+
+    def index(self):
+        return self._index()
+
+
+class JotRepository(TextRepository):
+    """A searchable text per record, edited in place."""
+
+    service = "jots"
+    text_field = "text"
+
+    def rewrite(self, edits: list) -> list:
+        return self._apply_updates([(jot_id, {"text": text}) for jot_id, text in edits])
+
+
+class Checks:
+    def __init__(self):
+        self.problems = []
+
+    def expect(self, condition: bool, message: str) -> None:
+        if not condition:
+            self.problems.append(message)
+
+
+def ids(records) -> list:
+    return [record["id"] if record else None for record in records]
+
+
+def conformance(backend: str, policy: str, directory: Path) -> list:
+    data_file = directory / "notes.json"
+    checks = Checks()
+    expect = checks.expect
+    repository = NoteRepository(data_file, backend, policy)
+
+    expect(repository.count() == 0, "a new dataset is not empty")
+    empty_version = repository.version()[0]
+    first = repository.create("alpha")
+    expect(first == {"id": 1, "title": "alpha", "done": False}, f"create returned {first}")
+    expect(ids(repository.create_many(["beta", "gamma", "delta"])) == [2, 3, 4], "batch ids are not consecutive")
+    expect(repository.version()[0] != empty_version, "version token unchanged by writes")
+    expect(ids(repository.get_all()) == [1, 2, 3, 4], "get_all is not in id order")
+
+    index = repository.index()
+    expect((index.get(3) or {}).get("title") == "gamma", "get by id returned the wrong record")
+    expect(index.get(99) is None, "get of an unknown id is not None")
+    expect((index.lookup("title", "delta") or {}).get("id") == 4, "lookup by unique field failed")
+    copy = index.get(1)
+    copy["title"] = "changed"
+    expect(repository.index().get(1)["title"] == "alpha", "returned records are not copies")
+
+    version = repository.version()[0]
+    expect(ids(repository.finish([2, 4, 99])) == [2, 4, None], "update results do not match the requested ids")
+    expect(repository.version()[0] != version, "version token unchanged by an update")
+    index = repository.index()
+    expect(index.get(2)["done"] is True, "update was not applied")
+    expect(index.count("done", True) == 2 and index.count("done", False) == 2, "filtered counts are wrong")
+    expect(ids(index.scan(0, "done", False)) == [1, 3], "filtered scan is wrong")
+    expect(ids(index.scan(2)) == [3, 4], "scan after an id is wrong")
+    sample = ids(index.sample(3))
+    expect(len(set(sample)) == 3 and set(sample) <= {1, 2, 3, 4}, "sample is not distinct records")
+
+    created, lock = [], threading.Lock()
+
+    def create_some(thread_number: int) -> None:
+        for i in range(25):
+            record = repository.create(f"thread {thread_number} note {i}")
+            with lock:
+                created.append(record["id"])
+
+    workers = [threading.Thread(target=create_some, args=(n,)) for n in range(8)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    expect(len(set(created)) == 200 and min(created) > 4, "concurrent creates shared or reused ids")
+    expect(repository.count() == 204, f"{repository.count()} records after concurrent creates, expected 204")
+
+    if backend != MemoryStorage.backend:
+        other = NoteRepository(data_file, backend, policy)
+        expect(ids(other.get_all()) == ids(repository.get_all()), "a second instance sees different records")
+        repository.create("from the first instance")
+        time.sleep(0.1)  # longer than NOTES_CACHE_TTL
+        expect(other.count() == 205, "a second instance does not see new records")
+        expect(other.version()[0] == repository.version()[0], "instances disagree on the version")
+        other.close()
+        repository.close()
+        reopened = NoteRepository(data_file, backend, policy)
+        expect(reopened.count() == 205, "records were lost on reopen")
+        expect(reopened.index().get(4)["done"] is True, "updates were lost on reopen")
+        expect(reopened.create("after reopen")["id"] == 206, "ids restart after reopen")
+        reopened.close()
+    else:
+        repository.close()
+    return checks.problems + search_conformance(backend, policy, directory)
+
+
+def search_conformance(backend: str, policy: str, directory: Path) -> list:
+    """Edits of one record, in one batch or from concurrent threads, leave only its final text searchable."""
+    checks = Checks()
+    expect = checks.expect
+    repository = JotRepository(directory / "jots.json", backend, policy)
+    first, second = ids(repository.create_many(["plain words", "other words"]))
+    repository.search("words", 10)  # builds the index, so the edits below go through SearchIndex.replace()
+
+    repository.rewrite([(first, "zebra stripes"), (first, "plain text now")])
+    expect(repository.search("zebra", 10)[1] == 0, "a record edited twice in one batch still matches its middle text")
+    expect(ids(repository.search("plain", 10)[0]) == [first], "a record edited twice in one batch lost its final text")
+
+    def rewrite_some(thread_number: int) -> None:
+        for i in range(20):
+            repository.rewrite([(second, f"racer{thread_number} lap{i}")])
+
+    workers = [threading.Thread(target=rewrite_some, args=(n,)) for n in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    final = repository.search("racer*", 10)[0]
+    expect(ids(final) == [second], "a record edited by concurrent threads is no longer searchable")
+    stale = [
+        term
+        for term in [f"racer{n}" for n in range(4)] + [f"lap{i}" for i in range(20)]
+        if repository.search(term, 10)[1] and term not in final[0]["text"].split()
+    ]
+    expect(not stale, f"concurrent edits left stale search terms {stale}")
+    repository.close()
+    return checks.problems
+
+
+def median_us(operation, count: int) -> float:
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        operation()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1e6
+
+
+def performance(backend: str, policy: str, directory: Path, size: int, calls: int) -> dict:
+    data_file = directory / "notes.json"
+    records = [{"id": i, "title": f"note {i}", "done": i % 3 == 0} for i in range(1, size + 1)]
+    data_file.write_text(json.dumps(records))
+    if backend == SqliteStorage.backend:
+        SqliteStorage(data_file, NoteRepository.unique_fields, NoteRepository.indexed_fields).import_records(records)
+    repository = NoteRepository(data_file, backend, policy)
+    try:
+        last = size
+        return {
+            "get by id": median_us(lambda: repository.index().get(last), calls),
+            "lookup by field": median_us(lambda: repository.index().lookup("title", f"note {last}"), calls),
+            "count": median_us(repository.count, calls),
+            "page of 50": median_us(lambda: list(islice(repository.index().scan(size // 2, "done", False), 50)), calls),
+            "version": median_us(repository.version, calls),
+            "create": median_us(lambda: repository.create("new note"), max(5, calls // 100)),
+        }
+    finally:
+        repository.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=list(STORAGE_BACKENDS), default=list(STORAGE_BACKENDS))
+    parser.add_argument("--policies", nargs="+", choices=list(CACHE_POLICIES), default=list(CACHE_POLICIES))
+    parser.add_argument("--size", type=int, default=10_000, help="records seeded for the timings")
+    parser.add_argument("--calls", type=int, default=1_000, help="calls timed per read operation")
+    args = parser.parse_args()
+
+    failed = False
+    for backend in args.backends:
+        for policy in args.policies:
+            with tempfile.TemporaryDirectory() as directory:
+                problems = conformance(backend, policy, Path(directory))
+            print(f"{backend:<8} {policy:<9} conformance: {'OK' if not problems else '; '.join(problems)}")
+            with tempfile.TemporaryDirectory() as directory:
+                timings = performance(backend, policy, Path(directory), args.size, args.calls)
+            for operation, elapsed in timings.items():
+                over = elapsed > BUDGETS[operation]
+                problems.extend([f"{operation} over budget"] if over else [])
+                print(f"{'':<18} {operation:<16} {elapsed:>12.1f} us  budget {BUDGETS[operation]:>9,} us  {'SLOW' if over else 'OK'}")
+            failed = failed or bool(problems)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
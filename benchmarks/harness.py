@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for every service endpoint.
+
+Drives app.py, funfacts.py, reflections.py and goals.py through Flask's test client
+and/or a real local WSGI server, at several dataset sizes and concurrency levels,
+and reports p50/p95/p99 latency, requests per second and peak RSS per endpoint.
+
+Run from the project root:
+    python3 benchmarks/harness.py --output results.json
+    python3 benchmarks/harness.py --output new.json --compare results.json --threshold 0.15
+
+Compare mode exits with status 1 when any endpoint's p95 latency or throughput is
+worse than the baseline by more than the threshold.
+"""
+
+import argparse
+import http.client
+import importlib
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Service -> (module, repository class, data file name, seed record builder)
+SERVICES = {
+    "quotes": ("app", "QuoteRepository", "quotes.json", lambda i: {"quote": f"Quote number {i}"}),
+    "funfacts": ("funfacts", "FunFactRepository", "funfacts.json", lambda i: {"fact": f"Fact number {i}"}),
+    "reflections": (
+        "reflections",
+        "ReflectionRepository",
+        "reflections.json",
+        lambda i: {"date": f"2000-01-{i % 28 + 1:02d}", "reflection": f"Reflection number {i}"},
+    ),
+    "goals": ("goals", "GoalRepository", "goals.json", lambda i: {"goal": f"Goal number {i}", "completed": i % 3 == 0}),
+}
+
+# Service -> [(method, path, JSON body)]
+ENDPOINTS = {
+    "quotes": [
+        ("GET", "/health", None),
+        ("GET", "/api/quote", None),
+        ("GET", "/api/quote?count=10", None),
+        ("POST", "/api/quote", {"quote": "A benchmark quote"}),
+        ("PUT", "/api/quote/1", {"quote": "An edited benchmark quote"}),
+    ],
+    "funfacts": [
+        ("GET", "/", None),
+        ("GET", "/funfact", None),
+        ("POST", "/funfact", {"fact": "A benchmark fact"}),
+    ],
+    "reflections": [
+        ("GET", "/", None),
+        ("GET", "/reflection/today", None),
+        ("GET", "/reflection?from=2000-01-01&to=2000-01-07", None),
+        ("POST", "/reflection", {"reflection": "A benchmark reflection"}),
+    ],
+    "goals": [
+        ("GET", "/", None),
+        ("GET", "/goals?limit=50", None),
+        ("GET", "/goals?completed=false&limit=50", None),
+        ("GET", "/goals", None),
+        ("POST", "/goals", {"goal": "A benchmark goal"}),
+        ("PUT", "/goals/1", None),
+    ],
+}
+
+
+def current_rss_kib() -> int:
+    """Resident set size right now (Linux), falling back to the peak reported by getrusage."""
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except (OSError, ValueError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if platform.system() == "Darwin" else peak
+
+
+class RssSampler:
+    """Samples RSS on a background thread and keeps the highest value seen."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = current_rss_kib()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, current_rss_kib())
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_kib())
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[position]
+
+
+def load_service(service: str, directory: Path, size: int):
+    """Import a service and point its repository at a freshly seeded data file."""
+    from storage import open_storage
+
+    module_name, repository_class, file_name, build = SERVICES[service]
+    module = importlib.import_module(module_name)
+    data_file = directory / file_name
+    seed_storage = open_storage(data_file, backend="json")
+    seed_storage.insert_many([build(i) for i in range(1, size + 1)])
+    module.repository = getattr(module, repository_class)(data_file)
+    return module
+
+
+class TestClientDriver:
+    name = "client"
+
+    def __init__(self, app):
+        self.app = app
+
+    def connect(self):
+        return self.app.test_client()
+
+    @staticmethod
+    def request(client, method: str, path: str, body) -> int:
+        response = client.open(path, method=method, json=body)
+        response.get_data()  # a streamed body is only produced while it is read
+        response.close()
+        return response.status_code
+
+    def close(self) -> None:
+        pass
+
+
+class ServerDriver:
+    """Serves the app from a threaded Werkzeug server with HTTP/1.1 keep-alive."""
+
+    name = "server"
+
+    def __init__(self, app):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+
+        class KeepAliveHandler(WSGIRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_request(self, *args, **kwargs):
+                pass
+
+        self.server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=KeepAliveHandler)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def connect(self):
+        return http.client.HTTPConnection("127.0.0.1", self.port, timeout=30)
+
+    @staticmethod
+    def request(connection, method: str, path: str, body) -> int:
+        payload = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+        except (http.client.HTTPException, ConnectionError):
+            connection.close()
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def close(self) -> None:
+        self.server.shutdown()
+
+
+def run_endpoint(driver, method: str, path: str, body, concurrency: int, requests_per_worker: int) -> dict:
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def worker() -> None:
+        client = driver.connect()
+        local = []
+        local_statuses = {}
+        for _ in range(requests_per_worker):
+            start = time.perf_counter()
+            status = driver.request(client, method, path, body)
+            local.append(time.perf_counter() - start)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+            for status, count in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    with RssSampler() as sampler:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "peak_rss_kib": sampler.peak,
+    }
+
+
+def run(args) -> dict:
+    os.environ["STORAGE_BACKEND"] = args.backend
+    drivers = {"client": TestClientDriver, "server": ServerDriver}
+    results = []
+    for size in args.sizes:
+        for service in args.services:
+            with tempfile.TemporaryDirectory() as directory:
+                module = load_service(service, Path(directory), size)
+                for mode in args.modes:
+                    driver = drivers[mode](module.app)
+                    try:
+                        for method, path, body in ENDPOINTS[service]:
+                            for concurrency in args.concurrency:
+                                stats = run_endpoint(driver, method, path, body, concurrency, args.requests)
+                                result = {
+                                    "service": service,
+                                    "endpoint": f"{method} {path}",
+                                    "mode": mode,
+                                    "size": size,
+                                    "concurrency": concurrency,
+                                    **stats,
+                                }
+                                results.append(result)
+                                print_result(result)
+                    finally:
+                        driver.close()
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "backend": args.backend,
+        "results": results,
+    }
+
+
+def result_key(result: dict) -> tuple:
+    return (result["service"], result["endpoint"], result["mode"], result["size"], result["concurrency"])
+
+
+def print_result(result: dict) -> None:
+    print(
+        f"{result['service']:<12} {result['endpoint']:<36} {result['mode']:<7} {result['size']:>8} "
+        f"c={result['concurrency']:<3} {result['rps']:>9.0f} rps  p50 {result['p50_ms']:>7.2f}  "
+        f"p95 {result['p95_ms']:>7.2f}  p99 {result['p99_ms']:>7.2f} ms  rss {result['peak_rss_kib'] / 1024:>7.1f} MiB"
+    )
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """List the endpoints whose p95 latency rose, or throughput fell, by more than ``threshold``."""
+    previous = {result_key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(result_key(result))
+        if old is None:
+            continue
+        label = " ".join(str(part) for part in result_key(result))
+        if old["p95_ms"] and result["p95_ms"] > old["p95_ms"] * (1 + threshold):
+            regressions.append(f"{label}: p95 {old['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if old["rps"] and result["rps"] < old["rps"] * (1 - threshold):
+            regressions.append(f"{label}: {old['rps']:.0f} -> {result['rps']:.0f} rps")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", nargs="+", choices=list(SERVICES), default=list(SERVICES))
+    parser.add_argument("--modes", nargs="+", choices=["client", "server"], default=["client", "server"])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 10_000])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200, help="requests per worker thread")
+    parser.add_argument("--backend", default=os.environ.get("STORAGE_BACKEND", "json"))
+    parser.add_argument("--output", type=Path, help="write results as JSON to this file")
+    parser.add_argument("--compare", type=Path, help="baseline results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (default 0.10)")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+        print(f"\nWrote {len(report['results'])} results to {args.output}")
+
+    if args.compare:
+        regressions = compare(report, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions against {args.compare} (threshold {args.threshold:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Fires many concurrent creates from several processes and threads at once and checks
+that no record is lost or shares an id with another.
+Run from the project root:
+    python3 benchmarks/stress_writes.py                      # all four services via the Flask test client
+    python3 benchmarks/stress_writes.py --target storage     # storage backends only, no Flask needed
+Use --backend json|log|sqlite to choose the storage backend.
+"""
+
+import argparse
+import importlib
+import os
+import sys
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from storage import open_storage  # noqa: E402
+
+# Service name -> (module, repository class, create route, payload field, response key)
+SERVICES = {
+    "quotes": ("app", "QuoteRepository", "/api/quote", "quote", "quote"),
+    "funfacts": ("funfacts", "FunFactRepository", "/funfact", "fact", "fact"),
+    "reflections": ("reflections", "ReflectionRepository", "/reflection", "reflection", "reflection"),
+    "goals": ("goals", "GoalRepository", "/goals", "goal", "goal"),
+}
+
+
+def run_threads(create, threads: int, per_thread: int) -> list:
+    ids = []
+    lock = threading.Lock()
+
+    def work(thread_number: int) -> None:
+        for i in range(per_thread):
+            record_id = create(f"stress {os.getpid()}-{thread_number}-{i}")
+            with lock:
+                ids.append(record_id)
+
+    workers = [threading.Thread(target=work, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return ids
+
+
+def service_worker(service: str, data_file: str, threads: int, per_thread: int) -> list:
+    module_name, repository_class, route, field, response_key = SERVICES[service]
+    module = importlib.import_module(module_name)
+    module.repository = getattr(module, repository_class)(Path(data_file))
+    client = module.app.test_client()
+
+    def create(text: str) -> int:
+        response = client.post(route, json={field: text})
+        assert response.status_code == 201, response.get_data(as_text=True)
+        return response.get_json()[response_key]["id"]
+
+    return run_threads(create, threads, per_thread)
+
+
+def storage_worker(service: str, data_file: str, threads: int, per_thread: int) -> list:
+    field = SERVICES[service][3]
+    storage = open_storage(Path(data_file))
+    return run_threads(lambda text: storage.insert({field: text})["id"], threads, per_thread)
+
+
+def stored_ids(service: str, data_file: Path, worker) -> list:
+    """Ids of every stored record, read back the way ``worker`` wrote them."""
+    if worker is storage_worker:
+        return [record["id"] for record in open_storage(data_file).load()]
+    module_name, repository_class = SERVICES[service][:2]
+    repository = getattr(importlib.import_module(module_name), repository_class)(data_file)
+    try:
+        return [record["id"] for record in repository.get_all()]
+    finally:
+        repository.close()
+
+
+def stress(service: str, worker, processes: int, threads: int, per_thread: int) -> bool:
+    with tempfile.TemporaryDirectory() as directory:
+        data_file = Path(directory) / f"{service}.json"
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [pool.submit(worker, service, str(data_file), threads, per_thread) for _ in range(processes)]
+            created = [record_id for future in futures for record_id in future.result()]
+
+        stored = stored_ids(service, data_file, worker)
+        expected = processes * threads * per_thread
+        problems = []
+        if len(set(created)) != len(created):
+            problems.append(f"{len(created) - len(set(created))} duplicate ids handed out")
+        if len(stored) != expected:
+            problems.append(f"{len(stored)} records stored, expected {expected}")
+        if len(set(stored)) != len(stored):
+            problems.append(f"{len(stored) - len(set(stored))} duplicate ids stored")
+        if set(created) - set(stored):
+            problems.append(f"{len(set(created) - set(stored))} acknowledged creates missing")
+        print(f"{service:<12} {expected:>6} creates: {'OK' if not problems else '; '.join(problems)}")
+        return not problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--target", choices=["services", "storage"], default="services")
+    parser.add_argument("--backend", default=os.environ.get("STORAGE_BACKEND", "json"))
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--per-thread", type=int, default=40)
+    parser.add_argument("--service", nargs="+", default=list(SERVICES))
+    args = parser.parse_args()
+
+    os.environ["STORAGE_BACKEND"] = args.backend
+    worker = service_worker if args.target == "services" else storage_worker
+    results = [stress(service, worker, args.processes, args.threads, args.per_thread) for service in args.service]
+    if not all(results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
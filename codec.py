@@ -0,0 +1,130 @@
+"""
+JSON encoding and HTTP compression shared by the storage files, the Flask services and asgi.py.
+
+JSON goes through orjson when it is installed (``pip3 install orjson``) and
+the standard library otherwise; JSON_ENCODER=json forces the standard library.
+Both produce compact output. Data files are written compactly unless
+PRETTY_JSON=1 asks for the old four-space indented layout; either reads back
+the same.
+
+Responses are compressed with gzip or deflate (zlib only, no extra packages)
+when the client's Accept-Encoding allows it, the content type is text or JSON
+and the body is at least COMPRESS_MIN_SIZE bytes. Streamed bodies are always
+compressed when the client accepts it. COMPRESSION=0 turns this off.
+
+Nothing here imports Flask; httpcache.py adapts it to Flask responses and
+asgi.py uses it directly, so both send the same bytes.
+"""
+
+from typing import Any, Iterable, Iterator, List, Optional
+import json
+import os
+import zlib
+
+import config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.environ.get("JSON_ENCODER", "auto").strip().lower() == "json":
+    orjson = None
+
+ENCODER = "orjson" if orjson is not None else "json"
+PRETTY = config.env_bool("PRETTY_JSON", False)
+COMPRESSION = config.env_bool("COMPRESSION", True)
+MIN_SIZE = config.env_int("COMPRESS_MIN_SIZE", 1024)
+LEVEL = config.env_int("COMPRESS_LEVEL", 6)
+
+# Encoding -> zlib wbits: a gzip wrapper, or the zlib wrapper that HTTP calls "deflate".
+ENCODINGS = {"gzip": 31, "deflate": 15}
+COMPRESSIBLE = ("application/json", "application/x-ndjson", "application/javascript", "image/svg+xml", "text/")
+
+
+def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+    """Compact UTF-8 JSON for ``obj``."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0))
+        except TypeError:  # e.g. an integer beyond 64 bits; the standard library handles it
+            pass
+    return json.dumps(obj, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+
+
+def json_body(payload: Any) -> bytes:
+    """A JSON response body as both front ends send it: compact, keys sorted, ending in a newline."""
+    return dumps(payload, sort_keys=True) + b"\n"
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def ndjson_lines(records: Iterable[Any]) -> Iterator[bytes]:
+    """One compact JSON line per record: the body of an application/x-ndjson stream."""
+    for record in records:
+        yield dumps(record) + b"\n"
+
+
+def array_chunks(key: str, records: Iterable[Any]) -> Iterator[bytes]:
+    """``{key: [...]}`` encoded one record at a time, so a long list can be streamed."""
+    yield b'{"' + key.encode("utf-8") + b'":['
+    for position, record in enumerate(records):
+        yield (b"," if position else b"") + dumps(record)
+    yield b"]}"
+
+
+def dumps_records(records: List[dict]) -> bytes:
+    """The contents of a JSON data file: compact, or indented when PRETTY_JSON is set."""
+    if PRETTY:
+        return json.dumps(records, indent=4).encode("utf-8")
+    return dumps(records)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The content coding to use for a client sending ``accept_encoding``: gzip, deflate or None."""
+    if not COMPRESSION or not accept_encoding:
+        return None
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, parameters = part.partition(";")
+        weight = 1.0
+        parameter = parameters.strip()
+        if parameter.startswith("q="):
+            try:
+                weight = float(parameter[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in ENCODINGS:  # gzip first, so it wins ties
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+def compressible(content_type: Optional[str]) -> bool:
+    return bool(content_type) and content_type.split(";")[0].strip().lower().startswith(COMPRESSIBLE)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, ENCODINGS[encoding])
+    return compressor.compress(body) + compressor.flush()
+
+
+class StreamCompressor:
+    """Compresses a body chunk by chunk, flushing each chunk so a client can decode what has arrived."""
+
+    def __init__(self, encoding: str):
+        self._compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, ENCODINGS[encoding])
+
+    def compress(self, chunk: bytes) -> bytes:
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
@@ -0,0 +1,92 @@
+"""
+Runtime settings for the services, read from environment variables.
+
+Every value has a default that matches the original development setup, so
+running ``python3 app.py`` with no environment behaves as before.
+
+    HOST                  interface to bind (default 127.0.0.1)
+    <SERVICE>_PORT        QUOTES_PORT, FUNFACTS_PORT, REFLECTIONS_PORT, GOALS_PORT, GATEWAY_PORT
+    DEBUG                 enable the Flask debugger and reloader for python3 <service>.py (default 1)
+    WORKERS               worker processes for serve.py (default: number of CPUs)
+    THREADS               threads per worker for serve.py (default 8)
+    KEEPALIVE             seconds an idle keep-alive connection is held open (default 5)
+    TIMEOUT               seconds a request may run before its worker is restarted (default 30)
+    GRACEFUL_TIMEOUT      seconds in-flight requests get to finish on shutdown (default 30)
+    MAX_CONTENT_LENGTH    largest accepted request body in bytes (default 16 MiB)
+    MAX_REQUEST_LINE      longest accepted request line in bytes (default 8190)
+    SERVER                serve.py backend: auto, gunicorn or werkzeug (default auto)
+    STORAGE_BACKEND       storage engine: json, log, sqlite, mmap or memory (default json)
+    CACHE_POLICY          how repositories revalidate reads: validate or ttl (default validate)
+    CACHE_TTL             seconds a read is reused under the ttl policy (default 1)
+    REPLICATE_FROM        base URL of the leader to follow as a read replica (quotes and funfacts; see replication.py)
+    REPLICATION_WAIT      longest a GET /changes long poll is held open, in seconds (default 25)
+    CHANGE_LOG_MAX_BYTES  size at which a leader starts a new change log generation (default 64 MiB)
+    RATE_LIMITS           per-client token buckets by route, e.g. "POST *=5/s:20" (default: none; see admission.py)
+    CONCURRENCY_LIMITS    requests admitted at once by route, e.g. "POST *=4; *=64" (default: none)
+    ADMISSION_QUEUE       requests that may wait for a concurrency slot before 503s (default 64)
+    ADMISSION_TIMEOUT     seconds a queued request waits for a slot (default 1)
+    RATE_LIMIT_CLIENTS    most (rule, client) buckets kept before the least recent are evicted (default 100000)
+    API_KEYS              comma-separated X-API-Key values rate limited on their own, not by address (default: none)
+    JSON_ENCODER          auto uses orjson when installed, json forces the standard library (default auto; see codec.py)
+    PRETTY_JSON           write data files with the old four-space indentation (default 0: compact)
+    COMPRESSION           gzip/deflate responses for clients that accept it (default 1)
+    COMPRESS_MIN_SIZE     smallest response body in bytes worth compressing (default 1024)
+    COMPRESS_LEVEL        zlib compression level, 1 fastest to 9 smallest (default 6)
+
+STORAGE_BACKEND, CACHE_POLICY, CACHE_TTL, REPLICATE_FROM, RATE_LIMITS,
+CONCURRENCY_LIMITS and API_KEYS can be set for one service by prefixing its name, e.g.
+GOALS_STORAGE_BACKEND=sqlite or QUOTES_REPLICATE_FROM=http://10.0.0.5:5001.
+"""
+
+import os
+
+SERVICE_PORTS = {
+    "gateway": 5000,
+    "quotes": 5001,
+    "funfacts": 5002,
+    "reflections": 5003,
+    "goals": 5004,
+}
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}.") from None
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.environ.get(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+def service_setting(service: str, name: str, default: str) -> str:
+    """<SERVICE>_<NAME> if set, else <NAME>, else ``default``."""
+    for variable in (f"{service.upper()}_{name}", name):
+        value = os.environ.get(variable, "").strip()
+        if value:
+            return value
+    return default
+
+
+def port(service: str) -> int:
+    """The port ``service`` listens on, overridable with <SERVICE>_PORT."""
+    return env_int(f"{service.upper()}_PORT", SERVICE_PORTS[service])
+
+
+HOST = os.environ.get("HOST", "127.0.0.1")
+DEBUG = env_bool("DEBUG", True)
+WORKERS = env_int("WORKERS", os.cpu_count() or 1)
+THREADS = env_int("THREADS", 8)
+KEEPALIVE = env_int("KEEPALIVE", 5)
+TIMEOUT = env_int("TIMEOUT", 30)
+GRACEFUL_TIMEOUT = env_int("GRACEFUL_TIMEOUT", 30)
+MAX_CONTENT_LENGTH = env_int("MAX_CONTENT_LENGTH", 16 * 1024 * 1024)
+MAX_REQUEST_LINE = env_int("MAX_REQUEST_LINE", 8190)
+SERVER = os.environ.get("SERVER", "auto")
@@ -1,71 +1,90 @@
 from pathlib import Path
-from typing import List, Optional
+from typing import Mapping, Optional
 from flask import Flask, jsonify, request
-import json
-import random
+import config
+import handlers
+from admission import admit
+from httpcache import compress_responses, json_result, versioned_json
+from metrics import dataset_gauges, instrument
+from replication import replicate, replication_gauges
+from repository import TextRepository
+from sampling import client_key
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = config.MAX_CONTENT_LENGTH
 
 DATA_FILE = Path(__file__).with_name("funfacts.json")
 
 
-class FunFactRepository:
+class FunFactRepository(TextRepository):
     """Repository for managing fun facts."""
 
-    def __init__(self, data_file: Path):
-        self.data_file = data_file
+    service = "funfacts"
+    text_field = "fact"
 
-    def _read_all(self) -> List[dict]:
-        if not self.data_file.exists():
-            return []
-        with self.data_file.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
 
-    def _write_all(self, facts: List[dict]) -> None:
-        with self.data_file.open("w", encoding="utf-8") as handle:
-            json.dump(facts, handle, indent=4)
-
-    def get_all(self) -> List[dict]:
-        return self._read_all()
+repository = FunFactRepository(DATA_FILE)
+admission = admit(app, "funfacts")
+request_metrics = instrument(
+    app,
+    "funfacts",
+    lambda: {
+        **dataset_gauges(repository.count(), repository.cache_stats()),
+        **replication_gauges(replication.stats()),
+        **admission.gauges(),
+    },
+)
+compress_responses(app)
+replication = replicate(app, repository)
+
+
+def parse_fact_payload(data: Optional[dict] = None) -> str:
+    """Validate incoming payloads."""
+    if data is None:
+        data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise ValueError("Each item must be a JSON object.")
+    fact_text = data.get("fact", "")
+    if not isinstance(fact_text, str) or not fact_text.strip():
+        raise ValueError("Request JSON must include a non-empty 'fact' field.")
+    return fact_text.strip()
 
-    def get_random(self) -> Optional[dict]:
-        facts = self._read_all()
-        if not facts:
-            return None
-        return random.choice(facts)
 
-    def create(self, fact_text: str) -> dict:
-        facts = self._read_all()
-        new_fact = {"id": len(facts) + 1, "fact": fact_text}
-        facts.append(new_fact)
-        self._write_all(facts)
-        return new_fact
+def health_payload() -> dict:
+    return {
+        "service": "Fun Facts",
+        "status": "running",
+        "endpoints": ["/funfact", "/funfact/search"],
+        "records": repository.count(),
+        "cache": repository.cache_stats(),
+        "admission": admission.stats(),
+        "sampling": repository.sampling_stats(),
+    }
 
 
-repository = FunFactRepository(DATA_FILE)
-
-
-def parse_fact_payload() -> str:
-    """Validate incoming payloads."""
-    data = request.get_json(silent=True) or {}
-    fact_text = data.get("fact", "").strip()
-    if not fact_text:
-        raise ValueError("Request JSON must include a non-empty 'fact' field.")
-    return fact_text
+def draw_facts(args: Mapping[str, str], client: Optional[str]) -> handlers.Result:
+    """A random fun fact, or ?count=K distinct random fun facts."""
+    if "count" in args:
+        return handlers.draw_many(args, repository.get_random_many, "facts")
+    return handlers.draw_one(repository.get_random(client), "fact", "No fun facts available.")
 
 
 # Root route for health check
 @app.route("/", methods=["GET"])
 def root():
-    return jsonify({"service": "Fun Facts", "status": "running", "endpoints": ["/funfact"]}), 200
+    return versioned_json(health_payload(), repository.version())
 
-# GET random fun fact
+# GET random fun fact, or ?count=K distinct random fun facts
 @app.route("/funfact", methods=["GET"])
 def get_funfact():
-    fact = repository.get_random()
-    if not fact:
-        return jsonify({"id": 0, "fact": "No fun facts available."}), 404
-    return jsonify(fact), 200
+    client = client_key(request.headers.get("X-Client-Id"), request.remote_addr)
+    return json_result(draw_facts(request.args, client), store=False)
+
+
+# GET ranked fun facts matching every term of ?q= (a trailing * matches a prefix), up to ?limit=
+@app.route("/funfact/search", methods=["GET"])
+def search_funfacts():
+    return json_result(handlers.search(request.args, repository.search, "facts"))
 
 
 # POST new fun fact
@@ -76,13 +95,24 @@ def add_funfact():
     except ValueError as error:
         return jsonify({"error": str(error)}), 400
 
-    new_fact = repository.create(fact_text)
-    return (
-        jsonify({"message": "Fun fact added successfully!", "fact": new_fact}),
-        201,
+    return json_result(handlers.created("fact", "Fun fact added successfully!", repository.create(fact_text)))
+
+
+# POST many new fun facts in a single write
+@app.route("/funfact/batch", methods=["POST"])
+def add_funfacts():
+    return json_result(
+        handlers.create_batch(
+            request.get_json(silent=True),
+            parse_fact_payload,
+            repository.create_many,
+            "fun facts",
+            "facts",
+            "fun facts added successfully!",
+        )
     )
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5002)
+    app.run(debug=config.DEBUG, host=config.HOST, port=config.port("funfacts"))
 
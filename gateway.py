@@ -0,0 +1,35 @@
+"""
+Single-process gateway that serves all four microservices from one WSGI application.
+
+    /              -> quotes service (so the HTML page and /api/quote keep working)
+    /quotes/...    -> quotes service
+    /funfacts/...  -> fun facts service
+    /reflections/... -> reflections service
+    /goals/...     -> goals service
+
+The standalone entry points (python3 app.py, funfacts.py, ...) are unaffected.
+For production, run it with ``python3 serve.py all`` instead.
+"""
+
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+from werkzeug.serving import run_simple
+
+import config
+import app as quotes_service
+import funfacts as funfacts_service
+import goals as goals_service
+import reflections as reflections_service
+
+application = DispatcherMiddleware(
+    quotes_service.app,
+    {
+        "/quotes": quotes_service.app,
+        "/funfacts": funfacts_service.app,
+        "/reflections": reflections_service.app,
+        "/goals": goals_service.app,
+    },
+)
+
+
+if __name__ == "__main__":
+    run_simple(config.HOST, config.port("gateway"), application, threaded=True)
@@ -1,82 +1,149 @@
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional
-from flask import Flask, jsonify, request
-import json
+from typing import Iterator, Mapping, Optional, Tuple
+from flask import Flask, Response, jsonify, request, stream_with_context
+import codec
+import config
+import handlers
+from admission import admit
+from httpcache import ResponseCache, cached_json, compress_responses, json_result, versioned_json
+from metrics import dataset_gauges, instrument
+from repository import Repository
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = config.MAX_CONTENT_LENGTH
 
 DATA_FILE = Path(__file__).with_name("goals.json")
+MAX_PAGE_SIZE = 1000
 
 
-class GoalRepository:
+class GoalRepository(Repository):
     """Repository for managing goals."""
 
-    def __init__(self, data_file: Path):
-        self.data_file = data_file
+    service = "goals"
+    indexed_fields = ("completed",)
 
-    def _read_all(self) -> List[dict]:
-        if not self.data_file.exists():
-            return []
-        with self.data_file.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
+    def new_record(self, text: str) -> dict:
+        return {"goal": text, "completed": False}
 
-    def _write_all(self, goals: List[dict]) -> None:
-        with self.data_file.open("w", encoding="utf-8") as handle:
-            json.dump(goals, handle, indent=4)
+    def get_by_id(self, goal_id: int) -> Optional[dict]:
+        return self._index().get(goal_id)
 
-    def get_all(self) -> List[dict]:
-        return self._read_all()
+    def count(self, completed: Optional[bool] = None) -> int:
+        if completed is None:
+            return self._index().count()
+        return self._index().count("completed", completed)
 
-    def get_by_id(self, goal_id: int) -> Optional[dict]:
-        goals = self._read_all()
-        for goal in goals:
-            if goal["id"] == goal_id:
-                return goal
-        return None
-
-    def create(self, goal_text: str) -> dict:
-        goals = self._read_all()
-        new_goal = {
-            "id": len(goals) + 1,
-            "goal": goal_text,
-            "completed": False,
-        }
-        goals.append(new_goal)
-        self._write_all(goals)
-        return new_goal
+    def iter_goals(self, after: int = 0, completed: Optional[bool] = None) -> Iterator[dict]:
+        """Yield goals with an id greater than ``after`` in id order, read lazily from storage."""
+        if completed is None:
+            return self._index().scan(after)
+        return self._index().scan(after, "completed", completed)
 
     def mark_completed(self, goal_id: int) -> Optional[dict]:
-        goals = self._read_all()
-        for goal in goals:
-            if goal["id"] == goal_id:
-                goal["completed"] = True
-                self._write_all(goals)
-                return goal
-        return None
+        return self._apply_updates([(goal_id, {"completed": True})])[0]
 
 
 repository = GoalRepository(DATA_FILE)
+admission = admit(app, "goals")
+request_metrics = instrument(app, "goals", lambda: {**dataset_gauges(repository.count(), repository.cache_stats()), **admission.gauges()})
+compress_responses(app)
+responses = ResponseCache()
 
 
-def parse_goal_payload() -> str:
+def parse_goal_payload(data: Optional[dict] = None) -> str:
     """Validate incoming payloads."""
-    data = request.get_json(silent=True) or {}
-    goal_text = data.get("goal", "").strip()
-    if not goal_text:
+    if data is None:
+        data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise ValueError("Each item must be a JSON object.")
+    goal_text = data.get("goal", "")
+    if not isinstance(goal_text, str) or not goal_text.strip():
         raise ValueError("Request JSON must include a non-empty 'goal' field.")
-    return goal_text
+    return goal_text.strip()
+
+
+def parse_goal_query(args: Optional[Mapping[str, str]] = None) -> Tuple[int, Optional[int], Optional[bool]]:
+    """Validate the ?after=, ?limit= and ?completed= query parameters."""
+    if args is None:
+        args = request.args
+    try:
+        after = int(args.get("after", 0))
+        limit = args.get("limit")
+        limit = None if limit is None else int(limit)
+    except ValueError:
+        raise ValueError("'after' and 'limit' must be integers.")
+    if limit is not None and limit < 1:
+        raise ValueError("'limit' must be a positive integer.")
+    if limit is not None:
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    completed = args.get("completed")
+    if completed is not None:
+        if completed.lower() not in ("true", "false"):
+            raise ValueError("'completed' must be 'true' or 'false'.")
+        completed = completed.lower() == "true"
+    return after, limit, completed
+
+
+def health_payload() -> dict:
+    return {
+        "service": "Goal Tracker",
+        "status": "running",
+        "endpoints": ["/goals"],
+        "records": repository.count(),
+        "cache": repository.cache_stats(),
+        "admission": admission.stats(),
+        "responses": responses.stats(),
+    }
+
+
+def goal_lines(after: int, limit: Optional[int], completed: Optional[bool]) -> Tuple[int, Iterator[bytes]]:
+    """The matching goal count and the ndjson body of GET /goals?format=ndjson."""
+    goals = repository.iter_goals(after, completed)
+    if limit is not None:
+        goals = islice(goals, limit)
+    return repository.count(completed), codec.ndjson_lines(goals)
+
+
+def goals_page(after: int, limit: Optional[int], completed: Optional[bool]) -> dict:
+    """All matching goals, or one page of ``limit`` with the id to continue after."""
+    goals = repository.iter_goals(after, completed)
+    count = repository.count(completed)
+    if limit is None:
+        return {"goals": list(goals), "count": count}
+    page = list(islice(goals, limit + 1))
+    next_after = page[limit - 1]["id"] if len(page) > limit else None
+    return {"goals": page[:limit], "count": count, "next_after": next_after}
+
+
+def complete_result(goal_id: int) -> handlers.Result:
+    updated_goal = repository.mark_completed(goal_id)
+    if not updated_goal:
+        return {"error": "Goal not found"}, 404
+    return {"message": "Goal marked as completed!", "goal": updated_goal}, 200
 
 
 # Root route for health check
 @app.route("/", methods=["GET"])
 def root():
-    return jsonify({"service": "Goal Tracker", "status": "running", "endpoints": ["/goals"]}), 200
+    return versioned_json(health_payload(), repository.version())
 
-# GET all goals
+# GET goals: all of them, one page (?after=<id>&limit=N), filtered (?completed=true|false),
+# or streamed one JSON object per line (?format=ndjson)
 @app.route("/goals", methods=["GET"])
 def get_goals():
-    goals = repository.get_all()
-    return jsonify({"goals": goals, "count": len(goals)}), 200
+    try:
+        after, limit, completed = parse_goal_query()
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    if handlers.wants_ndjson(request.args, request.headers.get("Accept")):
+        total, lines = goal_lines(after, limit, completed)
+        return Response(stream_with_context(lines), mimetype="application/x-ndjson", headers={"X-Total-Count": str(total)})
+
+    return cached_json(responses, repository.version(), partial(goals_page, after, limit, completed))
 
 
 # POST new goal
@@ -87,26 +154,30 @@ def add_goal():
     except ValueError as error:
         return jsonify({"error": str(error)}), 400
 
-    new_goal = repository.create(goal_text)
-    return (
-        jsonify({"message": "Goal created successfully!", "goal": new_goal}),
-        201,
+    return json_result(handlers.created("goal", "Goal created successfully!", repository.create(goal_text)))
+
+
+# POST many new goals in a single write
+@app.route("/goals/batch", methods=["POST"])
+def add_goals():
+    return json_result(
+        handlers.create_batch(
+            request.get_json(silent=True),
+            parse_goal_payload,
+            repository.create_many,
+            "goals",
+            "goals",
+            "goals added successfully!",
+        )
     )
 
 
 # PUT mark goal as completed
 @app.route("/goals/<int:goal_id>", methods=["PUT"])
 def complete_goal(goal_id):
-    updated_goal = repository.mark_completed(goal_id)
-    if not updated_goal:
-        return jsonify({"error": "Goal not found"}), 404
-
-    return (
-        jsonify({"message": "Goal marked as completed!", "goal": updated_goal}),
-        200,
-    )
+    return json_result(complete_result(goal_id))
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5004)
+    app.run(debug=config.DEBUG, host=config.HOST, port=config.port("goals"))
 
@@ -0,0 +1,83 @@
+"""
+Route bodies shared by the Flask services and asgi.py, so both front ends answer alike.
+
+Each takes values already read from the request (the decoded JSON body, the
+query arguments) and returns ``(payload, status)``; the caller turns that into
+its own response and adds headers such as Cache-Control. Parse errors come back
+as a 400 with the parser's message. Repository calls block, so asgi.py runs
+these in a worker thread. The service-specific bodies (health payloads, draws,
+edits) live next to their routes in each service module, built the same way.
+"""
+
+from typing import Callable, List, Mapping, Optional, Tuple
+
+from werkzeug.datastructures import MIMEAccept
+from werkzeug.http import parse_accept_header
+
+from validation import MAX_BATCH_SIZE, parse_batch_payload, parse_count, parse_search_query
+
+Result = Tuple[dict, int]
+
+
+def wants_ndjson(args: Mapping[str, str], accept: Optional[str]) -> bool:
+    """Whether a listing should stream one JSON object per line: ?format=ndjson, or Accept prefers it."""
+    return args.get("format") == "ndjson" or parse_accept_header(accept, MIMEAccept).best == "application/x-ndjson"
+
+
+def created(key: str, message: str, record: dict) -> Result:
+    return {"message": message, key: record}, 201
+
+
+def create_batch(
+    data, parse: Callable[[dict], str], create_many: Callable[[List[str]], List[dict]], noun: str, key: str, message: str
+) -> Result:
+    """The body of every POST .../batch route: create the valid items in one write and report the rest."""
+    try:
+        items = parse_batch_payload(data if data is not None else [])
+    except ValueError as error:
+        return {"error": str(error)}, 400
+
+    texts, errors = [], []
+    for position, item in enumerate(items):
+        try:
+            texts.append(parse(item))
+        except ValueError as error:
+            errors.append({"index": position, "error": str(error)})
+    if not texts:
+        return {"error": f"No valid {noun} in batch.", "errors": errors}, 400
+
+    records = create_many(texts)
+    return {"message": f"{len(records)} {message}", key: records, "errors": errors}, 201
+
+
+def search(args: Mapping[str, str], search: Callable[[str, int], Tuple[List[dict], int]], key: str) -> Result:
+    """The body of the search routes: ranked matches for ?q=, up to ?limit=."""
+    try:
+        query, limit = parse_search_query(args)
+    except ValueError as error:
+        return {"error": str(error)}, 400
+
+    records, total = search(query, limit)
+    return {"query": query, key: records, "count": len(records), "total": total}, 200
+
+
+def draw_many(
+    args: Mapping[str, str], draw: Callable[[int], List[dict]], key: str, name: str = "count", limit: int = MAX_BATCH_SIZE
+) -> Result:
+    """Up to ?<name>= random records from ``draw``, at most ``limit``; 404 when there are none."""
+    try:
+        count = parse_count(args, name)
+    except ValueError as error:
+        return {"error": str(error)}, 400
+
+    records = draw(min(count, limit))
+    if not records:
+        return {key: [], "count": 0}, 404
+    return {key: records, "count": len(records)}, 200
+
+
+def draw_one(record: Optional[dict], key: str, empty_message: str) -> Result:
+    """One random record, or a placeholder and 404 when there are none."""
+    if not record:
+        return {"id": 0, key: empty_message}, 404
+    return record, 200
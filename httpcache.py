@@ -0,0 +1,178 @@
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from flask import Response, current_app, jsonify, request
+from flask.json.provider import DefaultJSONProvider
+import threading
+import zlib
+
+import codec
+from metrics import phase
+
+
+class ResponseCache:
+    """Keeps pre-serialized JSON bodies per route, valid while the repository version is unchanged.
+
+    Entries are keyed by (route key, version token), so any create/update bumps the
+    version and the next request re-serializes; the cache never has to be purged by hand.
+    Each entry also keeps the gzip/deflate copies clients have asked for, so an
+    unchanged collection is neither re-encoded nor re-compressed.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], dict[Optional[str], bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.compressions = 0
+
+    def get_or_build(
+        self, key: str, token: str, build: Callable[[], object], encoding: Optional[str] = None
+    ) -> Tuple[bytes, Optional[str]]:
+        """The body for ``key`` at version ``token``, in ``encoding`` if it is worth compressing, and its encoding."""
+        with self._lock:
+            variants = self._entries.get((key, token))
+            if variants is not None:
+                self._entries.move_to_end((key, token))
+                self.hits += 1
+        if variants is None:
+            with phase("serialize"):
+                variants = {None: codec.dumps(build(), sort_keys=True)}
+            with self._lock:
+                self.misses += 1
+                self._entries[(key, token)] = variants
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        if encoding is None or len(variants[None]) < codec.MIN_SIZE:
+            return variants[None], None
+        body = variants.get(encoding)
+        if body is None:
+            with phase("serialize"):
+                body = variants[encoding] = codec.compress(variants[None], encoding)
+            self.compressions += 1
+        return body, encoding
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "compressions": self.compressions}
+
+
+def cached_json(
+    cache: ResponseCache, version: Tuple[str, float], build: Callable[[], object], key: Optional[str] = None
+) -> Response:
+    """Serve a cacheable JSON payload with a strong ETag and Last-Modified, answering 304 when unchanged."""
+    key = key or request.full_path
+    token, modified = version
+    body, encoding = cache.get_or_build(key, token, build, codec.negotiate(request.headers.get("Accept-Encoding")))
+    response = current_app.response_class(body, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+    if encoding is not None:
+        response.content_encoding = encoding
+    response.set_etag(f"{token}-{zlib.crc32(key.encode('utf-8')):08x}" + (f"-{encoding}" if encoding else ""))
+    if modified:
+        response.last_modified = modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def versioned_json(payload: dict, version: Tuple[str, float]) -> Response:
+    """Serve a JSON payload with a weak ETag taken from the repository version.
+
+    Used for health payloads whose counters change on every request: clients that
+    already hold the current version get a 304, everyone else a fresh body.
+    """
+    token, modified = version
+    with phase("serialize"):
+        body = codec.json_body(payload)
+    response = current_app.response_class(body, mimetype="application/json")
+    response.set_etag(token, weak=True)
+    if modified:
+        response.last_modified = modified
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def no_store(response: Response) -> Response:
+    """Mark a response (e.g. a random pick) as never cacheable."""
+    response.cache_control.no_store = True
+    return response
+
+
+def json_result(result: Tuple[object, int], store: bool = True) -> Tuple[Response, int]:
+    """A ``(payload, status)`` pair from handlers.py as a Flask response; ``store=False`` marks a 200 no-store."""
+    payload, status = result
+    response = jsonify(payload)
+    return (response if store or status != 200 else no_store(response)), status
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider on the codec.py encoder (orjson when installed), with the same sorted keys.
+
+    Decoding counts as 'parse' time and encoding as 'serialize' time (see metrics.phase).
+    In debug mode responses keep Flask's indented layout.
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        with phase("serialize"):
+            if not kwargs:
+                return codec.dumps(obj, sort_keys=self.sort_keys).decode("utf-8")
+            return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        with phase("parse"):
+            return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs) -> Response:
+        if self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        with phase("serialize"):
+            body = codec.json_body(obj) if self.sort_keys else codec.dumps(obj) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def compress_responses(app) -> None:
+    """Compress ``app``'s text and JSON responses for clients that accept gzip or deflate (see codec.py).
+
+    Bodies smaller than COMPRESS_MIN_SIZE go out as they are; streamed bodies are
+    compressed chunk by chunk. A strong ETag becomes weak, since the bytes differ
+    from the uncompressed representation it was computed for.
+    """
+
+    @app.after_request
+    def compress_response(response: Response) -> Response:
+        if (
+            response.content_encoding
+            or response.direct_passthrough
+            or response.status_code < 200
+            or response.status_code in (204, 304)
+            or response.cache_control.no_transform
+            or not codec.compressible(response.mimetype)
+        ):
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = codec.negotiate(request.headers.get("Accept-Encoding"))
+        if encoding is None:
+            return response
+        if response.is_streamed:
+            chunks = response.response
+            compressor = codec.StreamCompressor(encoding)
+
+            def compressed():
+                for chunk in chunks:
+                    data = compressor.compress(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+                    if data:
+                        yield data
+                yield compressor.finish()
+
+            response.response = compressed()
+        else:
+            body = response.get_data()
+            if len(body) < codec.MIN_SIZE:
+                return response
+            with phase("serialize"):
+                response.set_data(codec.compress(body, encoding))
+        response.content_encoding = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,18 +1,72 @@
 #!/usr/bin/env python3
 """
 Main integration program that communicates with all four microservices.
-Run each microservice in a separate terminal before running this program.
+Run each microservice in a separate terminal before running this program,
+or run gateway.py and set GATEWAY_URL (e.g. http://localhost:5000) to reach
+all four through the single gateway process.
 """
 
+import argparse
+import config
+import os
 import requests
 import json
-from typing import Optional
+import uuid
+from requests.adapters import HTTPAdapter
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Dict, Optional, Tuple
 
-# Microservice URLs
-QUOTES_URL = "http://localhost:5001"
-FUNFACTS_URL = "http://localhost:5002"
-REFLECTIONS_URL = "http://localhost:5003"
-GOALS_URL = "http://localhost:5004"
+# Microservice URLs (ports can be overridden with QUOTES_PORT, FUNFACTS_PORT, ...)
+QUOTES_URL = f"http://localhost:{config.port('quotes')}"
+FUNFACTS_URL = f"http://localhost:{config.port('funfacts')}"
+REFLECTIONS_URL = f"http://localhost:{config.port('reflections')}"
+GOALS_URL = f"http://localhost:{config.port('goals')}"
+
+GATEWAY_URL = os.environ.get("GATEWAY_URL")
+if GATEWAY_URL:
+    QUOTES_URL = f"{GATEWAY_URL}/quotes"
+    FUNFACTS_URL = f"{GATEWAY_URL}/funfacts"
+    REFLECTIONS_URL = f"{GATEWAY_URL}/reflections"
+    GOALS_URL = f"{GATEWAY_URL}/goals"
+
+# (connect, read) timeout in seconds for every call, so one stuck service cannot hang the menu.
+REQUEST_TIMEOUT = (2, 5)
+
+# One pooled session keeps TCP connections to each service open between calls.
+session = requests.Session()
+session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+# A stable id per run lets the services avoid serving this client the same quote or fact twice.
+session.headers["X-Client-Id"] = uuid.uuid4().hex
+
+
+# URL -> (ETag, decoded body) of the last cacheable response seen for it.
+conditional_cache: Dict[str, Tuple[str, dict]] = {}
+
+
+def send(method: str, url: str, **kwargs) -> requests.Response:
+    """Sends a request through the shared session with the default timeout."""
+    kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+    return session.request(method, url, **kwargs)
+
+
+def send_conditional(url: str) -> requests.Response:
+    """Sends a GET that lets the server answer 304 Not Modified if our cached copy is still current."""
+    headers = {}
+    if url in conditional_cache:
+        headers["If-None-Match"] = conditional_cache[url][0]
+    return send("GET", url, headers=headers)
+
+
+def conditional_json(url: str, response: requests.Response) -> dict:
+    """Returns the response body, or the cached body when the server answered 304 Not Modified."""
+    if response.status_code == 304:
+        return conditional_cache[url][1]
+    data = response.json()
+    etag = response.headers.get("ETag")
+    if etag:
+        conditional_cache[url] = (etag, data)
+    return data
 
 
 def print_separator():
@@ -20,10 +74,10 @@ def print_separator():
     print("\n" + "=" * 60 + "\n")
 
 
-def get_quote() -> None:
+def get_quote(pending: Optional[Future] = None) -> None:
     """Fetches and displays a random inspirational quote from the quotes service."""
     try:
-        response = requests.get(f"{QUOTES_URL}/api/quote")
+        response = pending.result() if pending else send("GET", f"{QUOTES_URL}/api/quote")
         if response.status_code == 200:
             quote_data = response.json()
             print(f"\nInspirational Quote:")
@@ -33,15 +87,15 @@ def get_quote() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Quotes microservice.")
-        print("   Make sure it's running on port 5001.")
+        print(f"   Make sure it's running at {QUOTES_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
 
-def get_funfact() -> None:
+def get_funfact(pending: Optional[Future] = None) -> None:
     """Fetches and displays a random fun fact from the fun facts service."""
     try:
-        response = requests.get(f"{FUNFACTS_URL}/funfact")
+        response = pending.result() if pending else send("GET", f"{FUNFACTS_URL}/funfact")
         if response.status_code == 200:
             fact_data = response.json()
             print(f"\nFun Fact:")
@@ -51,7 +105,7 @@ def get_funfact() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Fun Facts microservice.")
-        print("   Make sure it's running on port 5002.")
+        print(f"   Make sure it's running at {FUNFACTS_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -64,7 +118,8 @@ def add_funfact() -> None:
         return
 
     try:
-        response = requests.post(
+        response = send(
+            "POST",
             f"{FUNFACTS_URL}/funfact",
             json={"fact": fact_text},
             headers={"Content-Type": "application/json"},
@@ -77,7 +132,7 @@ def add_funfact() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Fun Facts microservice.")
-        print("   Make sure it's running on port 5002.")
+        print(f"   Make sure it's running at {FUNFACTS_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -90,7 +145,8 @@ def add_reflection() -> None:
         return
 
     try:
-        response = requests.post(
+        response = send(
+            "POST",
             f"{REFLECTIONS_URL}/reflection",
             json={"reflection": reflection_text},
             headers={"Content-Type": "application/json"},
@@ -105,15 +161,15 @@ def add_reflection() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Reflections microservice.")
-        print("   Make sure it's running on port 5003.")
+        print(f"   Make sure it's running at {REFLECTIONS_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
 
-def view_today_reflection() -> None:
+def view_today_reflection(pending: Optional[Future] = None) -> None:
     """Fetches and displays today's reflection from the reflections service."""
     try:
-        response = requests.get(f"{REFLECTIONS_URL}/reflection/today")
+        response = pending.result() if pending else send("GET", f"{REFLECTIONS_URL}/reflection/today")
         if response.status_code == 200:
             reflection_data = response.json()
             print(f"\nToday's Reflection:")
@@ -126,17 +182,18 @@ def view_today_reflection() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Reflections microservice.")
-        print("   Make sure it's running on port 5003.")
+        print(f"   Make sure it's running at {REFLECTIONS_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
 
-def view_goals() -> None:
+def view_goals(pending: Optional[Future] = None) -> None:
     """Fetches and displays all goals from the goals service."""
+    url = f"{GOALS_URL}/goals"
     try:
-        response = requests.get(f"{GOALS_URL}/goals")
-        if response.status_code == 200:
-            data = response.json()
+        response = pending.result() if pending else send_conditional(url)
+        if response.status_code in (200, 304):
+            data = conditional_json(url, response)
             goals = data.get("goals", [])
             count = data.get("count", 0)
 
@@ -151,7 +208,7 @@ def view_goals() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Goals microservice.")
-        print("   Make sure it's running on port 5004.")
+        print(f"   Make sure it's running at {GOALS_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -164,7 +221,8 @@ def add_goal() -> None:
         return
 
     try:
-        response = requests.post(
+        response = send(
+            "POST",
             f"{GOALS_URL}/goals",
             json={"goal": goal_text},
             headers={"Content-Type": "application/json"},
@@ -179,7 +237,7 @@ def add_goal() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Goals microservice.")
-        print("   Make sure it's running on port 5004.")
+        print(f"   Make sure it's running at {GOALS_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
@@ -194,7 +252,7 @@ def complete_goal() -> None:
         return
 
     try:
-        response = requests.put(f"{GOALS_URL}/goals/{goal_id}")
+        response = send("PUT", f"{GOALS_URL}/goals/{goal_id}")
         if response.status_code == 200:
             result = response.json()
             print(f"\n{result.get('message', 'Goal completed!')}")
@@ -206,11 +264,30 @@ def complete_goal() -> None:
             print(f"Error: {response.status_code} - {response.text}")
     except requests.exceptions.ConnectionError:
         print("Error: Could not connect to Goals microservice.")
-        print("   Make sure it's running on port 5004.")
+        print(f"   Make sure it's running at {GOALS_URL}.")
     except Exception as e:
         print(f"Error: {e}")
 
 
+def view_dashboard() -> None:
+    """Fetches a quote, a fun fact, today's reflection and the goals in parallel and displays them together.
+
+    The four requests run at the same time, so the dashboard takes as long as the slowest
+    service rather than the sum of all four. A service that is down or times out only
+    blanks its own section.
+    """
+    views = {
+        get_quote: partial(send, "GET", f"{QUOTES_URL}/api/quote"),
+        get_funfact: partial(send, "GET", f"{FUNFACTS_URL}/funfact"),
+        view_today_reflection: partial(send, "GET", f"{REFLECTIONS_URL}/reflection/today"),
+        view_goals: partial(send_conditional, f"{GOALS_URL}/goals"),
+    }
+    with ThreadPoolExecutor(max_workers=len(views)) as pool:
+        pending = {view: pool.submit(fetch) for view, fetch in views.items()}
+        for view, future in pending.items():
+            view(future)
+
+
 def print_menu():
     """Displays the main menu with all available options."""
     print_separator()
@@ -225,21 +302,32 @@ def print_menu():
     print("7. Add New Goal")
     print("8. Mark Goal as Completed")
     print("9. Exit")
+    print("10. View Dashboard (all services at once)")
     print_separator()
 
 
 def main():
     """Main program loop that handles user input and routes to appropriate functions."""
+    parser = argparse.ArgumentParser(description="Microservices integration program.")
+    parser.add_argument("--dashboard", action="store_true", help="show the dashboard once and exit")
+    args = parser.parse_args()
+    if args.dashboard:
+        view_dashboard()
+        return
+
     print("\nWelcome to the Microservices Integration Program!")
-    print("\nNote: Make sure all microservices are running:")
-    print("   - Quotes: port 5001")
-    print("   - Fun Facts: port 5002")
-    print("   - Reflections: port 5003")
-    print("   - Goals: port 5004")
+    if GATEWAY_URL:
+        print(f"\nNote: Make sure the gateway is running at {GATEWAY_URL}")
+    else:
+        print("\nNote: Make sure all microservices are running:")
+        print(f"   - Quotes: {QUOTES_URL}")
+        print(f"   - Fun Facts: {FUNFACTS_URL}")
+        print(f"   - Reflections: {REFLECTIONS_URL}")
+        print(f"   - Goals: {GOALS_URL}")
 
     while True:
         print_menu()
-        choice = input("Select an option (1-9): ").strip()
+        choice = input("Select an option (1-10): ").strip()
 
         if choice == "1":
             get_quote()
@@ -260,8 +348,10 @@ def main():
         elif choice == "9":
             print("\nGoodbye! Thanks for using the microservices integration.")
             break
+        elif choice == "10":
+            view_dashboard()
         else:
-            print("\nInvalid option. Please select 1-9.")
+            print("\nInvalid option. Please select 1-10.")
 
         input("\nPress Enter to continue...")
 
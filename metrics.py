@@ -0,0 +1,180 @@
+"""
+Request timing for the services, exported in Prometheus text format.
+
+The module itself does not import Flask, so storage.py can report time spent in
+I/O, JSON parsing and serialization through phase() without depending on it.
+instrument() times a Flask app; asgi.py records into the same registries, so
+/metrics reads alike from either front end (phases are only split out on Flask,
+where a request stays on one thread).
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+import threading
+import time
+
+# Upper bounds in seconds; the implicit +Inf bucket catches everything slower.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Where request time can go besides the handler's own Python code.
+PHASES = ("io", "parse", "serialize")
+
+_active = threading.local()
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Attribute the time spent in the block to ``name`` for the request running on this thread."""
+    totals = getattr(_active, "phases", None)
+    if totals is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        totals[name] = totals.get(name, 0.0) + time.perf_counter() - start
+
+
+class Histogram:
+    """Fixed-bucket histogram, cheap enough to update on every request."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            position = len(self.buckets)
+        self.counts[position] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Histograms keyed by metric name and label values, rendered in Prometheus text format.
+
+    ``collect`` supplies the gauges and ``const_labels`` the labels of every series
+    that exposition() renders.
+    """
+
+    def __init__(self, collect: Optional[Callable[[], Dict[str, float]]] = None, **const_labels: str):
+        self.collect = collect
+        self.const_labels = const_labels
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Tuple[Tuple[str, str], ...], Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+        self._histograms.setdefault(name, {})
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def render(self, gauges: Optional[Dict[str, float]] = None, **const_labels: str) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name, series in self._histograms.items():
+                lines.append(f"# HELP {name} {self._help.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in series.items():
+                    labels = {**const_labels, **dict(key)}
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + (float("inf"),), histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f"{name}_bucket{_format_labels({**labels, 'le': le})} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        for name, value in (gauges or {}).items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name}{_format_labels(const_labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+    def exposition(self) -> str:
+        """The body of a /metrics response."""
+        return self.render(self.collect() if self.collect else None, **self.const_labels)
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def dataset_gauges(records: int, stats: Dict[str, object]) -> Dict[str, float]:
+    """Gauges for the dataset size plus every numeric counter the storage backend reports."""
+    gauges: Dict[str, float] = {"dataset_records": records}
+    for name, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            gauges[f"storage_{name}"] = value
+    return gauges
+
+
+def instrument(app, service: str, collect: Callable[[], Dict[str, float]]) -> Registry:
+    """Time every request of ``app`` and serve the results, plus ``collect()`` gauges, at /metrics."""
+    from flask import Response, g, request
+    from httpcache import JSONProvider
+
+    registry = Registry(collect, service=service)
+    registry.describe("http_request_duration_seconds", "Time to handle a request, by route, method and status.")
+    registry.describe("http_request_phase_seconds", "Time spent in storage I/O, JSON parsing and serialization.")
+    app.json = JSONProvider(app)
+    app.extensions["metrics"] = registry
+
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+        _active.phases = {}
+
+    # Ahead of every other before_request hook, so requests that admission control (or a
+    # read replica) turns away are counted too, under their status.
+    app.before_request_funcs.setdefault(None, []).insert(0, start_timer)
+
+    @app.after_request
+    def record_timing(response):
+        start = g.pop("metrics_start", None)
+        phases = getattr(_active, "phases", None) or {}
+        _active.phases = None
+        if start is None:
+            return response
+        route = request.endpoint or "unmatched"
+        registry.observe(
+            "http_request_duration_seconds",
+            time.perf_counter() - start,
+            route=route,
+            method=request.method,
+            status=str(response.status_code),
+        )
+        for name in PHASES:
+            registry.observe("http_request_phase_seconds", phases.get(name, 0.0), route=route, phase=name)
+        return response
+
+    @app.teardown_request
+    def clear_phases(error=None):
+        _active.phases = None
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        return Response(registry.exposition(), mimetype=CONTENT_TYPE)
+
+    return registry
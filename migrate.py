@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+One-shot migration of the JSON data files into the SQLite storage backend.
+Run once before starting the services with STORAGE_BACKEND=sqlite.
+"""
+
+import argparse
+from pathlib import Path
+
+from storage import SqliteStorage, read_json_array
+
+BASE_DIR = Path(__file__).resolve().parent
+
+# Data file -> (unique_fields, indexed_fields), matching each service's repository.
+DATASETS = {
+    "quotes.json": ((), ()),
+    "funfacts.json": ((), ()),
+    "goals.json": ((), ("completed",)),
+}
+
+# Partitioned datasets (see partitions.py): every <name>/<partition>.json file is migrated.
+PARTITIONED = {
+    "reflections": (("date",), ("date",)),
+}
+
+
+def migrate(data_file: Path, unique_fields: tuple, indexed_fields: tuple) -> int:
+    """Copy every record of a JSON array file into its SQLite database."""
+    storage = SqliteStorage(data_file, unique_fields, indexed_fields)
+    try:
+        return storage.import_records(read_json_array(data_file))
+    finally:
+        storage.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument("--data-dir", type=Path, default=BASE_DIR, help="directory holding the JSON data files")
+    args = parser.parse_args()
+
+    datasets = [(args.data_dir / name, fields) for name, fields in DATASETS.items()]
+    for directory, fields in PARTITIONED.items():
+        partition_files = sorted((args.data_dir / directory).glob("*.json"))
+        datasets.extend((data_file, fields) for data_file in partition_files if data_file.name != "head.json")
+        if not (args.data_dir / directory).exists():
+            print(f"Skipping {directory}/: start the service once to split {directory}.json into partitions.")
+    for data_file, (unique_fields, indexed_fields) in datasets:
+        name = data_file.relative_to(args.data_dir)
+        if not data_file.exists():
+            print(f"Skipping {name}: file not found.")
+            continue
+        count = migrate(data_file, unique_fields, indexed_fields)
+        print(f"Imported {count} records from {name} into {data_file.with_suffix('.db').name}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Date-partitioned storage for insert-only records carrying a ``YYYY-MM-DD`` date.
+
+A dataset ``reflections.json`` lives in the directory ``reflections/`` as one
+partition per month (``2025-12.json``), each opened through open_storage() so
+every backend works per partition. Compaction merges the months of years that
+have ended into one partition per year (``2024.json``):
+
+    python3 partitions.py reflections.json
+
+Records whose date is not a valid ``YYYY-MM-DD`` go to partition ``0000``.
+
+Only the newest partition (the head) takes writes. ``head.json`` names it and
+records the highest id and the record count of all older partitions, so ids
+stay unique across files (see ``id_floor`` in storage.open_storage) and start-up
+opens nothing but the head. Inserts hold a shared lock on ``partitions.lock``;
+moving the head to a new month and compaction hold it exclusively, so no write
+can land in a partition while it is being closed off or merged. Records inserted
+without a date are dated under that shared lock, so the clock is never read
+before a rollover and written after it.
+
+Range reads walk the requested days in the partitions covering them, using each
+partition's date index, so they yield records in (date, id) order without
+sorting. Because records are never updated, the first record of a date never
+changes once found: the head month's are kept in memory and served from there.
+"""
+
+from itertools import groupby, islice
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+import argparse
+import datetime
+import heapq
+import json
+import os
+import re
+import threading
+
+from metrics import phase
+from storage import SCAN_CHUNK, FileLock, SqliteStorage, open_storage, read_json_array, write_json_atomic, write_json_temp
+
+UNDATED = "0000"
+_PARTITION_NAME = re.compile(r"\d{4}(-\d{2})?")
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+
+class PartitionClosed(ValueError):
+    """An insert into a month older than the head partition, which no longer takes writes."""
+
+
+def parse_date(value) -> Optional[datetime.date]:
+    """The calendar date in a ``YYYY-MM-DD`` string, or None if it is not one."""
+    if not isinstance(value, str) or not _DATE.fullmatch(value):
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def partition_key(value) -> str:
+    """The month partition a date belongs in: ``2025-12``, or ``0000`` for invalid dates."""
+    return UNDATED if parse_date(value) is None else value[:7]
+
+
+def partition_span(key: str) -> Optional[Tuple[datetime.date, datetime.date]]:
+    """First and last day a month or year partition covers; None for the undated partition."""
+    if key == UNDATED:
+        return None
+    year = int(key[:4])
+    if len(key) == 4:
+        return datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+    month = int(key[5:7])
+    following = datetime.date(year + month // 12, month % 12 + 1, 1)
+    return datetime.date(year, month, 1), following - datetime.timedelta(days=1)
+
+
+class PartitionedStorage:
+    """Insert-only records split into month partitions by ``date_field``, with range reads over dates."""
+
+    def __init__(
+        self,
+        data_file: Path,
+        date_field: str = "date",
+        unique_fields: Tuple[str, ...] = (),
+        backend: Optional[str] = None,
+    ):
+        self.data_file = data_file
+        self.backend = backend
+        self.directory = data_file.with_suffix("")
+        self.date_field = date_field
+        self.unique_fields = tuple(dict.fromkeys((date_field,) + unique_fields))
+        self.head_file = self.directory / "head.json"
+        self._lock = threading.RLock()
+        self._partitions: Dict[str, object] = {}
+        self._head_signature: Optional[Tuple[int, int, int]] = None
+        self._head: Optional[str] = None
+        self._id_floor = 0
+        self._older_records = 0
+        self._hot: Dict[str, dict] = {}
+        self.hot_hits = 0
+        self.hot_misses = 0
+        self.rollovers = 0
+
+        self.directory.mkdir(exist_ok=True)
+        self._file_lock = FileLock(self.directory / "partitions.lock")
+        with self._file_lock.hold():
+            if not self.head_file.exists():
+                if not self._keys() and data_file.exists():
+                    self._split(read_json_array(data_file))
+                self._write_head(*self._describe(self._keys()))
+        self._sync_head()
+
+    # Partition files
+
+    def _keys(self) -> List[str]:
+        """Every partition present on disk, oldest first, whatever backend files it consists of."""
+        keys = set()
+        for entry in os.scandir(self.directory):
+            name = entry.name.split(".", 1)[0]
+            if _PARTITION_NAME.fullmatch(name) and not entry.name.endswith(".tmp"):
+                keys.add(name)
+        return sorted(keys)
+
+    def _partition_file(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _open(self, key: str, id_floor: int = 0):
+        with self._lock:
+            storage = self._partitions.get(key)
+            if storage is None:
+                storage = open_storage(
+                    self._partition_file(key), self.unique_fields, (self.date_field,), self.backend, id_floor=id_floor
+                )
+                self._partitions[key] = storage
+            return storage
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            storage = self._partitions.pop(key, None)
+        if storage is not None:
+            storage.close()
+
+    def _remove_files(self, key: str) -> None:
+        self._forget(key)
+        for entry in os.scandir(self.directory):
+            if entry.name.startswith(key + ".") and not entry.name.endswith(".tmp"):
+                os.unlink(entry.path)
+
+    def _seed(self, key: str, records: List[dict], replaces: Tuple[str, ...] = ()) -> None:
+        """Make ``records`` the whole content of partition ``key``, dropping the partitions it ``replaces``."""
+        temp_file = write_json_temp(self._partition_file(key), records)
+        for old_key in replaces:
+            self._remove_files(old_key)
+        os.replace(temp_file, self._partition_file(key))
+        storage = self._open(key)
+        if storage.backend == SqliteStorage.backend:
+            # The other backends import the JSON file when they first open it; SQLite needs a copy.
+            getattr(storage, "storage", storage).import_records(records)
+        self._forget(key)  # reopened on demand, with the head's id floor if it becomes the head
+
+    def _split(self, records: List[dict]) -> None:
+        """Spread a single-file dataset over month partitions (caller holds the exclusive lock)."""
+        records = sorted(records, key=lambda record: record["id"])
+        by_key: Dict[str, List[dict]] = {}
+        for record in records:
+            by_key.setdefault(partition_key(record.get(self.date_field)), []).append(record)
+        for key, partition_records in by_key.items():
+            self._seed(key, partition_records)
+
+    def _describe(self, keys: List[str]) -> Tuple[Optional[str], int, int]:
+        """Head, id floor and older record count for ``keys``, read from the partitions themselves."""
+        if not keys:
+            return None, 0, 0
+        id_floor = older_records = 0
+        for key in keys[:-1]:
+            index = self._open(key).index()
+            id_floor = max(id_floor, index.max_id)
+            older_records += index.count()
+        return keys[-1], id_floor, older_records
+
+    # The head partition
+
+    def _write_head(self, head: Optional[str], id_floor: int, older_records: int) -> None:
+        write_json_atomic(self.head_file, {"partition": head, "id_floor": id_floor, "older_records": older_records})
+
+    def _sync_head(self) -> None:
+        """Re-read head.json if another process (or compaction) replaced it."""
+        with phase("io"):
+            file_stat = os.stat(self.head_file)
+        signature = (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+        if signature == self._head_signature:
+            return
+        with self._lock:
+            with phase("io"):
+                text = self.head_file.read_text(encoding="utf-8")
+            with phase("parse"):
+                head = json.loads(text)
+            if head["partition"] != self._head:
+                self._hot.clear()
+            self._head = head["partition"]
+            self._id_floor = head["id_floor"]
+            self._older_records = head["older_records"]
+            self._head_signature = signature
+
+    def _head_storage(self):
+        return None if self._head is None else self._open(self._head, self._id_floor)
+
+    def _roll_over(self, key: str) -> None:
+        """Make ``key`` the head; the old head is closed to writes from now on."""
+        with self._file_lock.hold():
+            self._sync_head()
+            if self._head is not None and key <= self._head:
+                return  # another thread or process got here first
+            id_floor, older_records = self._id_floor, self._older_records
+            if self._head is not None:
+                index = self._open(self._head).index()
+                id_floor = max(id_floor, index.max_id)
+                older_records += index.count()
+            self._write_head(key, id_floor, older_records)
+            self._sync_head()
+            self.rollovers += 1
+
+    # Storage interface
+
+    def insert(self, fields: dict) -> dict:
+        return self.insert_many([fields])[0]
+
+    def insert_many(self, fields_list: List[dict]) -> List[dict]:
+        """Store records of one month in its partition; a month older than the head raises PartitionClosed.
+
+        Records without ``date_field`` are dated today, as read under the partition lock.
+        """
+        if not fields_list:
+            return []
+        while True:
+            with self._file_lock.hold(shared=True):
+                self._sync_head()
+                stamp = {self.date_field: datetime.date.today().isoformat()}
+                dated = [fields if self.date_field in fields else {**stamp, **fields} for fields in fields_list]
+                keys = {partition_key(fields.get(self.date_field)) for fields in dated}
+                if len(keys) != 1:
+                    raise ValueError("A batch must fall into a single month.")
+                (key,) = keys
+                if self._head is not None and key < self._head:
+                    raise PartitionClosed(f"Partition {key} is closed to writes; the newest is {self._head}.")
+                if key == self._head:
+                    storage = self._head_storage()
+                    records = storage.insert_many(dated)
+                    self._warm(storage, records)
+                    return records
+            self._roll_over(key)
+
+    def _warm(self, storage, records: List[dict]) -> None:
+        with self._lock:
+            for record in records:
+                date = record[self.date_field]
+                if date not in self._hot:
+                    self._hot[date] = storage.index().lookup(self.date_field, date)
+
+    def lookup(self, date: str) -> Optional[dict]:
+        """The first record dated ``date``; head-month dates are answered from memory once seen."""
+        record = self._hot.get(date)
+        if record is not None:
+            self.hot_hits += 1
+            return dict(record)
+        self.hot_misses += 1
+        self._sync_head()
+        key = partition_key(date)
+        if self._head is None or key > self._head:
+            return None
+        if key < self._head:
+            with self._file_lock.hold(shared=True):
+                found = [self._open(key).index().lookup(self.date_field, date) for key in self._keys_covering(date)]
+            return min((record for record in found if record), key=lambda record: record["id"], default=None)
+        record = self._head_storage().index().lookup(self.date_field, date)
+        if record is not None:
+            with self._lock:
+                self._hot.setdefault(date, record)
+        return record
+
+    def _keys_covering(self, date: str) -> List[str]:
+        day = parse_date(date)
+        if day is None:
+            return [key for key in self._keys() if key == UNDATED]
+        return [key for key in self._keys() if (span := partition_span(key)) and span[0] <= day <= span[1]]
+
+    def count(self) -> int:
+        self._sync_head()
+        head = self._head_storage()
+        return self._older_records + (0 if head is None else head.index().count())
+
+    def scan(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[dict]:
+        """Yield the records dated from ``start`` to ``end`` (inclusive, either may be None) in (date, id) order.
+
+        Only the partitions overlapping the range are opened. Without bounds every
+        record is yielded, partition by partition in id order. The shared lock is
+        held while a batch is read, never across a yield, so a slow reader does not
+        hold up moving the head or compaction; each batch lists the partitions
+        afresh, so a month merged away mid-scan is read from its year's partition.
+        """
+        if start is None and end is None:
+            with self._file_lock.hold(shared=True):
+                keys = self._current_keys()
+            for key in keys:
+                after = 0
+                while True:
+                    with self._file_lock.hold(shared=True):
+                        records = self._chunk(key, after)
+                    if not records:
+                        break
+                    yield from records
+                    after = records[-1]["id"]
+            return
+        day = None if start is None else parse_date(start)
+        high = None if end is None else parse_date(end)
+        while True:
+            with self._file_lock.hold(shared=True):
+                records, day = self._read_days(day, high)
+            yield from records
+            if day is None:
+                return
+
+    def _current_keys(self) -> List[str]:
+        """The partitions on disk, after dropping open ones merged away by a compaction (caller holds the lock)."""
+        keys = self._keys()
+        with self._lock:
+            for key in set(self._partitions) - set(keys):
+                self._forget(key)
+        return keys
+
+    def _chunk(self, key: str, after: int) -> List[dict]:
+        """Up to SCAN_CHUNK records of partition ``key`` with ids above ``after`` (caller holds the shared lock).
+
+        A month merged away since the scan started is read from its year's partition.
+        """
+        keys = self._current_keys()
+        if key in keys:
+            return list(islice(self._open(key).index().scan(after), SCAN_CHUNK))
+        if key[:4] not in keys:
+            return []
+        records = self._open(key[:4]).index().scan(after)
+        month = (record for record in records if partition_key(record.get(self.date_field)) == key)
+        return list(islice(month, SCAN_CHUNK))
+
+    def _read_days(
+        self, day: Optional[datetime.date], high: Optional[datetime.date]
+    ) -> Tuple[List[dict], Optional[datetime.date]]:
+        """Whole days of records from ``day`` (None: the first) to ``high``, until at least SCAN_CHUNK are read.
+
+        Returns them with the day to continue from, or None once the range is done.
+        The caller holds the shared lock.
+        """
+        spans = [(key, span) for key in self._current_keys() if (span := partition_span(key))]
+        records: List[dict] = []
+        while len(records) < SCAN_CHUNK:
+            ahead = [span for _, span in spans if day is None or span[1] >= day]
+            if not ahead:
+                return records, None
+            day = max(day or datetime.date.min, min(span[0] for span in ahead))  # skip days no partition covers
+            if high is not None and day > high:
+                return records, None
+            date = day.isoformat()
+            indexes = [self._open(key).index() for key, span in spans if span[0] <= day <= span[1]]
+            scans = [index.scan(0, self.date_field, date) for index in indexes]
+            records.extend(scans[0] if len(scans) == 1 else heapq.merge(*scans, key=lambda record: record["id"]))
+            day += datetime.timedelta(days=1)
+        return records, day
+
+    def load(self) -> List[dict]:
+        return list(self.scan())
+
+    def compact(self) -> List[str]:
+        """Merge the month partitions of every year before the head's into one partition per year.
+
+        Returns the yearly partitions written.
+        """
+        merged = []
+        with self._file_lock.hold():
+            self._sync_head()
+            if self._head is None:
+                return merged
+            keys = self._keys()
+            for year, year_keys in groupby(keys, key=lambda key: key[:4]):
+                year_keys = list(year_keys)
+                if year == UNDATED or year >= self._head[:4] or year_keys == [year]:
+                    continue
+                records = sorted(
+                    (record for key in year_keys for record in self._open(key).index().scan()),
+                    key=lambda record: record["id"],
+                )
+                self._seed(year, records, replaces=tuple(year_keys))
+                merged.append(year)
+        return merged
+
+    def version(self) -> Tuple[str, float]:
+        """The head partition's name and version token; older partitions never change contents."""
+        self._sync_head()
+        head = self._head_storage()
+        if head is None:
+            return "0", 0.0
+        token, modified = head.version()
+        return f"{self._head}-{token}", modified
+
+    def stats(self) -> dict:
+        head = self._head_storage()
+        return {
+            **({} if head is None else head.stats()),
+            "open_partitions": len(self._partitions),
+            "hot_hits": self.hot_hits,
+            "hot_misses": self.hot_misses,
+            "rollovers": self.rollovers,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            keys = list(self._partitions)
+        for key in keys:
+            self._forget(key)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_files", nargs="+", type=Path)
+    args = parser.parse_args()
+
+    for data_file in args.data_files:
+        storage = PartitionedStorage(data_file)
+        try:
+            merged = storage.compact()
+        finally:
+            storage.close()
+        print(f"{data_file}: merged {', '.join(merged) if merged else 'nothing'}")
+
+
+if __name__ == "__main__":
+    main()
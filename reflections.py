@@ -1,70 +1,106 @@
 from pathlib import Path
-from typing import List, Optional
-from flask import Flask, jsonify, request
-import json
+from typing import Iterator, Mapping, Optional, Tuple
+from flask import Flask, Response, jsonify, request, stream_with_context
+import codec
+import config
+import handlers
+from admission import admit
+from httpcache import compress_responses, json_result, versioned_json
+from metrics import dataset_gauges, instrument
+from partitions import PartitionedStorage, parse_date
+from repository import Repository
 from datetime import datetime
 
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = config.MAX_CONTENT_LENGTH
 
 DATA_FILE = Path(__file__).with_name("reflections.json")
 
 
-class ReflectionRepository:
-    """Repository for managing daily reflections."""
+class ReflectionRepository(Repository):
+    """Repository for managing daily reflections, stored in month partitions under reflections/."""
 
-    def __init__(self, data_file: Path):
-        self.data_file = data_file
+    service = "reflections"
 
-    def _read_all(self) -> List[dict]:
-        if not self.data_file.exists():
-            return []
-        with self.data_file.open("r", encoding="utf-8") as handle:
-            return json.load(handle)
+    def _open_storage(self):
+        return PartitionedStorage(self.data_file, date_field="date", backend=self.backend)
 
-    def _write_all(self, reflections: List[dict]) -> None:
-        with self.data_file.open("w", encoding="utf-8") as handle:
-            json.dump(reflections, handle, indent=4)
+    def new_record(self, text: str) -> dict:
+        return {"reflection": text}  # PartitionedStorage dates it as it is written
 
-    def get_all(self) -> List[dict]:
-        return self._read_all()
+    def count(self) -> int:
+        return self._cache.get("count", self._storage.count)
 
     def get_today(self) -> Optional[dict]:
         today = datetime.now().strftime("%Y-%m-%d")
-        reflections = self._read_all()
-        for reflection in reflections:
-            if reflection.get("date") == today:
-                return reflection
-        return None
-
-    def create(self, reflection_text: str) -> dict:
-        reflections = self._read_all()
-        today = datetime.now().strftime("%Y-%m-%d")
-        new_reflection = {
-            "id": len(reflections) + 1,
-            "date": today,
-            "reflection": reflection_text,
-        }
-        reflections.append(new_reflection)
-        self._write_all(reflections)
-        return new_reflection
+        return self._storage.lookup(today)
+
+    def iter_range(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[dict]:
+        """Yield reflections dated from ``start`` to ``end`` inclusive, by date, reading only their partitions."""
+        return self._storage.scan(start, end)
 
 
 repository = ReflectionRepository(DATA_FILE)
+admission = admit(app, "reflections")
+request_metrics = instrument(app, "reflections", lambda: {**dataset_gauges(repository.count(), repository.cache_stats()), **admission.gauges()})
+compress_responses(app)
 
 
-def parse_reflection_payload() -> str:
+def parse_reflection_payload(data: Optional[dict] = None) -> str:
     """Validate incoming payloads."""
-    data = request.get_json(silent=True) or {}
-    reflection_text = data.get("reflection", "").strip()
-    if not reflection_text:
+    if data is None:
+        data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        raise ValueError("Each item must be a JSON object.")
+    reflection_text = data.get("reflection", "")
+    if not isinstance(reflection_text, str) or not reflection_text.strip():
         raise ValueError("Request JSON must include a non-empty 'reflection' field.")
-    return reflection_text
+    return reflection_text.strip()
+
+
+def parse_range_query(args: Optional[dict] = None) -> Tuple[Optional[str], Optional[str]]:
+    """Validate the optional ?from= and ?to= dates (YYYY-MM-DD, inclusive)."""
+    if args is None:
+        args = request.args
+    start, end = args.get("from"), args.get("to")
+    for name, value in (("from", start), ("to", end)):
+        if value is not None and parse_date(value) is None:
+            raise ValueError(f"'{name}' must be a date in YYYY-MM-DD format.")
+    if start is not None and end is not None and start > end:
+        raise ValueError("'from' must not be after 'to'.")
+    return start, end
+
+
+def health_payload() -> dict:
+    return {
+        "service": "Daily Reflections",
+        "status": "running",
+        "endpoints": ["/reflection", "/reflection/today"],
+        "records": repository.count(),
+        "cache": repository.cache_stats(),
+        "admission": admission.stats(),
+    }
+
+
+def range_body(args: Mapping[str, str], accept: Optional[str]) -> Tuple[str, Iterator[bytes]]:
+    """The content type and streamed body of GET /reflection; raises ValueError for a bad range."""
+    reflections = repository.iter_range(*parse_range_query(args))
+    if handlers.wants_ndjson(args, accept):
+        return "application/x-ndjson", codec.ndjson_lines(reflections)
+    return "application/json", codec.array_chunks("reflections", reflections)
+
+
+def today_result() -> handlers.Result:
+    reflection = repository.get_today()
+    if not reflection:
+        return {"message": "No reflection found for today.", "date": datetime.now().strftime("%Y-%m-%d")}, 404
+    return reflection, 200
 
 
 # Root route for health check
 @app.route("/", methods=["GET"])
 def root():
-    return jsonify({"service": "Daily Reflections", "status": "running", "endpoints": ["/reflection", "/reflection/today"]}), 200
+    return versioned_json(health_payload(), repository.version())
 
 # POST new reflection
 @app.route("/reflection", methods=["POST"])
@@ -74,35 +110,42 @@ def add_reflection():
     except ValueError as error:
         return jsonify({"error": str(error)}), 400
 
-    new_reflection = repository.create(reflection_text)
-    return (
-        jsonify(
-            {
-                "message": "Reflection saved successfully!",
-                "reflection": new_reflection,
-            }
-        ),
-        201,
+    return json_result(handlers.created("reflection", "Reflection saved successfully!", repository.create(reflection_text)))
+
+
+# POST many new reflections in a single write
+@app.route("/reflection/batch", methods=["POST"])
+def add_reflections():
+    return json_result(
+        handlers.create_batch(
+            request.get_json(silent=True),
+            parse_reflection_payload,
+            repository.create_many,
+            "reflections",
+            "reflections",
+            "reflections saved successfully!",
+        )
     )
 
 
+# GET reflections dated between ?from= and ?to= (YYYY-MM-DD, inclusive), streamed as one
+# JSON document or one JSON object per line (?format=ndjson)
+@app.route("/reflection", methods=["GET"])
+def get_reflections():
+    try:
+        content_type, chunks = range_body(request.args, request.headers.get("Accept"))
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    return Response(stream_with_context(chunks), mimetype=content_type)
+
+
 # GET today's reflection
 @app.route("/reflection/today", methods=["GET"])
 def get_today_reflection():
-    reflection = repository.get_today()
-    if not reflection:
-        return (
-            jsonify(
-                {
-                    "message": "No reflection found for today.",
-                    "date": datetime.now().strftime("%Y-%m-%d"),
-                }
-            ),
-            404,
-        )
-    return jsonify(reflection), 200
+    return json_result(today_result())
 
 
 if __name__ == "__main__":
-    app.run(debug=True, port=5003)
+    app.run(debug=config.DEBUG, host=config.HOST, port=config.port("reflections"))
 
@@ -0,0 +1,399 @@
+"""
+Read replicas for the quote and fun-fact services: one writer, any number of followers.
+
+The writer (leader) appends every create and update to a change log next to its
+data file (quotes.changes) and serves it at ``GET /changes?since=<version>``,
+long-polled with ``&wait=<seconds>``. A follower is the same service started with
+REPLICATE_FROM (or QUOTES_REPLICATE_FROM, ...) set to the leader's base URL: it
+keeps its records in a MemoryStorage, tails the feed into it, answers reads
+itself and refuses writes with a 405 that names the leader. Put the followers
+behind a load balancer for reads and send writes to the leader.
+
+Versions are ``<log generation>-<byte offset>``. A follower without a version,
+or with one from an older generation (the log is restarted once it outgrows
+CHANGE_LOG_MAX_BYTES), gets a snapshot of every record instead of the changes.
+
+Each log entry carries the record's full contents as read back from storage
+while the log lock is held, and creates are logged in id order by scanning
+for ids above the last logged one. So however the writer's threads and
+processes interleave, replaying the log in order (every entry is an upsert)
+ends with the leader's records.
+
+GET /replication reports the role and, on a follower, its lag; /metrics
+exports the same numbers as replication_* gauges.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import quote
+import gzip
+import json
+import os
+import threading
+import time
+import urllib.request
+import uuid
+
+import config
+from storage import FileLock
+
+MAX_BYTES = config.env_int("CHANGE_LOG_MAX_BYTES", 64 * 1024 * 1024)
+# Longest a GET /changes is held open waiting for a change; keep it below TIMEOUT.
+MAX_WAIT = config.env_int("REPLICATION_WAIT", 25)
+# Most changes returned by one GET /changes.
+MAX_CHANGES = 10_000
+# How often a waiting GET /changes looks for entries written by other processes.
+POLL_INTERVAL = 0.1
+# Follower retry delays after a failed poll, in seconds.
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 10.0
+
+
+class ChangeLog:
+    """Append-only JSON-lines log of record changes, shared by every process writing one data file.
+
+    The first line is a header naming the log's generation and the last record id
+    logged before it started; each further line is one ``{"op", "record", "at"}``
+    entry. publish() holds an exclusive lock on a sidecar file; readers need no
+    lock and only ever consume complete lines.
+
+    The ids of records other processes logged as updated are kept until
+    take_foreign_updates(), so this process can refresh what it derives from
+    them (the search index, the sampler).
+    """
+
+    def __init__(self, log_file: Path, max_bytes: int = MAX_BYTES):
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self._file_lock = FileLock(log_file.with_name(log_file.name + ".lock"))
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        # How far this process has read the log: file identity, offset and last created id.
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._last_id = 0
+        # Ids other processes logged as updated since take_foreign_updates(); None once entries may have been missed.
+        self._foreign: Optional[set] = set()
+        self.published = 0
+        self.rotations = 0
+
+    def _read_header(self, handle) -> Optional[dict]:
+        handle.seek(0)
+        line = handle.readline()
+        if not line.endswith(b"\n"):
+            return None
+        header = json.loads(line)
+        return header if isinstance(header, dict) and "log" in header else None
+
+    def _start(self, last_id: int) -> None:
+        """Begin a new generation holding no entries; callers hold the file lock."""
+        temp_file = self.log_file.with_name(self.log_file.name + ".tmp")
+        header = {"log": uuid.uuid4().hex[:12], "last_id": last_id, "started": time.time()}
+        temp_file.write_bytes(json.dumps(header).encode("utf-8") + b"\n")
+        os.replace(temp_file, self.log_file)
+
+    def _open(self, index):
+        """The log file, started afresh if missing or unreadable; callers hold the file lock.
+
+        A new log starts after the records already stored: followers get those from a snapshot.
+        """
+        try:
+            handle = self.log_file.open("rb")
+        except FileNotFoundError:
+            handle = None
+        if handle is not None:
+            if self._read_header(handle) is not None:
+                return handle
+            handle.close()
+        self._start(max(self._last_id, index.max_id))
+        return self.log_file.open("rb")
+
+    def _catch_up(self, index) -> None:
+        """Read entries appended since this process last looked; callers hold the file lock."""
+        with self._open(index) as handle:
+            inode = os.fstat(handle.fileno()).st_ino
+            if inode != self._inode:
+                if self._inode is not None:  # another process started a new generation; its last entries were not read
+                    self._foreign = None
+                header = self._read_header(handle)
+                self._inode, self._offset, self._last_id = inode, handle.tell(), header["last_id"]
+            handle.seek(self._offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                entry = json.loads(line)
+                if entry["op"] == "create":
+                    self._last_id = max(self._last_id, entry["record"]["id"])
+                elif self._foreign is not None:
+                    self._foreign.add(entry["record"]["id"])
+                self._offset += len(line)
+
+    def publish(self, index, updated_ids: List[int] = ()) -> int:
+        """Log every record ``index`` holds above the last logged id as created, then ``updated_ids`` as updated.
+
+        ``index`` is the storage's current index (anything with scan(), get() and max_id).
+        Returns the number of entries written.
+        """
+        with self._lock, self._file_lock.hold():
+            self._catch_up(index)
+            now = time.time()
+            lines = []
+            for record in index.scan(self._last_id):
+                lines.append(json.dumps({"op": "create", "record": record, "at": now}))
+                self._last_id = record["id"]
+            for record_id in dict.fromkeys(updated_ids):
+                record = index.get(record_id) if record_id <= self._last_id else None
+                if record is not None:
+                    lines.append(json.dumps({"op": "update", "record": record, "at": now}))
+            if lines:
+                data = ("\n".join(lines) + "\n").encode("utf-8")
+                with self.log_file.open("ab") as handle:
+                    handle.write(data)
+                self._offset += len(data)
+                self.published += len(lines)
+            if self._offset > self.max_bytes:
+                self._start(self._last_id)
+                with self.log_file.open("rb") as handle:
+                    self._read_header(handle)
+                    self._inode, self._offset = os.fstat(handle.fileno()).st_ino, handle.tell()
+                self.rotations += 1
+        if lines:
+            with self._changed:
+                self._changed.notify_all()
+        return len(lines)
+
+    def take_foreign_updates(self, index) -> Optional[set]:
+        """The ids other processes logged as updated since the last call, or None if some may have been missed."""
+        with self._lock, self._file_lock.hold():
+            self._catch_up(index)
+            updated, self._foreign = self._foreign, set()
+        return updated
+
+    def position(self) -> str:
+        """A token that changes whenever any process appends to or restarts the log; one stat, no lock."""
+        try:
+            status = os.stat(self.log_file)
+        except FileNotFoundError:
+            return ""
+        return f"{status.st_ino}-{status.st_size}"
+
+    def head(self) -> str:
+        """The version just past the last entry."""
+        with self._file_lock.hold(shared=True):  # writers append whole entries under the exclusive lock
+            try:
+                with self.log_file.open("rb") as handle:
+                    header = self._read_header(handle)
+                    size = os.fstat(handle.fileno()).st_size
+            except FileNotFoundError:
+                return ""
+        return "" if header is None else f"{header['log']}-{size}"
+
+    def read(self, version: str, limit: int = MAX_CHANGES) -> Optional[dict]:
+        """Up to ``limit`` entries after ``version`` and the version to ask for next; None if a snapshot is needed."""
+        generation, _, offset_text = version.partition("-")
+        if not offset_text.isdigit():
+            return None
+        offset = int(offset_text)
+        try:
+            with self.log_file.open("rb") as handle:
+                header = self._read_header(handle)
+                if header is None or header["log"] != generation or offset < handle.tell():
+                    return None
+                size = os.fstat(handle.fileno()).st_size
+                if offset > size:
+                    return None
+                handle.seek(offset)
+                changes = []
+                for line in handle:
+                    if not line.endswith(b"\n") or len(changes) >= limit:
+                        break
+                    changes.append(json.loads(line))
+                    offset += len(line)
+        except FileNotFoundError:
+            return None
+        return {"version": f"{generation}-{offset}", "behind_bytes": max(size - offset, 0), "changes": changes}
+
+    def wait(self, version: str, timeout: float, limit: int = MAX_CHANGES) -> Optional[dict]:
+        """read(), holding on for up to ``timeout`` seconds until there is something to return."""
+        deadline = time.monotonic() + timeout
+        while True:
+            result = self.read(version, limit)
+            remaining = deadline - time.monotonic()
+            if result is None or result["changes"] or remaining <= 0:
+                return result
+            with self._changed:
+                self._changed.wait(min(remaining, POLL_INTERVAL))
+
+    def stats(self) -> dict:
+        try:
+            size = self.log_file.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        return {"log_bytes": size, "published": self.published, "rotations": self.rotations}
+
+
+class Leader:
+    """The writer's side: serves the repository's change log."""
+
+    role = "leader"
+
+    def __init__(self, repository):
+        self.repository = repository
+        self.changes: ChangeLog = repository.changes
+        self.snapshots = 0
+
+    def feed(self, since: str, wait: float, limit: int) -> dict:
+        """The payload of GET /changes: the changes after ``since``, or a snapshot of every record."""
+        result = self.changes.wait(since, wait, limit) if since else None
+        if result is not None:
+            return {"snapshot": False, **result}
+        self.snapshots += 1
+        head = self.changes.head()  # taken first: replaying from here over the snapshot converges
+        records = self.repository.get_all()
+        return {"snapshot": True, "version": head, "behind_bytes": 0, "changes": [{"op": "create", "record": record} for record in records]}
+
+    def stats(self) -> dict:
+        return {"role": self.role, "version": self.changes.head(), "snapshots_served": self.snapshots, **self.changes.stats()}
+
+
+class Follower:
+    """Tails the leader's change feed into a follower repository on a background thread."""
+
+    role = "follower"
+
+    def __init__(self, repository, leader: str, wait: float = MAX_WAIT):
+        self.repository = repository
+        self.leader = leader.rstrip("/")
+        self.wait = wait
+        self.version = ""
+        self.applied = 0
+        self.snapshots = 0
+        self.errors = 0
+        self.last_error = ""
+        self.lag_seconds = 0.0
+        self.behind_bytes = 0
+        self.last_contact: Optional[float] = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> "Follower":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+    def poll(self, wait: float = 0.0) -> int:
+        """Fetch and apply one batch of changes, waiting up to ``wait`` seconds for one; returns the entries applied."""
+        url = f"{self.leader}/changes?since={quote(self.version)}&wait={wait:g}&limit={MAX_CHANGES}"
+        feed_request = urllib.request.Request(url, headers={"Accept-Encoding": "gzip"})
+        with urllib.request.urlopen(feed_request, timeout=wait + 30) as response:
+            data = response.read()
+            if response.headers.get("Content-Encoding") == "gzip":
+                data = gzip.decompress(data)
+        payload = json.loads(data)
+        changes = payload["changes"]
+        if changes:
+            self.repository.replay([change["record"] for change in changes])
+        now = time.time()
+        self.last_contact = now
+        self.version = payload["version"]
+        self.behind_bytes = payload["behind_bytes"]
+        self.applied += len(changes)
+        if payload["snapshot"]:
+            self.snapshots += 1
+        elif changes:
+            self.lag_seconds = max(now - changes[-1]["at"], 0.0)
+        if not self.behind_bytes and not changes:
+            self.lag_seconds = 0.0
+        return len(changes)
+
+    def _run(self) -> None:
+        delay = RETRY_DELAY
+        while not self._stopped.is_set():
+            try:
+                self.poll(self.wait)
+                delay = RETRY_DELAY
+                if not self.version:  # the leader has no change log yet
+                    self._stopped.wait(delay)
+            except (OSError, ValueError, KeyError) as error:
+                self.errors += 1
+                self.last_error = str(error)
+                self._stopped.wait(delay)
+                delay = min(delay * 2, MAX_RETRY_DELAY)
+
+    def stats(self) -> dict:
+        return {
+            "role": self.role,
+            "leader": self.leader,
+            "version": self.version,
+            "applied": self.applied,
+            "snapshots": self.snapshots,
+            "lag_seconds": round(self.lag_seconds, 6),
+            "behind_bytes": self.behind_bytes,
+            "last_contact_seconds": None if self.last_contact is None else round(time.time() - self.last_contact, 3),
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
+
+
+def parse_feed_query(args: Mapping[str, str]) -> Tuple[str, float, int]:
+    """Validate the ?since=, ?wait= and ?limit= arguments of GET /changes; wait and limit are capped."""
+    try:
+        wait = float(args.get("wait", 0))
+        limit = int(args.get("limit", MAX_CHANGES))
+    except ValueError:
+        raise ValueError("'wait' must be a number of seconds and 'limit' a positive integer.") from None
+    if not wait >= 0 or limit < 1:
+        raise ValueError("'wait' must be a number of seconds and 'limit' a positive integer.")
+    return args.get("since", ""), min(wait, MAX_WAIT), min(limit, MAX_CHANGES)
+
+
+def replication_gauges(stats: dict) -> Dict[str, float]:
+    """The numeric replication stats, named for /metrics."""
+    return {
+        f"replication_{name}": value
+        for name, value in stats.items()
+        if isinstance(value, (int, float)) and not isinstance(value, bool)
+    }
+
+
+def replicate(app, repository):
+    """Make ``app`` the leader or a follower for ``repository``, as its REPLICATE_FROM setting says.
+
+    A leader gets GET /changes. A follower starts tailing the leader and answers
+    anything but GET, HEAD and OPTIONS with a 405. Both get GET /replication.
+    Returns the Leader or Follower.
+    """
+    from flask import jsonify, request
+
+    if repository.leader:
+        role = Follower(repository, repository.leader).start()
+
+        @app.before_request
+        def refuse_writes():
+            if request.method not in ("GET", "HEAD", "OPTIONS"):
+                response = jsonify({"error": "This instance is a read-only replica; send writes to the leader.", "leader": role.leader})
+                response.status_code = 405
+                response.allow.update(("GET", "HEAD"))
+                return response
+            return None
+
+    else:
+        role = Leader(repository)
+
+        @app.route("/changes", methods=["GET"])
+        def changes():
+            try:
+                since, wait, limit = parse_feed_query(request.args)
+            except ValueError as error:
+                return jsonify({"error": str(error)}), 400
+            response = jsonify(role.feed(since, wait, limit))
+            response.cache_control.no_store = True
+            return response
+
+    @app.route("/replication", methods=["GET"])
+    def replication():
+        return jsonify(role.stats())
+
+    return role
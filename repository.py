@@ -0,0 +1,310 @@
+"""
+Common core of the four service repositories.
+
+A Repository opens one storage engine (any of storage.STORAGE_BACKENDS) and
+reads it through a cache policy (CACHE_POLICIES). Both are chosen per service
+with STORAGE_BACKEND / CACHE_POLICY / CACHE_TTL, optionally prefixed with the
+service name (see config.py). Subclasses only describe their records: the
+fields to index and how a new record is built from the text a client sends.
+
+TextRepository adds what the quote and fun-fact services share: full-text
+search (search.py), per-client random draws (sampling.py) and read replicas
+(replication.py): a leader logs its changes, a follower replays them. The
+change log also tells each worker process which records the others edited, so
+its search index and sampler follow those edits as well as its own.
+
+benchmarks/conformance.py runs every engine and cache policy through the same
+behaviour checks and speed budgets.
+"""
+
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import threading
+import time
+
+import config
+from replication import ChangeLog
+from sampling import Sampler
+from search import SearchIndex
+from storage import MemoryStorage, open_storage
+
+
+class ValidatePolicy:
+    """Ask the storage on every read; each engine revalidates its in-memory copy itself (a stat, or a query)."""
+
+    name = "validate"
+
+    def __init__(self, ttl: float = 0.0):
+        self.ttl = ttl
+
+    def get(self, key: str, load: Callable[[], object]):
+        return load()
+
+    def invalidate(self) -> None:
+        pass
+
+    def stats(self) -> dict:
+        return {"cache_policy": self.name}
+
+
+class TtlPolicy:
+    """Reuse each kind of read (the index, the version, ...) for ``ttl`` seconds.
+
+    Writes through the same repository drop the cached reads, so they are seen
+    at once; writes by other processes show up after at most ``ttl`` seconds.
+    """
+
+    name = "ttl"
+
+    def __init__(self, ttl: float = 1.0):
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[float, object]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, load: Callable[[], object]):
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and now - entry[0] < self.ttl:
+            self.hits += 1
+            return entry[1]
+        value = load()
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (now, value)
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"cache_policy": self.name, "policy_hits": self.hits, "policy_misses": self.misses}
+
+
+CACHE_POLICIES = {
+    ValidatePolicy.name: ValidatePolicy,
+    TtlPolicy.name: TtlPolicy,
+}
+
+
+def open_cache_policy(name: str, ttl: float):
+    try:
+        return CACHE_POLICIES[name](ttl)
+    except KeyError:
+        raise ValueError(f"Unknown cache policy '{name}'. Choose from: {', '.join(CACHE_POLICIES)}.") from None
+
+
+class Repository:
+    """Storage engine, cache policy and the operations every service repository shares.
+
+    ``service`` names the per-service settings; ``backend`` and ``cache`` override them.
+    """
+
+    service = ""
+    unique_fields: Tuple[str, ...] = ()
+    indexed_fields: Tuple[str, ...] = ()
+
+    def __init__(self, data_file: Path, backend: Optional[str] = None, cache: Optional[str] = None):
+        self.data_file = data_file
+        self.backend = backend or config.service_setting(self.service, "STORAGE_BACKEND", "json")
+        ttl = float(config.service_setting(self.service, "CACHE_TTL", "1"))
+        self._cache = open_cache_policy(cache or config.service_setting(self.service, "CACHE_POLICY", "validate"), ttl)
+        self._storage = self._open_storage()
+
+    def _open_storage(self):
+        return open_storage(self.data_file, self.unique_fields, self.indexed_fields, backend=self.backend)
+
+    def _index(self):
+        return self._cache.get("index", self._storage.index)
+
+    def _read_all(self) -> List[dict]:
+        return self._storage.load()
+
+    def cache_stats(self) -> dict:
+        return {**self._storage.stats(), **self._cache.stats()}
+
+    def version(self) -> Tuple[str, float]:
+        return self._cache.get("version", self._storage.version)
+
+    def close(self) -> None:
+        self._storage.close()
+
+    def count(self) -> int:
+        return self._index().count()
+
+    def get_all(self) -> List[dict]:
+        return self._read_all()
+
+    def new_record(self, text: str) -> dict:
+        """The fields of a record created from a client's ``text``."""
+        raise NotImplementedError
+
+    def create(self, text: str) -> dict:
+        return self.create_many([text])[0]
+
+    def create_many(self, texts: List[str]) -> List[dict]:
+        records = self._storage.insert_many([self.new_record(text) for text in texts])
+        self._cache.invalidate()
+        self._created(records)
+        return records
+
+    def _apply_updates(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        """Apply (id, changes) pairs in one write; unknown ids yield None."""
+        edits = self._storage.edit_many(updates)
+        self._cache.invalidate()
+        for old, record in edits:
+            if record is not None:
+                self._updated(old, record)
+        return [record for _, record in edits]
+
+    def _created(self, records: List[dict]) -> None:
+        """Hook for subclasses that keep derived state (indexes, samplers) in step with new records."""
+
+    def _updated(self, old: dict, record: dict) -> None:
+        """Hook called with each edited record's previous and new contents."""
+
+
+class TextRepository(Repository):
+    """Records holding one text in ``text_field``, with full-text search, per-client random draws and replicas.
+
+    ``leader`` (default: the service's REPLICATE_FROM setting) is the base URL of the
+    instance this one follows. A follower keeps its records in memory and takes
+    them from replay(); otherwise every write is published to ``changes``.
+    """
+
+    text_field = ""
+
+    def __init__(
+        self,
+        data_file: Path,
+        backend: Optional[str] = None,
+        cache: Optional[str] = None,
+        leader: Optional[str] = None,
+    ):
+        self.leader = config.service_setting(self.service, "REPLICATE_FROM", "") if leader is None else leader
+        super().__init__(data_file, MemoryStorage.backend if self.leader else backend, cache)
+        self._search = SearchIndex(data_file.with_suffix(".search"), self.text_field)
+        self._sampler = Sampler()
+        self.changes = None if self.leader else ChangeLog(data_file.with_suffix(".changes"))
+        self.publish_changes()  # starts the log, or logs creates a crash kept from being published
+        # Edits that predate this instance: the search index and sampler read them from storage when first built.
+        self._edited: Dict[str, Optional[set]] = {"search": set(), "sampler": set()}
+        self._edited_lock = threading.Lock()
+        self._updated_lock = threading.Lock()
+        if self.changes is not None:
+            self.changes.take_foreign_updates(self._storage.index())
+
+    def _open_storage(self):
+        if self.leader:
+            return MemoryStorage(self.data_file, self.unique_fields, self.indexed_fields)
+        return super()._open_storage()
+
+    def close(self) -> None:
+        if self._search.version is not None and not self.leader:  # a follower's index is not the leader's file
+            self._sync_search()
+            self._search.save()
+        super().close()
+
+    def publish_changes(self, updated_ids: List[int] = ()) -> None:
+        """Log new records, and the current contents of ``updated_ids``, to the change feed."""
+        if self.changes is not None:
+            self.changes.publish(self._storage.index(), updated_ids)
+
+    def replay(self, records: List[dict]) -> None:
+        """Store complete records taken from the leader's change feed (followers only)."""
+        previous = self._storage.put_many(records)
+        self._cache.invalidate()
+        for old, record in zip(previous, records):
+            if old is not None:
+                self._updated(old, record)
+        self._created([record for old, record in zip(previous, records) if old is None])
+
+    def new_record(self, text: str) -> dict:
+        return {self.text_field: text}
+
+    def _scan_after(self, after: int):
+        return self._index().scan(after)
+
+    def _derived_version(self) -> str:
+        """The storage version, plus the change log's position so that edits other processes log are noticed too.
+
+        A write reaches storage before it is logged, so the storage version alone
+        could be taken as caught up while an edit is still on its way to the log.
+        """
+        version = self.version()[0]
+        return version if self.changes is None else f"{version}/{self.changes.position()}"
+
+    def _edited_by_others(self, consumer: str) -> Callable[[], Optional[List[dict]]]:
+        """For ``consumer``'s sync(): the records other processes updated since its last sync, or None if unknown."""
+
+        def edited() -> Optional[List[dict]]:
+            if self.changes is None:
+                return []
+            updated = self.changes.take_foreign_updates(self._storage.index())
+            with self._edited_lock:
+                for name, pending in self._edited.items():
+                    if updated is None:
+                        self._edited[name] = None
+                    elif pending is not None:
+                        pending.update(updated)
+                ids, self._edited[consumer] = self._edited[consumer], set()
+            if ids is None:
+                return None
+            index = self._index()
+            return [record for record in map(index.get, sorted(ids)) if record is not None]
+
+        return edited
+
+    def _sync_search(self) -> None:
+        self._search.sync(self._derived_version(), self._scan_after, self._edited_by_others("search"))
+
+    def _sync_sampler(self) -> None:
+        self._sampler.sync(self._derived_version(), self._scan_after, self._edited_by_others("sampler"))
+
+    def search(self, query: str, limit: int) -> Tuple[List[dict], int]:
+        """The ``limit`` best records matching every term of ``query`` (``term*`` for a prefix), and the match count."""
+        self._sync_search()
+        ids, total = self._search.search(query, limit)
+        index = self._index()
+        return [record for record in map(index.get, ids) if record is not None], total
+
+    def sampling_stats(self) -> dict:
+        return self._sampler.stats()
+
+    def get_random(self, client: Optional[str] = None) -> Optional[dict]:
+        """A random record; a ``client`` sees no repeats until its shuffle bag is used up (see sampling.py)."""
+        self._sync_sampler()
+        record_id = self._sampler.draw(client)
+        return None if record_id is None else self._index().get(record_id)
+
+    def get_random_sequence(self, count: int, client: Optional[str] = None) -> List[dict]:
+        """``client``'s next ``count`` draws, in the order get_random() would have returned them."""
+        self._sync_sampler()
+        ids = [record_id for record_id in (self._sampler.draw(client) for _ in range(count)) if record_id is not None]
+        index = self._index()
+        return [record for record in map(index.get, ids) if record is not None]
+
+    def get_random_many(self, count: int) -> List[dict]:
+        return self._index().sample(count)
+
+    def _apply_updates(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        records = super()._apply_updates(updates)
+        self.publish_changes([record["id"] for record in records if record is not None])
+        return records
+
+    def _created(self, records: List[dict]) -> None:
+        for record in records:
+            self._search.add(record)
+            self._sampler.add(record)
+        self.publish_changes()
+
+    def _updated(self, old: dict, record: dict) -> None:
+        # Concurrent edits of one record can get here in either order, so drop the terms of both texts and index
+        # what storage holds now: whichever edit's hook runs last sees the final text.
+        with self._updated_lock:
+            current = self._storage.index().get(record["id"]) or record
+            texts = (old.get(self.text_field, ""), record[self.text_field])
+            self._search.replace(record["id"], texts, current[self.text_field])
+            self._sampler.update(current)
@@ -0,0 +1,292 @@
+"""
+Random record selection for the quote and fun-fact services.
+
+A Sampler keeps the id and weight of every record of one repository in arrays
+and answers draw(client) in O(1):
+
+* While every weight is 1, each client draws from its own shuffle bag: a lazily
+  applied Fisher-Yates shuffle over the id array, so a client sees no record
+  twice until the bag (the whole corpus, or BAG_SIZE draws if that is smaller)
+  is used up. Only displaced positions are stored, at most one per draw.
+* Once any record has another weight, draws follow the weights through a
+  Walker/Vose alias table, and each client's last WINDOW records are skipped.
+
+New records append to the arrays and join the unvisited part of every open bag.
+The alias table is not rebuilt for each change: every position is drawn with a
+"cover" weight at least its real weight and accepted with probability
+weight / cover, so lowered weights cost nothing, and new records go to an
+overflow list drawn by binary search over running totals. The table is rebuilt
+when a weight rises above its cover, when the overflow outgrows the table or
+when rejections would exceed half the draws, keeping draws O(1) expected.
+
+Per-client state lives in an LRU that evicts the least recently seen clients
+beyond MAX_CLIENTS clients or MAX_STATE stored positions.
+"""
+
+from array import array
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Set
+import bisect
+import random
+import threading
+
+import config
+
+BAG_SIZE = config.env_int("SAMPLING_BAG_SIZE", 10_000)
+WINDOW = config.env_int("SAMPLING_WINDOW", 32)
+MAX_CLIENTS = config.env_int("SAMPLING_MAX_CLIENTS", 100_000)
+MAX_STATE = config.env_int("SAMPLING_MAX_STATE", 2_000_000)
+
+
+def record_weight(record: dict) -> float:
+    """A record's positive ``weight`` field, or 1."""
+    weight = record.get("weight", 1)
+    if isinstance(weight, bool) or not isinstance(weight, (int, float)) or weight <= 0:
+        return 1.0
+    return float(weight)
+
+
+def client_key(client_id: Optional[str], remote_addr: Optional[str]) -> Optional[str]:
+    """The client a draw is for: its X-Client-Id header, else its address, else None (anonymous)."""
+    client_id = (client_id or "").strip()
+    if client_id:
+        return "id:" + client_id[:128]
+    return "addr:" + remote_addr if remote_addr else None
+
+
+class AliasTable:
+    """Vose's alias method: O(n) build, then O(1) draws of position i with probability weights[i] / total."""
+
+    def __init__(self, weights: array):
+        size = len(weights)
+        self.total = sum(weights)
+        self.probability = array("d", [1.0]) * size
+        self.alias = array("q", range(size))
+        scaled = [weight * size / self.total for weight in weights] if self.total else []
+        small = [position for position, weight in enumerate(scaled) if weight < 1]
+        large = [position for position, weight in enumerate(scaled) if weight >= 1]
+        while small and large:
+            low, high = small.pop(), large[-1]
+            self.probability[low] = scaled[low]
+            self.alias[low] = high
+            scaled[high] -= 1 - scaled[low]
+            if scaled[high] < 1:
+                small.append(large.pop())
+
+    def __len__(self) -> int:
+        return len(self.alias)
+
+    def draw(self) -> int:
+        position = random.randrange(len(self.alias))
+        return position if random.random() < self.probability[position] else self.alias[position]
+
+
+class _Bag:
+    """One client's shuffle bag: positions [0, drawn) are used; ``swaps`` maps displaced positions to their contents."""
+
+    __slots__ = ("drawn", "swaps", "last")
+
+    def __init__(self):
+        self.drawn = 0
+        self.swaps: Dict[int, int] = {}
+        self.last = -1
+
+    def size(self) -> int:
+        return len(self.swaps) + 1
+
+
+class _Window:
+    """One client's most recent positions in weighted mode."""
+
+    __slots__ = ("recent", "members")
+
+    def __init__(self):
+        self.recent: Deque[int] = deque()
+        self.members: Set[int] = set()
+
+    def size(self) -> int:
+        return len(self.recent) + 1
+
+
+class Sampler:
+    """Per-client no-repeat and weighted random draws over a repository's record ids."""
+
+    def __init__(self):
+        self.version: Optional[str] = None
+        self.ids = array("q")
+        self.weights = array("d")
+        self.weighted = False
+        self._table: Optional[AliasTable] = None
+        self._cover = array("d")
+        self._slack = 0.0
+        self._overflow: List[int] = []
+        self._overflow_totals: List[float] = []
+        self._clients: "OrderedDict[str, _Bag | _Window]" = OrderedDict()
+        self._state = 0
+        self._lock = threading.Lock()
+        self.draws = 0
+        self.rebuilds = 0
+        self.evictions = 0
+
+    def sync(
+        self,
+        version: str,
+        scan: Callable[[int], Iterable[dict]],
+        changed: Optional[Callable[[], Optional[List[dict]]]] = None,
+    ) -> None:
+        """Catch up with storage ``version``; ``scan(after)`` yields the records with larger ids.
+
+        ``changed()`` returns the records other processes have edited since it was
+        last called, whose weights are re-read, or None to re-read every weight.
+        """
+        if self.version == version:
+            return
+        with self._lock:
+            if self.version == version:
+                return
+            edited = changed() if changed is not None else []
+            first = self.version is None
+            for record in scan(self.ids[-1] if self.ids else 0):
+                self._add(record)
+            self.version = version
+            if not first:
+                for record in scan(0) if edited is None else edited:
+                    self._update(record)
+
+    def add(self, record: dict) -> None:
+        """Make a newly created record drawable, unless the sampler has not loaded the corpus yet."""
+        with self._lock:
+            if self.version is not None:
+                self._add(record)
+
+    def _add(self, record: dict) -> None:
+        if self.ids and record["id"] <= self.ids[-1]:
+            return
+        weight = record_weight(record)
+        self.ids.append(record["id"])
+        self.weights.append(weight)
+        self._cover.append(weight)
+        if weight != 1.0:
+            self.weighted = True
+        if self._table is not None:
+            self._overflow.append(len(self.ids) - 1)
+            self._overflow_totals.append((self._overflow_totals[-1] if self._overflow_totals else 0.0) + weight)
+
+    def update(self, record: dict) -> None:
+        """Apply an edited record's weight."""
+        with self._lock:
+            self._update(record)
+
+    def _update(self, record: dict) -> None:
+        position = bisect.bisect_left(self.ids, record["id"])
+        if self.version is None or position == len(self.ids) or self.ids[position] != record["id"]:
+            return
+        weight = record_weight(record)
+        if weight == self.weights[position]:
+            return
+        self._slack += self.weights[position] - weight
+        self.weights[position] = weight
+        if weight != 1.0:
+            self.weighted = True
+        if weight > self._cover[position]:
+            self._table = None
+
+    def _rebuild(self) -> None:
+        self._cover = array("d", self.weights)
+        self._table = AliasTable(self._cover)
+        self._slack = 0.0
+        self._overflow = []
+        self._overflow_totals = []
+        self.rebuilds += 1
+
+    def _weighted_position(self) -> int:
+        """A position drawn with probability proportional to its weight."""
+        table = self._table
+        overflow = self._overflow_totals[-1] if self._overflow_totals else 0.0
+        if table is None or len(self._overflow) > len(table) or self._slack * 2 > table.total + overflow:
+            self._rebuild()
+            table, overflow = self._table, 0.0
+        while True:
+            if overflow and random.random() * (table.total + overflow) < overflow:
+                position = self._overflow[bisect.bisect_right(self._overflow_totals, random.random() * overflow)]
+            else:
+                position = table.draw()
+            if random.random() * self._cover[position] < self.weights[position]:
+                return position
+
+    def draw(self, client: Optional[str] = None) -> Optional[int]:
+        """A record id for ``client``; anonymous draws keep no state."""
+        with self._lock:
+            count = len(self.ids)
+            if not count:
+                return None
+            self.draws += 1
+            if client is None:
+                position = self._weighted_position() if self.weighted else random.randrange(count)
+            elif self.weighted:
+                position = self._draw_window(self._client_state(client, _Window), count)
+            else:
+                position = self._draw_bag(self._client_state(client, _Bag), count)
+            return self.ids[position]
+
+    def _client_state(self, client: str, kind: type):
+        state = self._clients.get(client)
+        if type(state) is kind:
+            self._clients.move_to_end(client)
+            return state
+        if state is not None:
+            self._state -= state.size()
+        state = self._clients[client] = kind()
+        self._clients.move_to_end(client)
+        self._state += state.size()
+        return state
+
+    def _evict(self) -> None:
+        while len(self._clients) > MAX_CLIENTS or (self._state > MAX_STATE and len(self._clients) > 1):
+            _, state = self._clients.popitem(last=False)
+            self._state -= state.size()
+            self.evictions += 1
+
+    def _draw_bag(self, bag: _Bag, count: int) -> int:
+        before = bag.size()
+        if bag.drawn >= min(count, BAG_SIZE):
+            bag.drawn, bag.swaps = 0, {}
+        drawn = bag.drawn
+        pick = random.randrange(drawn, count)
+        # Do not open a new bag with the record that closed the previous one.
+        while not drawn and pick == bag.last and count > 1:
+            pick = random.randrange(count)
+        position = bag.swaps.get(pick, pick)
+        displaced = bag.swaps.pop(drawn, drawn)
+        if pick != drawn:
+            bag.swaps[pick] = displaced
+        bag.drawn += 1
+        bag.last = position
+        self._state += bag.size() - before
+        self._evict()
+        return position
+
+    def _draw_window(self, window: _Window, count: int) -> int:
+        for _ in range(8):
+            position = self._weighted_position()
+            if position not in window.members:
+                break
+        window.recent.append(position)
+        window.members.add(position)
+        self._state += 1
+        while len(window.recent) > min(WINDOW, count // 2):
+            window.members.discard(window.recent.popleft())
+            self._state -= 1
+        self._evict()
+        return position
+
+    def stats(self) -> dict:
+        return {
+            "records": len(self.ids),
+            "weighted": self.weighted,
+            "clients": len(self._clients),
+            "client_state": self._state,
+            "draws": self.draws,
+            "table_rebuilds": self.rebuilds,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,359 @@
+"""
+Inverted full-text index over one text field of a repository.
+
+Texts are lower-cased and split into word tokens. Each term keeps the ascending
+ids of the records containing it in an array, so new records, whose ids are the
+largest so far, are appended in O(1) per term. The records that contain a term
+more than once are also listed per occurrence count ("tiers").
+
+Queries are AND queries over their terms; a term ending in ``*`` matches every
+term with that prefix. Matches are ranked by BM25 without length normalisation
+(the texts are a sentence or two): every match scores the same unless it repeats
+a query term, so the page is taken from the highest tiers first and filled with
+the other matches in id order. Posting lists are intersected and merged with set
+operations, keeping per-query Python work close to the page size.
+
+The index is saved next to the data file together with the storage version it
+reflects, and reused on the next start when that version still matches.
+Records edited by other processes are re-indexed when sync() is told about
+them; the index is rebuilt when it cannot be told which ones they are.
+"""
+
+from array import array
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import bisect
+import heapq
+import json
+import math
+import os
+import re
+import struct
+import tempfile
+import threading
+
+MAGIC = b"QSRCH001"
+_HEADER_LENGTH = struct.Struct("<I")
+
+_WORD = re.compile(r"\w+")
+_QUERY_TERM = re.compile(r"\w+\*?")
+
+# BM25 term-frequency saturation.
+K1 = 1.2
+# Occurrence counts above this share a tier; their scores differ by under 1%.
+MAX_TIER = 32
+# Most records edited elsewhere that are re-indexed in place; more than this and the index is rebuilt.
+MAX_REINDEX = 1000
+
+
+def tokenize(text: str) -> Dict[str, int]:
+    """Term -> number of occurrences in ``text``."""
+    counts: Dict[str, int] = {}
+    for term in _WORD.findall(text.lower()):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+def parse_query(query: str) -> List[str]:
+    """The distinct terms of ``query``, prefix terms keeping their trailing ``*``."""
+    return list(dict.fromkeys(_QUERY_TERM.findall(query.lower())))
+
+
+def _contains(ids: Sequence[int], record_id: int) -> bool:
+    position = bisect.bisect_left(ids, record_id)
+    return position < len(ids) and ids[position] == record_id
+
+
+def _intersect(ids: Sequence[int], others: Sequence[int]) -> Sequence[int]:
+    """Ascending ids present in both ascending sequences; probes the longer one when lengths differ a lot."""
+    if len(ids) * 16 < len(others):
+        return [record_id for record_id in ids if _contains(others, record_id)]
+    if len(others) * 16 < len(ids):
+        return [record_id for record_id in others if _contains(ids, record_id)]
+    return sorted(set(ids).intersection(others))
+
+
+def _insert(ids: array, record_id: int) -> None:
+    if not ids or ids[-1] < record_id:
+        ids.append(record_id)
+    elif not _contains(ids, record_id):
+        ids.insert(bisect.bisect_left(ids, record_id), record_id)
+
+
+def _remove(ids: array, record_id: int) -> bool:
+    position = bisect.bisect_left(ids, record_id)
+    if position < len(ids) and ids[position] == record_id:
+        del ids[position]
+        return True
+    return False
+
+
+def _saturate(frequency: int) -> float:
+    return frequency * (K1 + 1) / (frequency + K1)
+
+
+class SearchIndex:
+    """Term -> ascending ids for one text field, synced with a storage version token."""
+
+    def __init__(self, index_file: Path, field: str):
+        self.index_file = index_file
+        self.field = field
+        self.version: Optional[str] = None
+        self.max_id = 0
+        self.documents = 0
+        self._postings: Dict[str, array] = {}
+        self._repeats: Dict[str, Dict[int, array]] = {}
+        self._sorted_terms: Optional[List[str]] = None
+        self._lock = threading.RLock()
+        self.builds = 0
+        self.queries = 0
+
+    def load(self, version: str) -> bool:
+        """Use the saved index if it was written for storage version ``version``."""
+        try:
+            with self.index_file.open("rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            return False
+        if data[: len(MAGIC)] != MAGIC:
+            return False
+        (header_length,) = _HEADER_LENGTH.unpack_from(data, len(MAGIC))
+        start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(data[start : start + header_length])
+        if header["version"] != version or header["field"] != self.field:
+            return False
+
+        def section(position: int, format_code: str, count: int) -> array:
+            values = array(format_code)
+            values.frombytes(data[position : position + values.itemsize * count])
+            return values
+
+        ids_at = start + header_length
+        ids = section(ids_at, "q", header["postings"])
+        repeated_ids = section(ids_at + 8 * header["postings"], "q", header["repeats"])
+        postings: Dict[str, array] = {}
+        repeats: Dict[str, Dict[int, array]] = {}
+        offset = repeat_offset = 0
+        for term, count, tiers in header["terms"]:
+            postings[term] = ids[offset : offset + count]
+            offset += count
+            for frequency, tier_count in tiers:
+                repeats.setdefault(term, {})[frequency] = repeated_ids[repeat_offset : repeat_offset + tier_count]
+                repeat_offset += tier_count
+        with self._lock:
+            self._postings = postings
+            self._repeats = repeats
+            self._sorted_terms = None
+            self.documents = header["documents"]
+            self.max_id = header["max_id"]
+            self.version = version
+        return True
+
+    def save(self) -> None:
+        """Atomically write the index and the storage version it reflects."""
+        with self._lock:
+            terms = [
+                [term, len(ids), [[frequency, len(tier)] for frequency, tier in self._repeats.get(term, {}).items()]]
+                for term, ids in self._postings.items()
+            ]
+            header = {
+                "version": self.version,
+                "field": self.field,
+                "documents": self.documents,
+                "max_id": self.max_id,
+                "postings": sum(count for _, count, _ in terms),
+                "repeats": sum(tier_count for _, _, tiers in terms for _, tier_count in tiers),
+                "terms": terms,
+            }
+            header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+            descriptor, temp_name = tempfile.mkstemp(
+                prefix=self.index_file.name + ".", suffix=".tmp", dir=self.index_file.parent
+            )
+            with os.fdopen(descriptor, "wb") as handle:
+                handle.write(MAGIC + _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes)
+                for ids in self._postings.values():
+                    handle.write(ids.tobytes())
+                for term, _, tiers in terms:
+                    for frequency, _ in tiers:
+                        handle.write(self._repeats[term][frequency].tobytes())
+            os.replace(temp_name, self.index_file)
+
+    def rebuild(self, records: Iterable[dict], version: str) -> None:
+        with self._lock:
+            self._postings = {}
+            self._repeats = {}
+            self._sorted_terms = None
+            self.documents = 0
+            self.max_id = 0
+            for record in records:
+                self._add(record)
+            self.version = version
+            self.builds += 1
+
+    def add(self, record: dict) -> None:
+        """Index a newly created record, unless the index is not built yet or already caught up with it."""
+        with self._lock:
+            if self.version is not None:
+                self._add(record)
+
+    def _add(self, record: dict) -> None:
+        record_id = record["id"]
+        terms = tokenize(record.get(self.field) or "")
+        if terms and _contains(self._postings.get(next(iter(terms)), ()), record_id):
+            return
+        self._index_terms(record_id, terms)
+        self.documents += 1
+        self.max_id = max(self.max_id, record_id)
+
+    def replace(self, record_id: int, old_texts: Iterable[str], new_text: str) -> None:
+        """Re-index an edited record: drop the terms of each of ``old_texts``, then index ``new_text``."""
+        with self._lock:
+            if self.version is None:
+                return
+            for old_text in old_texts:
+                for term, count in tokenize(old_text).items():
+                    ids = self._postings.get(term)
+                    if ids is None:
+                        continue
+                    _remove(ids, record_id)
+                    tiers = self._repeats.get(term)
+                    tier = tiers.get(min(count, MAX_TIER)) if tiers and count > 1 else None
+                    if tier is not None and _remove(tier, record_id) and not tier:
+                        del tiers[min(count, MAX_TIER)]
+                        if not tiers:
+                            del self._repeats[term]
+                    if not ids:
+                        del self._postings[term]
+                        self._sorted_terms = None
+            self._index_terms(record_id, tokenize(new_text))
+
+    def reindex(self, records: List[dict]) -> None:
+        """Re-index records whose previous text is unknown (edited by another process): one pass over every term."""
+        with self._lock:
+            if self.version is None or not records:
+                return
+            ids = sorted({record["id"] for record in records})
+            for term in list(self._postings):
+                postings = self._postings[term]
+                removed = [record_id for record_id in ids if _remove(postings, record_id)]
+                if not removed:
+                    continue
+                tiers = self._repeats.get(term, {})
+                for frequency in list(tiers):
+                    tier = tiers[frequency]
+                    for record_id in removed:
+                        _remove(tier, record_id)
+                    if not tier:
+                        del tiers[frequency]
+                if term in self._repeats and not tiers:
+                    del self._repeats[term]
+                if not postings:
+                    del self._postings[term]
+                    self._sorted_terms = None
+            for record in records:
+                self._index_terms(record["id"], tokenize(record.get(self.field) or ""))
+
+    def _index_terms(self, record_id: int, terms: Dict[str, int]) -> None:
+        for term, count in terms.items():
+            ids = self._postings.get(term)
+            if ids is None:
+                ids = self._postings[term] = array("q")
+                self._sorted_terms = None
+            _insert(ids, record_id)
+            if count > 1:
+                _insert(self._repeats.setdefault(term, {}).setdefault(min(count, MAX_TIER), array("q")), record_id)
+
+    def _matching_ids(self, term: str) -> Sequence[int]:
+        """Ascending ids of the records matching one query term, expanding a trailing ``*``."""
+        if not term.endswith("*"):
+            return self._postings.get(term, ())
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        prefix = term[:-1]
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        end = bisect.bisect_left(self._sorted_terms, prefix + "\U0010ffff")
+        lists = [self._postings[name] for name in self._sorted_terms[start:end]]
+        if len(lists) == 1:
+            return lists[0]
+        return sorted(set().union(*lists))
+
+    def search(self, query: str, limit: int) -> Tuple[List[int], int]:
+        """The ids of the ``limit`` best records containing every query term, and the number of matches."""
+        terms = parse_query(query)
+        if not terms:
+            return [], 0
+        with self._lock:
+            self.queries += 1
+            matches = {term: self._matching_ids(term) for term in terms}
+            ordered = sorted(matches.values(), key=len)
+            candidates = ordered[0]
+            for ids in ordered[1:]:
+                candidates = _intersect(candidates, ids) if candidates else candidates
+            total = len(candidates)
+
+            # A match scores the sum of the term weights plus a bonus for each query term it repeats.
+            tiered = {term: self._repeats[term] for term in terms if term in self._repeats}
+            best: List[int] = []
+            if len(tiered) == 1:
+                # One term decides the order: walk its tiers from the highest count down.
+                ((term, tiers),) = tiered.items()
+                for frequency in sorted(tiers, reverse=True):
+                    hits = tiers[frequency] if len(terms) == 1 else _intersect(tiers[frequency], candidates)
+                    best.extend(islice(hits, limit - len(best)))
+                    if len(best) == limit:
+                        break
+            elif tiered:
+                boosted: Dict[int, float] = {}
+                for term, tiers in tiered.items():
+                    ids = matches[term]
+                    weight = math.log(1 + (self.documents - len(ids) + 0.5) / (len(ids) + 0.5))
+                    for frequency, tier in tiers.items():
+                        bonus = weight * (_saturate(frequency) - 1)
+                        for record_id in _intersect(tier, candidates):
+                            boosted[record_id] = boosted.get(record_id, 0.0) + bonus
+                ranked = heapq.nsmallest(limit, boosted.items(), key=lambda item: (-item[1], item[0]))
+                best = [record_id for record_id, _ in ranked]
+            if len(best) < limit:
+                taken = set(best)
+                rest = (record_id for record_id in candidates if record_id not in taken)
+                best.extend(islice(rest, limit - len(best)))
+            return best, total
+
+    def sync(
+        self,
+        version: str,
+        scan: Callable[[int], Iterable[dict]],
+        changed: Optional[Callable[[], Optional[List[dict]]]] = None,
+    ) -> None:
+        """Bring the index up to storage ``version``; ``scan(after)`` yields the records with larger ids.
+
+        ``changed()`` returns the current contents of the records other processes
+        have edited since it was last called, or None when that is not known.
+
+        The first sync loads the saved index or builds and saves a new one. Later
+        version changes are caught up by indexing the records created since (ids
+        only grow), which is a no-op for this process's own writes, and
+        re-indexing the edited records; the index is rebuilt when they are not
+        known or too many.
+        """
+        if self.version == version:
+            return
+        with self._lock:
+            if self.version == version:
+                return
+            edited = changed() if changed is not None else []
+            if self.version is None and not self.load(version):
+                self.rebuild(scan(0), version)
+                self.save()
+                return
+            if edited is None or len(edited) > MAX_REINDEX:
+                self.rebuild(scan(0), version)
+                return
+            for record in scan(self.max_id):
+                self._add(record)
+            self.reindex(edited)
+            self.version = version
+
+    def stats(self) -> dict:
+        return {"documents": self.documents, "terms": len(self._postings), "builds": self.builds, "queries": self.queries}
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Production entry point for one service, or for all four behind the gateway.
+
+    python3 serve.py quotes        # app.py on QUOTES_PORT (5001)
+    python3 serve.py all           # gateway.py on GATEWAY_PORT (5000)
+
+Uses gunicorn when it is installed: WORKERS processes with THREADS threads each
+(the gthread worker), HTTP keep-alive, request size limits and a graceful
+shutdown on SIGTERM. Without gunicorn it falls back to a threaded Werkzeug
+server in a single process with keep-alive and the same shutdown handling.
+The debugger and reloader are never enabled here. See config.py for the
+environment variables.
+
+Workers are separate processes that share the data files. storage.py takes an
+exclusive file lock around every write and reloads or replays changes made by
+other processes, so any backend is safe to run with several workers. Each
+worker opens its storage after the fork (the app is not preloaded), so the
+log backend's background threads and SQLite connections are never shared.
+"""
+
+import argparse
+import importlib
+import importlib.util
+import signal
+import sys
+import threading
+
+import config
+
+# Target -> (module, WSGI attribute, port name, service modules holding a repository)
+TARGETS = {
+    "quotes": ("app", "app", "quotes", ("app",)),
+    "funfacts": ("funfacts", "app", "funfacts", ("funfacts",)),
+    "reflections": ("reflections", "app", "reflections", ("reflections",)),
+    "goals": ("goals", "app", "goals", ("goals",)),
+    "all": ("gateway", "application", "gateway", ("app", "funfacts", "reflections", "goals")),
+}
+
+
+def load_application(target: str):
+    module_name, attribute, _, _ = TARGETS[target]
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def close_repositories(target: str) -> None:
+    """Flush and release every loaded service's storage."""
+    for module_name in TARGETS[target][3]:
+        module = sys.modules.get(module_name)
+        if module is not None:
+            module.repository.close()
+
+
+def serve_gunicorn(target: str, host: str, port: int) -> None:
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{host}:{port}",
+                "workers": config.WORKERS,
+                "threads": config.THREADS,
+                "worker_class": "gthread",
+                "keepalive": config.KEEPALIVE,
+                "timeout": config.TIMEOUT,
+                "graceful_timeout": config.GRACEFUL_TIMEOUT,
+                "limit_request_line": config.MAX_REQUEST_LINE,
+                "preload_app": False,
+                "worker_exit": lambda server, worker: close_repositories(target),
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_application(target)
+
+    Server().run()
+
+
+def serve_werkzeug(target: str, host: str, port: int) -> None:
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    if config.WORKERS > 1:
+        print("gunicorn is not installed; serving from a single process.", file=sys.stderr)
+
+    class KeepAliveHandler(WSGIRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Idle keep-alive connections are dropped after this many seconds.
+        timeout = config.KEEPALIVE
+
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server(host, port, load_application(target), threaded=True, request_handler=KeepAliveHandler)
+    server.daemon_threads = False  # let in-flight requests finish on shutdown
+
+    def shut_down(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shut_down)
+    print(f"Serving {target} on http://{host}:{port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        close_repositories(target)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("target", choices=list(TARGETS))
+    parser.add_argument("--host", default=config.HOST)
+    parser.add_argument("--port", type=int, help="defaults to <SERVICE>_PORT, or GATEWAY_PORT for 'all'")
+    parser.add_argument("--server", choices=["auto", "gunicorn", "werkzeug"], default=config.SERVER)
+    args = parser.parse_args()
+
+    port = args.port or config.port(TARGETS[args.target][2])
+    server = args.server
+    if server == "auto":
+        server = "gunicorn" if importlib.util.find_spec("gunicorn") else "werkzeug"
+    if server == "gunicorn":
+        serve_gunicorn(args.target, args.host, port)
+    else:
+        serve_werkzeug(args.target, args.host, port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Binary snapshot format: one memory-mapped file per dataset, decoded lazily.
+
+Layout (native little-endian, every section 8-byte aligned):
+
+    magic       8 bytes, b"MSNAP001"
+    header      u32 length, then JSON: count, max_id and the position of every section
+    ids         count x int64, ascending
+    per field   (count + 1) x uint64 offsets, then the field's JSON-encoded values back to back
+    per group   ascending int64 ids of the records whose indexed field has one value
+
+A record's value for a field is the JSON text between offsets[i] and offsets[i + 1]
+of that field; an empty slice means the record has no such field. Opening a
+snapshot only maps the file and reads the header: nothing is decoded until a
+record is served, and untouched records never become Python objects.
+
+Convert existing data files (quotes.json -> quotes.snap) with:
+    python3 snapshot.py quotes.json funfacts.json
+    python3 snapshot.py goals.json --indexed completed
+"""
+
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+MAGIC = b"MSNAP001"
+_HEADER_LENGTH = struct.Struct("<I")
+
+
+def _align(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def snapshot_path(data_file: Path) -> Path:
+    return data_file.with_suffix(".snap")
+
+
+def write_snapshot(path: Path, records: Iterable[dict], indexed_fields: Tuple[str, ...] = ()) -> int:
+    """Atomically write ``records`` (ascending ids) as a snapshot at ``path`` and return the record count.
+
+    ``indexed_fields`` get a sorted id list per value, so filtered counts and pages
+    on them never decode a record.
+    """
+    if sys.byteorder != "little":
+        raise ValueError("Snapshots are only written on little-endian machines.")
+    ids = array("q")
+    columns: Dict[str, Tuple[array, bytearray]] = {}
+    groups: Dict[str, Dict[str, array]] = {field: {} for field in indexed_fields}
+    for record in records:
+        for field in record:
+            if field != "id" and field not in columns:
+                columns[field] = (array("Q", [0]) * (len(ids) + 1), bytearray())
+        for field, (offsets, blob) in columns.items():
+            if field in record:
+                blob += json.dumps(record[field], separators=(",", ":")).encode("utf-8")
+            offsets.append(len(blob))
+        for field, values in groups.items():
+            key = json.dumps(record.get(field))
+            values.setdefault(key, array("q")).append(record["id"])
+        ids.append(record["id"])
+
+    sections: List[bytes] = []
+    position = 0
+
+    def add_section(data: bytes) -> List[int]:
+        nonlocal position
+        start = position
+        sections.append(data + b"\0" * (_align(len(data)) - len(data)))
+        position += _align(len(data))
+        return [start, len(data)]
+
+    header: Dict[str, Any] = {"count": len(ids), "max_id": max(ids, default=0), "ids": add_section(ids.tobytes())}
+    header["fields"] = {
+        field: {"offsets": add_section(offsets.tobytes()), "values": add_section(bytes(blob))}
+        for field, (offsets, blob) in columns.items()
+    }
+    header["groups"] = {
+        field: {key: add_section(group.tobytes()) for key, group in values.items()} for field, values in groups.items()
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    prefix = MAGIC + _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes
+    prefix += b"\0" * (_align(len(prefix)) - len(prefix))
+
+    descriptor, temp_name = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    with os.fdopen(descriptor, "wb") as handle:
+        handle.write(prefix)
+        for section in sections:
+            handle.write(section)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(temp_name, path)
+    return len(ids)
+
+
+class SnapshotFile:
+    """Read-only, memory-mapped view of a snapshot written by write_snapshot()."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        if hasattr(self._map, "madvise"):
+            # Records are read at random; readahead would pull in (and count as resident) pages never used.
+            self._map.madvise(mmap.MADV_RANDOM)
+        if self._map[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a snapshot file.")
+        (header_length,) = _HEADER_LENGTH.unpack_from(self._map, len(MAGIC))
+        header_start = len(MAGIC) + _HEADER_LENGTH.size
+        header = json.loads(self._map[header_start : header_start + header_length])
+        self._body = _align(header_start + header_length)
+        view = memoryview(self._map)
+
+        def section(bounds: List[int], format_code: Optional[str] = None):
+            start, length = bounds
+            data = view[self._body + start : self._body + start + length]
+            return data.cast(format_code) if format_code else data
+
+        self.max_id: int = header["max_id"]
+        self.ids = section(header["ids"], "q")
+        self._fields = {
+            field: (section(bounds["offsets"], "Q"), self._body + bounds["values"][0])
+            for field, bounds in header["fields"].items()
+        }
+        self._groups = {
+            field: {json.loads(key): section(bounds, "q") for key, bounds in values.items()}
+            for field, values in header["groups"].items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, record_id: int) -> Optional[int]:
+        position = bisect.bisect_left(self.ids, record_id)
+        if position < len(self.ids) and self.ids[position] == record_id:
+            return position
+        return None
+
+    def value_at(self, position: int, field: str, default: Any = None) -> Any:
+        column = self._fields.get(field)
+        if column is None:
+            return default
+        offsets, start = column
+        low, high = offsets[position], offsets[position + 1]
+        if low == high:
+            return default
+        return json.loads(self._map[start + low : start + high])
+
+    def record_at(self, position: int) -> dict:
+        record = {"id": self.ids[position]}
+        for field, (offsets, start) in self._fields.items():
+            low, high = offsets[position], offsets[position + 1]
+            if low != high:
+                record[field] = json.loads(self._map[start + low : start + high])
+        return record
+
+    def get(self, record_id: int) -> Optional[dict]:
+        position = self.position(record_id)
+        return None if position is None else self.record_at(position)
+
+    def group(self, field: str, value: Any):
+        """Ascending ids of the records whose indexed ``field`` equals ``value``."""
+        return self._groups[field].get(value, self.ids[:0])
+
+    def has_group(self, field: str) -> bool:
+        return field in self._groups
+
+
+def main() -> None:
+    from storage import read_json_array
+
+    parser = argparse.ArgumentParser(description=__doc__.strip(), formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("data_files", nargs="+", type=Path)
+    parser.add_argument("--indexed", nargs="*", default=[], help="fields to keep per-value id lists for")
+    args = parser.parse_args()
+
+    for data_file in args.data_files:
+        records = sorted(read_json_array(data_file), key=lambda record: record["id"])
+        target = snapshot_path(data_file)
+        count = write_snapshot(target, records, tuple(args.indexed))
+        print(f"{data_file} -> {target}: {count} records, {target.stat().st_size:,} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1506 @@
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import bisect
+import json
+import os
+import random
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+import time
+
+import codec
+from metrics import phase
+from snapshot import SnapshotFile, snapshot_path, write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads within one process are coordinated.
+    fcntl = None
+
+
+_MISSING = object()
+# Rows a RecordIndex scan copies out per hold of the index lock.
+SCAN_CHUNK = 256
+
+
+class _ListColumn:
+    """One field's values by row position; rows without the field hold _MISSING."""
+
+    __slots__ = ("values",)
+
+    def __init__(self, values: List[Any]):
+        self.values = values
+
+    def get(self, position: int) -> Any:
+        return self.values[position]
+
+    def set(self, position: int, value: Any) -> bool:
+        self.values[position] = value
+        return True
+
+    def insert(self, position: int, value: Any) -> bool:
+        self.values.insert(position, value)
+        return True
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self.values)
+
+
+class _BoolColumn:
+    """A boolean field packed into two bitsets (has-field and value): two bits per row instead of a pointer."""
+
+    __slots__ = ("present", "bits", "size")
+
+    def __init__(self, size: int):
+        self.present = bytearray((size + 7) // 8)
+        self.bits = bytearray((size + 7) // 8)
+        self.size = size
+
+    def get(self, position: int) -> Any:
+        mask = 1 << (position & 7)
+        if not self.present[position >> 3] & mask:
+            return _MISSING
+        return bool(self.bits[position >> 3] & mask)
+
+    def set(self, position: int, value: Any) -> bool:
+        """Store ``value``; returns False when it is not a bool and the column must become a list."""
+        if value is not _MISSING and not isinstance(value, bool):
+            return False
+        while position >= self.size:
+            if self.size % 8 == 0:
+                self.present.append(0)
+                self.bits.append(0)
+            self.size += 1
+        byte, mask = position >> 3, 1 << (position & 7)
+        if value is _MISSING:
+            self.present[byte] &= ~mask
+        else:
+            self.present[byte] |= mask
+        if value is True:
+            self.bits[byte] |= mask
+        else:
+            self.bits[byte] &= ~mask
+        return True
+
+    def insert(self, position: int, value: Any) -> bool:
+        if position == self.size:
+            return self.set(position, value)
+        if value is not _MISSING and not isinstance(value, bool):
+            return False
+        values = list(self)
+        values.insert(position, value)
+        self.__init__(0)
+        for row, item in enumerate(values):
+            self.set(row, item)
+        return True
+
+    def __iter__(self) -> Iterator[Any]:
+        return (self.get(position) for position in range(self.size))
+
+
+class RecordIndex:
+    """Records stored column by column, with id and field lookups kept up to date incrementally.
+
+    Rows are kept in id order: ids in an ``array('q')``, each other field in its own
+    column (a list, or a bitset for boolean fields such as ``completed``), so a
+    record costs a few machine words instead of a dict with its own key table.
+    get(), scan() and friends build plain dicts on the way out, and returned dicts
+    are copies: change records through update().
+
+    ``unique_fields`` map a value to the first record carrying it. ``indexed_fields``
+    keep a sorted id array per value, so filtered pages and counts never scan.
+    String values of both are interned, so repeated dates share one object.
+
+    A row is written in several steps (the id, then each column), so writers and
+    readers share a lock: a reader never sees a row half stored. Scans take it
+    per chunk of rows and find their place again by id, so a slow consumer of
+    scan() never holds up writers.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[dict] = (),
+        unique_fields: Tuple[str, ...] = (),
+        indexed_fields: Tuple[str, ...] = (),
+    ):
+        self._ids = array("q")
+        self._columns: Dict[str, Any] = {}
+        self._by_field: Dict[str, Dict[Any, int]] = {field: {} for field in unique_fields}
+        self._groups: Dict[str, Dict[Any, array]] = {field: {} for field in indexed_fields}
+        self._interned = set(unique_fields) | set(indexed_fields)
+        self._lock = threading.RLock()
+        self.max_id = 0
+        for record in sorted(records, key=lambda record: record["id"]):
+            self.add(record)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _position(self, record_id: int) -> Optional[int]:
+        position = bisect.bisect_left(self._ids, record_id)
+        if position < len(self._ids) and self._ids[position] == record_id:
+            return position
+        return None
+
+    def _row(self, position: int) -> dict:
+        record = {"id": self._ids[position]}
+        for field, column in self._columns.items():
+            value = column.get(position)
+            if value is not _MISSING:
+                record[field] = value
+        return record
+
+    def _store(self, field: str, position: int, value: Any, insert: bool) -> None:
+        if field in self._interned and isinstance(value, str):
+            value = sys.intern(value)
+        column = self._columns.get(field)
+        if column is None:
+            size = len(self._ids) - (1 if insert else 0)
+            column = _BoolColumn(size) if isinstance(value, bool) else _ListColumn([_MISSING] * size)
+            self._columns[field] = column
+        stored = column.insert(position, value) if insert else column.set(position, value)
+        if not stored:
+            column = self._columns[field] = _ListColumn(list(column))
+            column.insert(position, value) if insert else column.set(position, value)
+
+    def add(self, record: dict) -> None:
+        with self._lock:
+            self._add(record)
+
+    def _add(self, record: dict) -> None:
+        record_id = record["id"]
+        if record_id > self.max_id:
+            position, insert = len(self._ids), False  # ids are handed out in increasing order
+            self._ids.append(record_id)
+            for column in self._columns.values():
+                column.insert(position, _MISSING)
+        else:
+            position, insert = bisect.bisect_left(self._ids, record_id), True
+            self._ids.insert(position, record_id)
+        self.max_id = max(self.max_id, record_id)
+        for field in self._columns.keys() - record.keys():
+            if insert:
+                self._columns[field].insert(position, _MISSING)
+        for field, value in record.items():
+            if field != "id":
+                self._store(field, position, value, insert)
+        for field, lookup in self._by_field.items():
+            if field in record:
+                lookup.setdefault(self._columns[field].get(position), record_id)
+        for field, groups in self._groups.items():
+            _insert_sorted(groups.setdefault(record.get(field), array("q")), record_id)
+
+    def update(self, record_id: int, changes: dict) -> Optional[dict]:
+        """Apply changes to a stored record, moving it between field lookups if needed, and return it."""
+        return self.edit(record_id, changes)[1]
+
+    def edit(self, record_id: int, changes: dict) -> Tuple[Optional[dict], Optional[dict]]:
+        """Like update(), but return the record as it was before the change as well; (None, None) if unknown."""
+        with self._lock:
+            return self._edit(record_id, changes)
+
+    def _edit(self, record_id: int, changes: dict) -> Tuple[Optional[dict], Optional[dict]]:
+        position = self._position(record_id)
+        if position is None:
+            return None, None
+        record = self._row(position)
+        for field, lookup in self._by_field.items():
+            if field in changes and field in record and lookup.get(record[field]) == record_id:
+                del lookup[record[field]]
+        for field, groups in self._groups.items():
+            if field in changes:
+                _remove_sorted(groups[record.get(field)], record_id)
+        for field, value in changes.items():
+            if field != "id":
+                self._store(field, position, value, insert=False)
+        for field, lookup in self._by_field.items():
+            if field in changes:
+                lookup.setdefault(self._columns[field].get(position), record_id)
+        for field, groups in self._groups.items():
+            if field in changes:
+                _insert_sorted(groups.setdefault(changes[field], array("q")), record_id)
+        return record, self._row(position)
+
+    def records(self) -> Iterator[dict]:
+        """Every record, in id order."""
+        return self.scan(0)
+
+    def _id_list(self, field: Optional[str], value: Any):
+        return self._ids if field is None else self._groups[field].get(value, self._ids[:0])
+
+    def count(self, field: Optional[str] = None, value: Any = None) -> int:
+        """Number of records, or of records whose indexed ``field`` equals ``value``."""
+        with self._lock:
+            return len(self._id_list(field, value))
+
+    def scan(self, after: int = 0, field: Optional[str] = None, value: Any = None) -> Iterator[dict]:
+        """Yield records with an id greater than ``after`` in id order, optionally filtered on an indexed field."""
+        while True:
+            with self._lock:
+                ids = self._id_list(field, value)
+                position = bisect.bisect_right(ids, after)
+                if field is None:
+                    rows = [self._row(at) for at in range(position, min(position + SCAN_CHUNK, len(ids)))]
+                else:
+                    rows = [self._row(self._position(record_id)) for record_id in ids[position : position + SCAN_CHUNK]]
+            if not rows:
+                return
+            yield from rows
+            after = rows[-1]["id"]
+
+    def get(self, record_id: int) -> Optional[dict]:
+        with self._lock:
+            position = self._position(record_id)
+            return None if position is None else self._row(position)
+
+    def lookup(self, field: str, value: Any) -> Optional[dict]:
+        with self._lock:
+            record_id = self._by_field[field].get(value)
+            return None if record_id is None else self.get(record_id)
+
+    def random(self) -> Optional[dict]:
+        with self._lock:
+            if not self._ids:
+                return None
+            return self._row(random.randrange(len(self._ids)))
+
+    def sample(self, count: int) -> List[dict]:
+        """Return up to ``count`` distinct records in random order."""
+        with self._lock:
+            positions = random.sample(range(len(self._ids)), min(count, len(self._ids)))
+            return [self._row(position) for position in positions]
+
+
+def _insert_sorted(ids: List[int], record_id: int) -> None:
+    if not ids or ids[-1] < record_id:
+        ids.append(record_id)  # ids are handed out in increasing order, so this is the usual case
+    else:
+        bisect.insort(ids, record_id)
+
+
+def _remove_sorted(ids: List[int], record_id: int) -> bool:
+    position = bisect.bisect_left(ids, record_id)
+    if position < len(ids) and ids[position] == record_id:
+        del ids[position]
+        return True
+    return False
+
+
+class FileLock:
+    """Advisory lock on a sidecar file, shared by every thread and process that writes the same data."""
+
+    def __init__(self, lock_file: Path):
+        self.lock_file = lock_file
+
+    @contextmanager
+    def hold(self, shared: bool = False) -> Iterator[None]:
+        with self.lock_file.open("a") as handle:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+class JsonFileStorage:
+    """Stores records as one JSON array, cached in memory and reloaded only when the file changes on disk.
+
+    Writers hold a thread lock plus an exclusive file lock, re-check the file
+    under the lock and replace it atomically, so concurrent writers in other
+    threads or processes never lose each other's records and readers never
+    see a half-written file.
+    """
+
+    backend = "json"
+
+    def __init__(
+        self,
+        data_file: Path,
+        unique_fields: Tuple[str, ...] = (),
+        indexed_fields: Tuple[str, ...] = (),
+        id_floor: int = 0,
+    ):
+        self.data_file = data_file
+        self.unique_fields = unique_fields
+        self.indexed_fields = indexed_fields
+        self.id_floor = id_floor
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(data_file.with_name(data_file.name + ".lock"))
+        self._index = RecordIndex(unique_fields=unique_fields, indexed_fields=indexed_fields)
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            with phase("io"):
+                file_stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            return None
+        return (file_stat.st_mtime_ns, file_stat.st_size, file_stat.st_ino)
+
+    def _refresh(self) -> None:
+        """Re-parse the file into the index only if its stat changed."""
+        signature = self._stat_signature()
+        if signature is not None and signature == self._signature:
+            self.hits += 1
+            return
+
+        with self._lock:
+            # Another thread may have reloaded, or this process rewritten the file, while we waited.
+            signature = self._stat_signature()
+            if signature is not None and signature == self._signature:
+                self.hits += 1
+                return
+            if self._signature is None:
+                self.misses += 1
+            else:
+                self.reloads += 1
+
+            self._index = RecordIndex(read_json_array(self.data_file), self.unique_fields, self.indexed_fields)
+            self._signature = signature
+
+    def load(self) -> List[dict]:
+        """Return every record, re-parsing the file only if its stat changed."""
+        self._refresh()
+        return list(self._index.records())
+
+    def index(self) -> RecordIndex:
+        """Return the lookup index for the current file contents."""
+        self._refresh()
+        return self._index
+
+    def insert(self, fields: dict) -> dict:
+        """Store a new record under the next id and return it."""
+        return self.insert_many([fields])[0]
+
+    def insert_many(self, fields_list: List[dict]) -> List[dict]:
+        """Store several new records with consecutive ids in a single file write."""
+        with self._lock, self._file_lock.hold():
+            self._refresh()
+            records = []
+            for fields in fields_list:
+                record = {"id": max(self._index.max_id, self.id_floor) + 1, **fields}
+                self._index.add(record)
+                records.append(record)
+            self._save()
+            return records
+
+    def update(self, record_id: int, changes: dict) -> Optional[dict]:
+        """Apply changes to a stored record and return it, or None if the id is unknown."""
+        return self.update_many([(record_id, changes)])[0]
+
+    def update_many(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        """Apply several (id, changes) pairs in a single file write; unknown ids yield None."""
+        return [record for _, record in self.edit_many(updates)]
+
+    def edit_many(self, updates: List[Tuple[int, dict]]) -> List[Tuple[Optional[dict], Optional[dict]]]:
+        """Like update_many(), but pair each result with the record read under the same lock before the change."""
+        with self._lock, self._file_lock.hold():
+            self._refresh()
+            results = [self._index.edit(record_id, changes) for record_id, changes in updates]
+            if any(record is not None for _, record in results):
+                self._save()
+            return results
+
+    def _save(self) -> None:
+        write_json_atomic(self.data_file, list(self._index.records()))
+        self._signature = self._stat_signature()
+
+    def version(self) -> Tuple[str, float]:
+        """A token that changes whenever the file is rewritten, plus its modification time."""
+        signature = self._stat_signature()
+        if signature is None:
+            return "0", 0.0
+        mtime_ns, size, inode = signature
+        return f"{inode:x}-{mtime_ns:x}-{size:x}", mtime_ns / 1e9
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "hits": self.hits, "misses": self.misses, "reloads": self.reloads}
+
+    def close(self) -> None:
+        """Nothing to release: every write is already fsynced and renamed into place."""
+
+
+class AppendLogStorage:
+    """Stores records as a snapshot plus an append-only log of JSON-lines mutations.
+
+    Every write appends one ``{"op": "put", "record": ...}`` line, so writes cost
+    O(1) regardless of dataset size. The log is fsynced once ``fsync_every``
+    writes are pending or ``fsync_interval`` seconds have passed, and is folded
+    into the snapshot by a background thread once it grows past ``compact_after``
+    lines. On startup the snapshot (or the legacy JSON array file when no
+    snapshot exists yet) is loaded and the log is replayed on top of it.
+
+    Several processes may share the same files: writers take an exclusive file
+    lock and first replay whatever other processes appended, and readers pick
+    up new log lines (or a rotated log) with one stat call.
+    """
+
+    backend = "log"
+
+    def __init__(
+        self,
+        data_file: Path,
+        unique_fields: Tuple[str, ...] = (),
+        indexed_fields: Tuple[str, ...] = (),
+        fsync_every: int = 32,
+        fsync_interval: float = 0.05,
+        compact_after: int = 10_000,
+        id_floor: int = 0,
+    ):
+        self.data_file = data_file
+        self.unique_fields = unique_fields
+        self.indexed_fields = indexed_fields
+        self.id_floor = id_floor
+        self.snapshot_file = data_file.with_name(data_file.stem + ".snapshot.json")
+        self.log_file = data_file.with_name(data_file.stem + ".log")
+        self.compacting_file = data_file.with_name(data_file.stem + ".log.compacting")
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_after = compact_after
+
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(data_file.with_name(data_file.name + ".lock"))
+        self._pending_sync = 0
+        self._last_sync = time.monotonic()
+        self._compactor: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self.appends = 0
+        self.fsyncs = 0
+        self.compactions = 0
+        self.replayed = 0
+
+        with self._file_lock.hold():
+            self._recover(truncate=True)
+            if self.compacting_file.exists():
+                # A compaction was interrupted; finish it so the log can be rotated again.
+                write_json_atomic(self.snapshot_file, list(self._index.records()))
+                self.compacting_file.unlink(missing_ok=True)
+        self._syncer = threading.Thread(target=self._sync_loop, daemon=True)
+        self._syncer.start()
+
+    def _recover(self, truncate: bool) -> None:
+        base = self.snapshot_file if self.snapshot_file.exists() else self.data_file
+        self._index = RecordIndex(read_json_array(base), self.unique_fields, self.indexed_fields)
+        if self.compacting_file.exists():
+            self._replay(self.compacting_file, 0, truncate=False)
+        self.log_file.touch()
+        self._log_lines, _ = self._replay(self.log_file, 0, truncate=truncate)
+        self._log = self.log_file.open("ab")
+        file_stat = os.fstat(self._log.fileno())
+        self._log_inode = file_stat.st_ino
+        self._log_offset = file_stat.st_size
+
+    def _replay(self, log_file: Path, offset: int, truncate: bool) -> Tuple[int, int]:
+        """Apply every complete mutation after ``offset``; a torn final line is dropped or left for later."""
+        applied = 0
+        good_bytes = offset
+        with log_file.open("rb") as handle:
+            handle.seek(offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self._put(entry["record"])
+                good_bytes += len(line)
+                applied += 1
+        if truncate and good_bytes != log_file.stat().st_size:
+            os.truncate(log_file, good_bytes)
+        self.replayed += applied
+        return applied, good_bytes
+
+    def _put(self, record: dict) -> None:
+        if self._index.update(record["id"], record) is None:
+            self._index.add(record)
+
+    def _refresh(self, file_locked: bool = False) -> None:
+        """Catch up with mutations other processes appended since we last looked."""
+        try:
+            with phase("io"):
+                file_stat = os.stat(self.log_file)
+        except FileNotFoundError:
+            return  # another process is rotating the log right now
+        if file_stat.st_ino != self._log_inode:
+            self._log.close()
+            if file_locked:
+                self._recover(truncate=False)
+            else:
+                with self._file_lock.hold(shared=True):
+                    self._recover(truncate=False)
+        elif file_stat.st_size > self._log_offset:
+            applied, self._log_offset = self._replay(self.log_file, self._log_offset, truncate=False)
+            self._log_lines += applied
+
+    def load(self) -> List[dict]:
+        with self._lock:
+            self._refresh()
+            return list(self._index.records())
+
+    def index(self) -> RecordIndex:
+        with self._lock:
+            self._refresh()
+            return self._index
+
+    def insert(self, fields: dict) -> dict:
+        return self.insert_many([fields])[0]
+
+    def insert_many(self, fields_list: List[dict]) -> List[dict]:
+        with self._lock, self._file_lock.hold():
+            self._refresh(file_locked=True)
+            records = []
+            for fields in fields_list:
+                record = {"id": max(self._index.max_id, self.id_floor) + 1, **fields}
+                self._index.add(record)
+                records.append(record)
+            self._write_entries(records)
+            return records
+
+    def update(self, record_id: int, changes: dict) -> Optional[dict]:
+        return self.update_many([(record_id, changes)])[0]
+
+    def update_many(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        return [record for _, record in self.edit_many(updates)]
+
+    def edit_many(self, updates: List[Tuple[int, dict]]) -> List[Tuple[Optional[dict], Optional[dict]]]:
+        with self._lock, self._file_lock.hold():
+            self._refresh(file_locked=True)
+            results = [self._index.edit(record_id, changes) for record_id, changes in updates]
+            self._write_entries([record for _, record in results if record is not None])
+            return results
+
+    def _write_entries(self, records: List[dict]) -> None:
+        if not records:
+            return
+        with phase("serialize"):
+            data = b"".join(
+                (json.dumps({"op": "put", "record": record}, separators=(",", ":")) + "\n").encode("utf-8")
+                for record in records
+            )
+        with phase("io"):
+            self._log.write(data)
+            self._log.flush()
+        self._log_offset += len(data)
+        self.appends += len(records)
+        self._log_lines += len(records)
+        self._pending_sync += len(records)
+        now = time.monotonic()
+        if self._pending_sync >= self.fsync_every or now - self._last_sync >= self.fsync_interval:
+            self._sync(now)
+        if self._log_lines >= self.compact_after and self._compactor is None and not self.compacting_file.exists():
+            self._start_compaction()
+
+    def _sync(self, now: float) -> None:
+        with phase("io"):
+            os.fsync(self._log.fileno())
+        self._pending_sync = 0
+        self._last_sync = now
+        self.fsyncs += 1
+
+    def flush(self) -> None:
+        """Force any buffered mutations to stable storage."""
+        with self._lock:
+            if self._pending_sync:
+                self._sync(time.monotonic())
+
+    def close(self) -> None:
+        """Stop the background fsyncs, fsync pending appends and wait for a running compaction, for a clean shutdown."""
+        self._closed.set()
+        self._syncer.join()
+        self.flush()
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def _sync_loop(self) -> None:
+        while not self._closed.wait(self.fsync_interval):
+            self.flush()
+
+    def _start_compaction(self) -> None:
+        """Rotate the log and write a new snapshot from a copy of the current records."""
+        self._sync(time.monotonic())
+        self._log.close()
+        os.replace(self.log_file, self.compacting_file)
+        self._log = self.log_file.open("ab")
+        self._log_inode = os.fstat(self._log.fileno()).st_ino
+        self._log_offset = 0
+        self._log_lines = 0
+        records = list(self._index.records())
+        self._compactor = threading.Thread(target=self._compact, args=(records,), daemon=True)
+        self._compactor.start()
+
+    def _compact(self, records: List[dict]) -> None:
+        temp_file = write_json_temp(self.snapshot_file, records)
+        with self._file_lock.hold():
+            os.replace(temp_file, self.snapshot_file)
+            self.compacting_file.unlink(missing_ok=True)
+        with self._lock:
+            self.compactions += 1
+            self._compactor = None
+
+    def version(self) -> Tuple[str, float]:
+        """The log's inode and length, which grow with every mutation, plus its modification time."""
+        with self._lock:
+            self._refresh()
+            modified = os.fstat(self._log.fileno()).st_mtime
+            return f"{self._log_inode:x}-{self._log_offset:x}", modified
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "appends": self.appends,
+            "fsyncs": self.fsyncs,
+            "compactions": self.compactions,
+            "replayed": self.replayed,
+            "log_lines": self._log_lines,
+        }
+
+
+class SqliteStorage:
+    """Stores records in a SQLite database next to the data file.
+
+    Records are kept as JSON text keyed by an INTEGER PRIMARY KEY id, with
+    expression indexes on every unique and indexed field. Each thread gets its
+    own connection in WAL mode, so readers never block the writer, and queries
+    use fixed SQL text so sqlite3 reuses the prepared statements. The object is
+    its own index: get/lookup/random run as indexed queries instead of loading
+    the whole table. Writes run in ``BEGIN IMMEDIATE`` transactions, which
+    serialise id assignment across threads and processes.
+    """
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        data_file: Path,
+        unique_fields: Tuple[str, ...] = (),
+        indexed_fields: Tuple[str, ...] = (),
+        id_floor: int = 0,
+    ):
+        self.data_file = data_file
+        self.db_file = data_file.with_suffix(".db")
+        self.unique_fields = unique_fields
+        self.id_floor = id_floor
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+
+        with self._write_transaction() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, body TEXT NOT NULL)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER, modified REAL)"
+            )
+            connection.execute("INSERT OR IGNORE INTO meta (id, version, modified) VALUES (1, 0, 0)")
+            for field in unique_fields + indexed_fields:
+                connection.execute(
+                    f"CREATE INDEX IF NOT EXISTS records_{field} ON records (json_extract(body, '$.{field}'), id)"
+                )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                self.db_file, cached_statements=64, check_same_thread=False, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @contextmanager
+    def _write_transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        with phase("io"):
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def _touch(self, connection: sqlite3.Connection) -> None:
+        connection.execute("UPDATE meta SET version = version + 1, modified = ? WHERE id = 1", (time.time(),))
+
+    def version(self) -> Tuple[str, float]:
+        """A counter bumped inside every write transaction, shared by all processes, plus the write time."""
+        with phase("io"):
+            version, modified = self._connection().execute("SELECT version, modified FROM meta WHERE id = 1").fetchone()
+        return f"{version:x}", modified
+
+    def _fetch_one(self, sql: str, params: tuple) -> Optional[dict]:
+        self.reads += 1
+        with phase("io"):
+            row = self._connection().execute(sql, params).fetchone()
+        if row is None:
+            return None
+        with phase("parse"):
+            return json.loads(row[0])
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT count(*) FROM records").fetchone()[0]
+
+    @property
+    def max_id(self) -> int:
+        return self._connection().execute("SELECT coalesce(max(id), 0) FROM records").fetchone()[0]
+
+    def load(self) -> List[dict]:
+        self.reads += 1
+        with phase("io"):
+            rows = self._connection().execute("SELECT body FROM records ORDER BY id").fetchall()
+        with phase("parse"):
+            return [json.loads(body) for (body,) in rows]
+
+    def index(self) -> "SqliteStorage":
+        return self
+
+    def get(self, record_id: int) -> Optional[dict]:
+        return self._fetch_one("SELECT body FROM records WHERE id = ?", (record_id,))
+
+    def lookup(self, field: str, value: Any) -> Optional[dict]:
+        if field not in self.unique_fields:
+            raise KeyError(field)
+        return self._fetch_one(
+            f"SELECT body FROM records WHERE json_extract(body, '$.{field}') = ? ORDER BY id LIMIT 1", (value,)
+        )
+
+    def random(self) -> Optional[dict]:
+        """Pick a random id between the smallest and largest and return the first record at or after it."""
+        with phase("io"):
+            low, high = self._connection().execute(
+                "SELECT (SELECT min(id) FROM records), (SELECT max(id) FROM records)"
+            ).fetchone()
+        if low is None:
+            return None
+        return self._fetch_one("SELECT body FROM records WHERE id >= ? ORDER BY id LIMIT 1", (random.randint(low, high),))
+
+    def count(self, field: Optional[str] = None, value: Any = None) -> int:
+        if field is None:
+            return len(self)
+        (total,) = self._connection().execute(
+            f"SELECT count(*) FROM records WHERE json_extract(body, '$.{field}') = ?", (value,)
+        ).fetchone()
+        return total
+
+    def scan(self, after: int = 0, field: Optional[str] = None, value: Any = None) -> Iterator[dict]:
+        """Yield records with an id greater than ``after`` in id order, streaming rows from the cursor."""
+        self.reads += 1
+        if field is None:
+            rows = self._connection().execute("SELECT body FROM records WHERE id > ? ORDER BY id", (after,))
+        else:
+            rows = self._connection().execute(
+                f"SELECT body FROM records WHERE json_extract(body, '$.{field}') = ? AND id > ? ORDER BY id",
+                (value, after),
+            )
+        for (body,) in rows:
+            yield json.loads(body)
+
+    def sample(self, count: int) -> List[dict]:
+        """Return up to ``count`` distinct records in random order without sorting the table."""
+        total = len(self)
+        if count * 2 >= total:
+            ids = [record_id for (record_id,) in self._connection().execute("SELECT id FROM records")]
+            return [self.get(record_id) for record_id in random.sample(ids, min(count, total))]
+        picked: Dict[int, dict] = {}
+        while len(picked) < count:
+            record = self.random()
+            picked.setdefault(record["id"], record)
+        return list(picked.values())
+
+    def insert(self, fields: dict) -> dict:
+        return self.insert_many([fields])[0]
+
+    def insert_many(self, fields_list: List[dict]) -> List[dict]:
+        with self._write_transaction() as connection:
+            (max_id,) = connection.execute("SELECT coalesce(max(id), 0) FROM records").fetchone()
+            max_id = max(max_id, self.id_floor)
+            records = [{"id": max_id + offset, **fields} for offset, fields in enumerate(fields_list, start=1)]
+            connection.executemany(
+                "INSERT INTO records (id, body) VALUES (?, ?)",
+                ((record["id"], json.dumps(record)) for record in records),
+            )
+            self._touch(connection)
+        self.writes += len(records)
+        return records
+
+    def update(self, record_id: int, changes: dict) -> Optional[dict]:
+        return self.update_many([(record_id, changes)])[0]
+
+    def update_many(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        return [record for _, record in self.edit_many(updates)]
+
+    def edit_many(self, updates: List[Tuple[int, dict]]) -> List[Tuple[Optional[dict], Optional[dict]]]:
+        results: List[Tuple[Optional[dict], Optional[dict]]] = []
+        with self._write_transaction() as connection:
+            for record_id, changes in updates:
+                row = connection.execute("SELECT body FROM records WHERE id = ?", (record_id,)).fetchone()
+                if row is None:
+                    results.append((None, None))
+                    continue
+                previous = json.loads(row[0])
+                record = {**previous, **changes}
+                connection.execute("UPDATE records SET body = ? WHERE id = ?", (json.dumps(record), record_id))
+                results.append((previous, record))
+            if any(record is not None for _, record in results):
+                self._touch(connection)
+        self.writes += sum(record is not None for _, record in results)
+        return results
+
+    def import_records(self, records: List[dict]) -> int:
+        """Insert or replace many records in a single transaction."""
+        with self._write_transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO records (id, body) VALUES (?, ?)",
+                ((record["id"], json.dumps(record)) for record in records),
+            )
+            self._touch(connection)
+        self.writes += len(records)
+        return len(records)
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "reads": self.reads, "writes": self.writes}
+
+
+class MappedStorage:
+    """Serves records from a memory-mapped binary snapshot plus an append-only log of changes.
+
+    The snapshot (``<name>.snap``, see snapshot.py) is mapped rather than parsed, so
+    opening even millions of records costs one header read, and a record is decoded
+    only when it is served. Creates and updates are appended to ``<name>.snap.log``
+    as JSON lines and kept in a small in-memory overlay; once the log passes
+    ``compact_after`` lines the snapshot is rewritten with the overlay folded in.
+    The first open converts the existing JSON array file. Other processes' writes
+    are picked up from the log, as with AppendLogStorage.
+    """
+
+    backend = "mmap"
+
+    def __init__(
+        self,
+        data_file: Path,
+        unique_fields: Tuple[str, ...] = (),
+        indexed_fields: Tuple[str, ...] = (),
+        compact_after: int = 10_000,
+        id_floor: int = 0,
+    ):
+        self.data_file = data_file
+        self.unique_fields = unique_fields
+        self.indexed_fields = indexed_fields
+        self.id_floor = id_floor
+        self.snapshot_file = snapshot_path(data_file)
+        self.log_file = self.snapshot_file.with_name(self.snapshot_file.name + ".log")
+        self.compact_after = compact_after
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(data_file.with_name(data_file.name + ".lock"))
+        self.appends = 0
+        self.compactions = 0
+        self.replayed = 0
+
+        with self._file_lock.hold():
+            if not self.snapshot_file.exists():
+                records = sorted(read_json_array(data_file), key=lambda record: record["id"])
+                write_snapshot(self.snapshot_file, records, indexed_fields)
+            snapshot = SnapshotFile(self.snapshot_file)
+            if not all(snapshot.has_group(field) for field in indexed_fields):
+                # Converted without --indexed: add the per-value id lists once.
+                write_snapshot(self.snapshot_file, (snapshot.record_at(i) for i in range(len(snapshot))), indexed_fields)
+            self.log_file.touch()
+            self._open(truncate=True)
+
+    def _open(self, truncate: bool) -> None:
+        """Map the current snapshot and replay the whole log on top of it."""
+        self._snapshot = SnapshotFile(self.snapshot_file)
+        self._overlay: Dict[int, dict] = {}
+        self._new_ids: List[int] = []
+        self._added: Dict[str, Dict[Any, List[int]]] = {field: {} for field in self.indexed_fields}
+        self._removed: Dict[str, Dict[Any, set]] = {field: {} for field in self.indexed_fields}
+        self._unique: Dict[str, Dict[Any, int]] = {}
+        self.max_id = self._snapshot.max_id
+        self._log_inode = os.stat(self.log_file).st_ino
+        self._log_lines, self._log_offset = self._replay(0, truncate)
+
+    def _replay(self, offset: int, truncate: bool) -> Tuple[int, int]:
+        applied = 0
+        good_bytes = offset
+        with self.log_file.open("rb") as handle:
+            handle.seek(offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self._put(entry["record"])
+                good_bytes += len(line)
+                applied += 1
+        if truncate and good_bytes != self.log_file.stat().st_size:
+            os.truncate(self.log_file, good_bytes)
+        self.replayed += applied
+        return applied, good_bytes
+
+    def _put(self, record: dict) -> None:
+        record_id = record["id"]
+        previous = self._get(record_id)
+        if previous is None and record_id > self._snapshot.max_id:
+            _insert_sorted(self._new_ids, record_id)
+        self._overlay[record_id] = record
+        self.max_id = max(self.max_id, record_id)
+        for field in self.indexed_fields:
+            old, new = (previous or {}).get(field), record.get(field)
+            if previous is not None and old == new:
+                continue
+            if previous is not None and not _remove_sorted(self._added[field].get(old, []), record_id):
+                self._removed[field].setdefault(old, set()).add(record_id)  # it sits in the snapshot's group
+            removed = self._removed[field].get(new)
+            if removed is not None and record_id in removed:
+                removed.discard(record_id)
+            else:
+                _insert_sorted(self._added[field].setdefault(new, []), record_id)
+        for field, lookup in self._unique.items():
+            if previous is not None and field in previous and lookup.get(previous[field]) == record_id:
+                del lookup[previous[field]]
+            if field in record:
+                lookup.setdefault(record[field], record_id)
+
+    def _refresh(self, file_locked: bool = False) -> None:
+        """Catch up with mutations other processes appended, or a snapshot they rewrote."""
+        try:
+            with phase("io"):
+                file_stat = os.stat(self.log_file)
+        except FileNotFoundError:
+            return
+        if file_stat.st_ino != self._log_inode:
+            if file_locked:
+                self._open(truncate=False)
+            else:
+                with self._file_lock.hold(shared=True):
+                    self._open(truncate=False)
+        elif file_stat.st_size > self._log_offset:
+            applied, self._log_offset = self._replay(self._log_offset, truncate=False)
+            self._log_lines += applied
+
+    def _get(self, record_id: int) -> Optional[dict]:
+        record = self._overlay.get(record_id)
+        if record is None:
+            record = self._snapshot.get(record_id)
+        return record
+
+    def _at(self, position: int) -> dict:
+        """The record at ``position`` in snapshot order followed by the records created since."""
+        if position < len(self._snapshot):
+            record = self._overlay.get(self._snapshot.ids[position])
+            return dict(record) if record is not None else self._snapshot.record_at(position)
+        return dict(self._overlay[self._new_ids[position - len(self._snapshot)]])
+
+    def __len__(self) -> int:
+        return len(self._snapshot) + len(self._new_ids)
+
+    def load(self) -> List[dict]:
+        return list(self.index().scan())
+
+    def index(self) -> "MappedStorage":
+        with self._lock:
+            self._refresh()
+            return self
+
+    def get(self, record_id: int) -> Optional[dict]:
+        """The record with ``record_id``; like RecordIndex, a copy that is safe to change."""
+        record = self._overlay.get(record_id)
+        return dict(record) if record is not None else self._snapshot.get(record_id)
+
+    def lookup(self, field: str, value: Any) -> Optional[dict]:
+        with self._lock:
+            if field not in self._unique:
+                lookup: Dict[Any, int] = {}
+                for position in range(len(self._snapshot)):
+                    record_id = self._snapshot.ids[position]
+                    if record_id not in self._overlay:
+                        candidate = self._snapshot.value_at(position, field, _MISSING)
+                        if candidate is not _MISSING:
+                            lookup.setdefault(candidate, record_id)
+                for record_id in sorted(self._overlay):
+                    if field in self._overlay[record_id]:
+                        lookup.setdefault(self._overlay[record_id][field], record_id)
+                self._unique[field] = lookup
+            record_id = self._unique[field].get(value)
+        return None if record_id is None else self.get(record_id)
+
+    def random(self) -> Optional[dict]:
+        total = len(self)
+        return self._at(random.randrange(total)) if total else None
+
+    def sample(self, count: int) -> List[dict]:
+        total = len(self)
+        return [self._at(position) for position in random.sample(range(total), min(count, total))]
+
+    def count(self, field: Optional[str] = None, value: Any = None) -> int:
+        if field is None:
+            return len(self)
+        base = len(self._snapshot.group(field, value))
+        return base - len(self._removed[field].get(value, ())) + len(self._added[field].get(value, ()))
+
+    def scan(self, after: int = 0, field: Optional[str] = None, value: Any = None) -> Iterator[dict]:
+        """Yield records with an id greater than ``after`` in id order, decoding snapshot rows one at a time."""
+        snapshot = self._snapshot
+        if field is None:
+            base_ids, extra_ids, skip = snapshot.ids, list(self._new_ids), set()
+        else:
+            base_ids = snapshot.group(field, value)
+            extra_ids = list(self._added[field].get(value, ()))
+            skip = set(self._removed[field].get(value, ()))
+        base_position = bisect.bisect_right(base_ids, after)
+        extra_position = bisect.bisect_right(extra_ids, after)
+        while base_position < len(base_ids) or extra_position < len(extra_ids):
+            if extra_position >= len(extra_ids) or (
+                base_position < len(base_ids) and base_ids[base_position] < extra_ids[extra_position]
+            ):
+                record_id = base_ids[base_position]
+                base_position += 1
+                if record_id in skip:
+                    continue
+            else:
+                record_id = extra_ids[extra_position]
+                extra_position += 1
+            record = self._overlay.get(record_id)
+            yield dict(record) if record is not None else snapshot.get(record_id)
+
+    def insert(self, fields: dict) -> dict:
+        return self.insert_many([fields])[0]
+
+    def insert_many(self, fields_list: List[dict]) -> List[dict]:
+        with self._lock, self._file_lock.hold():
+            self._refresh(file_locked=True)
+            records = []
+            for fields in fields_list:
+                record = {"id": max(self.max_id, self.id_floor) + 1, **fields}
+                self._put(dict(record))
+                records.append(record)
+            self._write_entries(records)
+            return records
+
+    def update(self, record_id: int, changes: dict) -> Optional[dict]:
+        return self.update_many([(record_id, changes)])[0]
+
+    def update_many(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        return [record for _, record in self.edit_many(updates)]
+
+    def edit_many(self, updates: List[Tuple[int, dict]]) -> List[Tuple[Optional[dict], Optional[dict]]]:
+        with self._lock, self._file_lock.hold():
+            self._refresh(file_locked=True)
+            results: List[Tuple[Optional[dict], Optional[dict]]] = []
+            changed = []
+            for record_id, changes in updates:
+                previous = record = self._get(record_id)
+                if record is not None:
+                    record = {**record, **changes}
+                    self._put(dict(record))
+                    changed.append(record)
+                results.append((previous, record))
+            if changed:
+                self._write_entries(changed)
+            return results
+
+    def _write_entries(self, records: List[dict]) -> None:
+        with phase("serialize"):
+            data = b"".join(
+                (json.dumps({"op": "put", "record": record}, separators=(",", ":")) + "\n").encode("utf-8")
+                for record in records
+            )
+        with phase("io"):
+            with self.log_file.open("ab") as handle:
+                handle.write(data)
+                handle.flush()
+                os.fsync(handle.fileno())
+        self._log_offset += len(data)
+        self.appends += len(records)
+        self._log_lines += len(records)
+        if self._log_lines >= self.compact_after:
+            self._compact()
+
+    def _compact(self) -> None:
+        """Fold the log into a new snapshot, then start an empty log (caller holds both locks)."""
+        write_snapshot(self.snapshot_file, self.scan(), self.indexed_fields)
+        descriptor, temp_name = tempfile.mkstemp(prefix=self.log_file.name + ".", suffix=".tmp", dir=self.log_file.parent)
+        os.close(descriptor)
+        os.replace(temp_name, self.log_file)
+        self._open(truncate=False)
+        self.compactions += 1
+
+    def version(self) -> Tuple[str, float]:
+        """The log's inode and length, which change with every mutation and compaction, plus its modification time."""
+        with self._lock:
+            self._refresh()
+            modified = os.stat(self.log_file).st_mtime
+            return f"{self._log_inode:x}-{self._log_offset:x}", modified
+
+    def close(self) -> None:
+        """Nothing to release: every append is fsynced before it returns."""
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "mapped_records": len(self._snapshot),
+            "overlay_records": len(self._overlay),
+            "appends": self.appends,
+            "compactions": self.compactions,
+            "replayed": self.replayed,
+            "log_lines": self._log_lines,
+        }
+
+
+class MemoryStorage:
+    """Keeps records in this process only: loaded from the data file once and never written back.
+
+    Meant for tests, benchmarks and throwaway instances. Writes are lost when the
+    process exits and other processes never see them.
+    """
+
+    backend = "memory"
+
+    def __init__(
+        self,
+        data_file: Path,
+        unique_fields: Tuple[str, ...] = (),
+        indexed_fields: Tuple[str, ...] = (),
+        id_floor: int = 0,
+    ):
+        self.data_file = data_file
+        self.id_floor = id_floor
+        self._lock = threading.Lock()
+        self._index = RecordIndex(read_json_array(data_file), unique_fields, indexed_fields)
+        self._version = 0
+        self._modified = 0.0
+        self.writes = 0
+
+    def load(self) -> List[dict]:
+        return list(self._index.records())
+
+    def index(self) -> RecordIndex:
+        return self._index
+
+    def insert(self, fields: dict) -> dict:
+        return self.insert_many([fields])[0]
+
+    def insert_many(self, fields_list: List[dict]) -> List[dict]:
+        with self._lock:
+            records = []
+            for fields in fields_list:
+                record = {"id": max(self._index.max_id, self.id_floor) + 1, **fields}
+                self._index.add(record)
+                records.append(record)
+            self._changed(len(records))
+            return records
+
+    def update(self, record_id: int, changes: dict) -> Optional[dict]:
+        return self.update_many([(record_id, changes)])[0]
+
+    def update_many(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        return [record for _, record in self.edit_many(updates)]
+
+    def edit_many(self, updates: List[Tuple[int, dict]]) -> List[Tuple[Optional[dict], Optional[dict]]]:
+        with self._lock:
+            results = [self._index.edit(record_id, changes) for record_id, changes in updates]
+            self._changed(sum(record is not None for _, record in results))
+            return results
+
+    def put_many(self, records: List[dict]) -> List[Optional[dict]]:
+        """Store complete records under their own ids (e.g. copied from another instance), replacing stored ones.
+
+        Returns each record's previous contents, or None where it is new.
+        """
+        with self._lock:
+            previous = []
+            for record in records:
+                old = self._index.get(record["id"])
+                if old is None:
+                    self._index.add(dict(record))
+                else:
+                    self._index.update(record["id"], record)
+                previous.append(old)
+            self._changed(len(records))
+            return previous
+
+    def _changed(self, count: int) -> None:
+        if count:
+            self._version += 1
+            self._modified = time.time()
+            self.writes += count
+
+    def version(self) -> Tuple[str, float]:
+        """This instance's identity and a counter bumped by every write, plus the time of the last one."""
+        return f"{id(self):x}-{self._version:x}", self._modified
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "writes": self.writes}
+
+    def close(self) -> None:
+        """Nothing to release: the records only ever lived in memory."""
+
+
+class _Write:
+    """One caller's insert_many()/edit_many() payloads, and the results or error it gets back."""
+
+    def __init__(self, kind: str, payloads: list):
+        self.kind = kind
+        self.payloads = payloads
+        self.results: list = []
+        self.error: Optional[BaseException] = None
+
+
+class _Batch:
+    """Writes collected for one group commit; ``done`` is set once every one of them has its outcome."""
+
+    def __init__(self):
+        self.writes: List[_Write] = []
+        self.size = 0
+        self.done = threading.Event()
+
+
+class GroupCommitStorage:
+    """Funnels writes from every request thread through one writer thread that commits them in batches.
+
+    The writer applies everything queued since its last commit with one
+    insert_many()/edit_many() per run of same-kind writes, makes it durable
+    (plus flush() on backends that defer fsyncs), and only then wakes the callers,
+    so insert() and update() still return after their record is on disk. While a
+    commit is running new writes pile up for the next one, so batches grow with
+    load without delaying a lone writer. ``interval`` adds an optional wait for
+    more writes before each commit; ``max_batch`` ends that wait early. Reads go
+    straight to the wrapped storage.
+    """
+
+    def __init__(self, storage, interval: float = 0.0, max_batch: int = 1024):
+        self.storage = storage
+        self.backend = storage.backend
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = _Batch()
+        self._condition = threading.Condition()
+        self._closed = False
+        self.commits = 0
+        self.committed = 0
+        self.largest_batch = 0
+        self.commit_seconds = 0.0
+        self.slowest_commit = 0.0
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+
+    def load(self) -> List[dict]:
+        return self.storage.load()
+
+    def index(self):
+        return self.storage.index()
+
+    def version(self) -> Tuple[str, float]:
+        return self.storage.version()
+
+    def insert(self, fields: dict) -> dict:
+        return self._submit("insert", [fields])[0]
+
+    def insert_many(self, fields_list: List[dict]) -> List[dict]:
+        return self._submit("insert", fields_list)
+
+    def update(self, record_id: int, changes: dict) -> Optional[dict]:
+        return self._submit("update", [(record_id, changes)])[0][1]
+
+    def update_many(self, updates: List[Tuple[int, dict]]) -> List[Optional[dict]]:
+        return [record for _, record in self._submit("update", updates)]
+
+    def edit_many(self, updates: List[Tuple[int, dict]]) -> List[Tuple[Optional[dict], Optional[dict]]]:
+        return self._submit("update", updates)
+
+    def _submit(self, kind: str, payloads: list) -> list:
+        if not payloads:
+            return []
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Storage is closed.")
+            batch = self._pending
+            write = _Write(kind, payloads)
+            batch.writes.append(write)
+            batch.size += len(payloads)
+            self._condition.notify()
+        batch.done.wait()
+        if write.error is not None:
+            raise write.error
+        return write.results
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending.writes and not self._closed:
+                    self._condition.wait()
+                if not self._pending.writes:
+                    return
+                deadline = time.monotonic() + self.interval
+                while self._pending.size < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch, self._pending = self._pending, _Batch()
+            self._commit(batch)
+
+    def _commit(self, batch: _Batch) -> None:
+        start = time.perf_counter()
+        try:
+            position = 0
+            while position < len(batch.writes):
+                end = position
+                while end < len(batch.writes) and batch.writes[end].kind == batch.writes[position].kind:
+                    end += 1
+                self._apply(batch.writes[position:end])
+                position = end
+            flush = getattr(self.storage, "flush", None)
+            if flush is not None:
+                flush()
+        except Exception as error:  # the flush: no write of this batch is known to be durable
+            for write in batch.writes:
+                write.error = write.error or error
+        finally:
+            elapsed = time.perf_counter() - start
+            self.commits += 1
+            self.committed += batch.size
+            self.largest_batch = max(self.largest_batch, batch.size)
+            self.commit_seconds += elapsed
+            self.slowest_commit = max(self.slowest_commit, elapsed)
+            batch.done.set()
+
+    def _apply(self, writes: List[_Write]) -> None:
+        """Commit a run of same-kind writes with one storage call, and hand each caller its share of the outcome.
+
+        A failed call fails only the writes that were part of it; runs before and
+        after it in the batch still commit, and their callers get their results.
+        """
+        apply = self.storage.insert_many if writes[0].kind == "insert" else self.storage.edit_many
+        try:
+            results = apply([payload for write in writes for payload in write.payloads])
+        except Exception as error:
+            for write in writes:
+                write.error = error
+            return
+        position = 0
+        for write in writes:
+            write.results = results[position : position + len(write.payloads)]
+            position += len(write.payloads)
+
+    def flush(self) -> None:
+        """Wait until every write queued so far is committed."""
+        with self._condition:
+            batch = self._pending
+            if not batch.writes:
+                batch = None
+        if batch is not None:
+            batch.done.wait()
+
+    def close(self) -> None:
+        """Commit whatever is queued, stop the writer and close the wrapped storage."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._writer.join()
+        self.storage.close()
+
+    def stats(self) -> dict:
+        return {
+            **self.storage.stats(),
+            "group_commits": self.commits,
+            "group_committed_writes": self.committed,
+            "group_largest_batch": self.largest_batch,
+            "group_commit_seconds": round(self.commit_seconds, 6),
+            "group_slowest_commit_seconds": round(self.slowest_commit, 6),
+        }
+
+
+STORAGE_BACKENDS = {
+    JsonFileStorage.backend: JsonFileStorage,
+    AppendLogStorage.backend: AppendLogStorage,
+    SqliteStorage.backend: SqliteStorage,
+    MappedStorage.backend: MappedStorage,
+    MemoryStorage.backend: MemoryStorage,
+}
+
+
+def open_storage(
+    data_file: Path,
+    unique_fields: Tuple[str, ...] = (),
+    indexed_fields: Tuple[str, ...] = (),
+    backend: Optional[str] = None,
+    id_floor: int = 0,
+):
+    """Create the storage backend named by ``backend`` or the STORAGE_BACKEND environment variable.
+
+    ``unique_fields`` get a value -> first record lookup; ``indexed_fields`` are
+    fields that are filtered on and get a database index where the backend has one.
+    New ids start above ``id_floor`` as well as above every stored id, so files that
+    split one dataset (see partitions.py) keep its ids unique.
+    Writes go through a GroupCommitStorage unless GROUP_COMMIT=0; GROUP_COMMIT_INTERVAL
+    (seconds) and GROUP_COMMIT_BATCH set its wait and batch limit.
+    """
+    name = backend or os.environ.get("STORAGE_BACKEND", JsonFileStorage.backend)
+    try:
+        storage_class = STORAGE_BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend '{name}'. Choose from: {', '.join(STORAGE_BACKENDS)}.")
+    storage = storage_class(data_file, unique_fields, indexed_fields, id_floor=id_floor)
+    if os.environ.get("GROUP_COMMIT", "1").strip().lower() in ("0", "false", "no", "off"):
+        return storage
+    return GroupCommitStorage(
+        storage,
+        interval=float(os.environ.get("GROUP_COMMIT_INTERVAL", "0")),
+        max_batch=int(os.environ.get("GROUP_COMMIT_BATCH", "1024")),
+    )
+
+
+def read_json_array(data_file: Path) -> List[dict]:
+    if not data_file.exists():
+        return []
+    with phase("io"):
+        with data_file.open("rb") as handle:
+            data = handle.read()
+    with phase("parse"):
+        return codec.loads(data)
+
+
+def write_json_temp(data_file: Path, records: List[dict]) -> Path:
+    """Write records to a fresh temporary file next to ``data_file`` and return its path."""
+    descriptor, temp_name = tempfile.mkstemp(prefix=data_file.name + ".", suffix=".tmp", dir=data_file.parent)
+    if data_file.exists():
+        os.chmod(temp_name, stat.S_IMODE(data_file.stat().st_mode))
+    with phase("serialize"):
+        data = codec.dumps_records(records)
+    with phase("io"):
+        with os.fdopen(descriptor, "wb") as handle:
+            handle.write(data)
+            handle.flush()
+            os.fsync(handle.fileno())
+    return Path(temp_name)
+
+
+def write_json_atomic(data_file: Path, records: List[dict]) -> None:
+    """Write records to a temporary file and rename it over the target so readers never see a partial file."""
+    os.replace(write_json_temp(data_file, records), data_file)
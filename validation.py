@@ -0,0 +1,55 @@
+"""
+Request validation shared by the services: batch bodies, counts and search arguments.
+
+Each parser raises ValueError with the message the route answers with a 400.
+Called without arguments they read the current Flask request; asgi.py passes
+the values from its own request objects instead.
+"""
+
+from typing import Mapping, Optional, Tuple
+
+from flask import request
+
+from search import parse_query
+
+MAX_BATCH_SIZE = 10_000
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+def parse_batch_payload(data: Optional[list] = None) -> list:
+    """Validate that a batch request carries a non-empty JSON array within the size limit."""
+    if data is None:
+        data = request.get_json(silent=True)
+    if not isinstance(data, list) or not data:
+        raise ValueError("Request JSON must be a non-empty array.")
+    if len(data) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batches are limited to {MAX_BATCH_SIZE} items.")
+    return data
+
+
+def parse_count(args: Mapping[str, str], name: str = "count") -> int:
+    """Validate a positive integer argument such as ?count= or ?next=."""
+    try:
+        count = int(args.get(name, ""))
+    except ValueError:
+        count = 0
+    if count < 1:
+        raise ValueError(f"'{name}' must be a positive integer.")
+    return count
+
+
+def parse_search_query(args: Optional[Mapping[str, str]] = None) -> Tuple[str, int]:
+    """Validate the ?q= and ?limit= arguments of a search request."""
+    if args is None:
+        args = request.args
+    query = args.get("q", "").strip()
+    if not parse_query(query):
+        raise ValueError("Query parameter 'q' must contain at least one word.")
+    try:
+        limit = int(args.get("limit", DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        limit = 0
+    if limit < 1:
+        raise ValueError("'limit' must be a positive integer.")
+    return query, min(limit, MAX_SEARCH_LIMIT)